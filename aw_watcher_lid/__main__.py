@@ -2,13 +2,103 @@
 
 import argparse
 import logging
+import os
 import signal
 import sys
-
-from .lid import LidWatcher
+import time
+from datetime import datetime
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# When this module started running, for --print-startup-timing
+_MAIN_STARTED = time.perf_counter()
+
+
+def _interpreter_startup() -> float:
+    """Time from process start until this module ran (interpreter and site imports).
+
+    Returns:
+        Seconds, with the kernel's clock tick resolution, or 0.0 if unknown
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name, which may contain spaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        uptime = time.clock_gettime(getattr(time, "CLOCK_BOOTTIME", time.CLOCK_MONOTONIC))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return max(0.0, uptime - started - (time.perf_counter() - _MAIN_STARTED))
+
+
+class StartupTimer:
+    """Records how long each startup phase takes and prints it once ready."""
+
+    def __init__(self) -> None:
+        """Start timing at the moment this module started running."""
+        self.interpreter = _interpreter_startup()
+        self.last = _MAIN_STARTED
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        """End a phase.
+
+        Args:
+            phase: Name of the phase that just ended
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self) -> str:
+        """Format the phases and the total time until ready."""
+        lines = [f"  {'interpreter':<16}{self.interpreter * 1000:8.1f}ms"]
+        lines += [f"  {phase:<16}{seconds * 1000:8.1f}ms" for phase, seconds in self.phases]
+        total = self.interpreter + self.last - _MAIN_STARTED
+        lines.append(f"  {'ready after':<16}{total * 1000:8.1f}ms")
+        return "Startup timing:\n" + "\n".join(lines)
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse a --since/--until time (ISO 8601, local time unless it has an offset)."""
+    try:
+        return datetime.fromisoformat(value).astimezone()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO 8601 time: {value!r}") from None
+
+
+def backfill_main(args: argparse.Namespace) -> None:
+    """Run the backfill subcommand.
+
+    Args:
+        args: Parsed command line arguments
+    """
+    if not args.verbose:
+        # One line per rebuilt event is too much for a year of history
+        logging.getLogger("aw_watcher_lid.lid").setLevel(logging.WARNING)
+
+    from .backfill import backfill
+
+    try:
+        result = backfill(
+            args.since,
+            args.until,
+            testing=args.testing,
+            dry_run=args.dry_run,
+            include_current_boot=args.include_current_boot,
+        )
+    except Exception as e:
+        logger.error(f"Backfill failed: {e}", exc_info=args.verbose)
+        sys.exit(1)
+
+    action = "would insert" if args.dry_run else "inserted"
+    print(
+        f"{result['boots']} boots, {result['entries']} journal entries: "
+        f"{action} {result['inserted']} events, skipped {result['skipped']} already covered "
+        f"({result['requests']} requests, {result['elapsed_s']:.1f}s)"
+    )
+
 
 def main() -> None:
     """Main entry point."""
@@ -19,8 +109,54 @@ def main() -> None:
     parser.add_argument(
         "--testing", action="store_true", help="Run in testing mode (don't connect to AW)"
     )
+    parser.add_argument(
+        "--print-startup-timing",
+        action="store_true",
+        help="Print how long each startup phase took once the listener is ready (to stderr)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        help="Where SIGUSR1 (start/stop cProfile) and SIGUSR2 (tracemalloc diff) write "
+        "their profiles (default: profiles/ in the ActivityWatch data dir)",
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    backfill_parser = subparsers.add_parser(
+        "backfill",
+        help="Rebuild lid, suspend and boot gap events from the journal history",
+        description="Rebuild lid, suspend and boot gap events from the journal of all boots "
+        "and insert the ones not in the bucket yet",
+    )
+    backfill_parser.add_argument(
+        "--since", type=_parse_time, help="Start of the history (ISO 8601, default: all of it)"
+    )
+    backfill_parser.add_argument(
+        "--until", type=_parse_time, help="End of the history (ISO 8601, default: now)"
+    )
+    backfill_parser.add_argument(
+        "--dry-run", action="store_true", help="Count the events without inserting them"
+    )
+    backfill_parser.add_argument(
+        "--include-current-boot",
+        action="store_true",
+        help="Also rebuild the running boot (the watcher records it while it runs)",
+    )
+    # Also accepted after the subcommand
+    backfill_parser.add_argument(
+        "--verbose", "-v", action="store_true", default=argparse.SUPPRESS, help="Verbose logging"
+    )
+    backfill_parser.add_argument(
+        "--testing",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="Use the testing aw-server",
+    )
 
     args = parser.parse_args()
+    timer = StartupTimer() if args.print_startup_timing else None
+    if timer:
+        timer.mark("parse args")
 
     # Set up logging
     log_level = logging.DEBUG if args.verbose else logging.INFO
@@ -30,10 +166,35 @@ def main() -> None:
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
+    if args.command == "backfill":
+        backfill_main(args)
+        return
+
     logger.info("Starting aw-watcher-lid...")
 
+    # Imported after argument parsing, so --help stays fast
+    from .config import config_path
+    from .lid import LidWatcher
+
+    if timer:
+        timer.mark("imports")
+
     # Create watcher
-    watcher = LidWatcher(testing=args.testing)
+    try:
+        watcher = LidWatcher(testing=args.testing)
+    except ValueError as e:
+        logger.error(f"Invalid config in {config_path()}: {e}")
+        sys.exit(1)
+
+    if timer:
+        timer.mark("watcher init")
+
+        def on_ready() -> None:
+            timer.mark("start")
+            print(timer.report(), file=sys.stderr, flush=True)
+            watcher.on_ready = None
+
+        watcher.on_ready = on_ready
 
     # Handle signals for graceful shutdown
     def signal_handler(signum: int, frame) -> None:  # type: ignore
@@ -43,6 +204,19 @@ def main() -> None:
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    # Reload the config without restarting (the reloader thread does the work)
+    def reload_handler(signum: int, frame) -> None:  # type: ignore
+        if watcher.reloader:
+            watcher.reloader.request()
+
+    signal.signal(signal.SIGHUP, reload_handler)
+
+    # Profiling on demand: SIGUSR1 toggles cProfile, SIGUSR2 dumps a tracemalloc diff
+    from .profiling import Profiler
+
+    profiler = Profiler(args.profile_dir)
+    profiler.install()
+
     try:
         # Start the watcher (this will block)
         watcher.start()
@@ -53,6 +227,7 @@ def main() -> None:
         sys.exit(1)
     finally:
         watcher.stop()
+        profiler.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,373 @@
+"""Rebuild lid, suspend and boot gap history from the systemd journal."""
+
+import bisect
+import json
+import logging
+import subprocess
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from .boots import Boot
+from .coalescer import Coalescer
+from .journal_classifier import LID_CLOSED, LID_OPEN, RESUMED, SUSPENDED, JournalClassifier
+from .journal_listener import JOURNAL_UNITS, _entry_time
+
+if TYPE_CHECKING:
+    from aw_core.models import Event
+
+    from .lid import LidWatcher
+
+logger = logging.getLogger(__name__)
+
+# Journal fields the classifier needs (cursor, timestamps and boot ID always come along)
+JOURNAL_FIELDS = ["MESSAGE_ID", "MESSAGE", "SYSLOG_IDENTIFIER", "_SYSTEMD_UNIT"]
+
+
+def read_journal(since: Optional[datetime], until: Optional[datetime]) -> Iterator[dict]:
+    """Stream the lid and suspend related journal entries of all boots.
+
+    Args:
+        since: Oldest entry time (default: the start of the journal)
+        until: Newest entry time (default: now)
+
+    Yields:
+        Journal entries, oldest first
+
+    Raises:
+        RuntimeError: If journalctl is missing
+    """
+    cmd = ["journalctl", "--output=json", "--no-pager", "--merge"]
+    cmd.append(f"--output-fields={','.join(JOURNAL_FIELDS)}")
+    for unit in JOURNAL_UNITS:
+        cmd += ["-u", unit]
+    if since:
+        cmd.append(f"--since=@{since.timestamp():.6f}")
+    if until:
+        cmd.append(f"--until=@{until.timestamp():.6f}")
+
+    try:
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+    except OSError as e:
+        raise RuntimeError(f"Could not read the journal: {e}") from e
+
+    try:
+        for line in process.stdout:  # type: ignore[union-attr]
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.debug(f"Failed to parse journal entry: {line[:100]}")
+    finally:
+        process.kill()
+        process.wait()
+
+
+class BatchInserter:
+    """Takes the rebuilt events in place of the EventSender and inserts them in batches.
+
+    The watcher's events are heartbeats; they are merged locally with
+    aw-server's merge rules first, so the inserted events are the ones the
+    server would have stored. Events overlapping an event already in the
+    bucket are skipped, so ranges the watcher recorded itself (or an earlier
+    backfill) aren't duplicated.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket_id: str,
+        batch_size: int = 500,
+        pulsetime: float = 3600.0,
+        dry_run: bool = False,
+    ) -> None:
+        """Initialize the inserter.
+
+        Args:
+            client: ActivityWatchClient to insert with
+            bucket_id: Bucket to fill
+            batch_size: Events per insert request
+            pulsetime: Heartbeat merge window in seconds (as the watcher uses it)
+            dry_run: Count the events without inserting them
+        """
+        self.client = client
+        self.bucket_id = bucket_id
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+        self.heartbeats = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.requests = 0
+
+        self._merger = Coalescer(pulsetime, interval=float("inf"), max_events=sys.maxsize)
+        self._batch: list["Event"] = []
+        # Covered ranges of the current boot as sorted, non-overlapping (start, end) lists
+        self._covered_starts: list[datetime] = []
+        self._covered_ends: list[datetime] = []
+
+    def load_covered(self, start: datetime, end: datetime) -> None:
+        """Fetch the events already in the bucket for a period (one boot).
+
+        Args:
+            start: Start of the period
+            end: End of the period
+        """
+        # The held event belongs to the previous period
+        self._flush_merger()
+        existing = self.client.get_events(self.bucket_id, start=start, end=end)
+        self.requests += 1
+
+        ranges = sorted((e.timestamp, e.timestamp + e.duration) for e in existing)
+        starts: list[datetime] = []
+        ends: list[datetime] = []
+        for range_start, range_end in ranges:
+            if ends and range_start <= ends[-1]:
+                ends[-1] = max(ends[-1], range_end)
+            else:
+                starts.append(range_start)
+                ends.append(range_end)
+        self._covered_starts, self._covered_ends = starts, ends
+
+    def _covered(self, event: "Event") -> bool:
+        """Check whether an event overlaps the events already in the bucket."""
+        end = event.timestamp + event.duration
+        # The last covered range starting at or before the event's end
+        i = bisect.bisect_right(self._covered_starts, end) - 1
+        return i >= 0 and self._covered_ends[i] >= event.timestamp
+
+    def enqueue(self, event: "Event", on_committed: Optional[Callable[[], None]] = None) -> bool:
+        """Merge a rebuilt heartbeat, batching the events that are complete.
+
+        Args:
+            event: The heartbeat
+            on_committed: Called right away (there is nothing to wait for)
+
+        Returns:
+            True
+        """
+        self.heartbeats += 1
+        ready = self._merger.add(self.heartbeats, event)
+        if ready:
+            self._add(ready[2])
+        if on_committed:
+            on_committed()
+        return True
+
+    def _flush_merger(self) -> None:
+        """Add the event still being merged to the batch."""
+        held = self._merger.flush()
+        if held:
+            self._add(held[2])
+
+    def _add(self, event: "Event") -> None:
+        """Add a merged event to the batch, unless the bucket has it already."""
+        if self._covered(event):
+            self.skipped += 1
+            return
+        self._batch.append(event)
+        if len(self._batch) >= self.batch_size:
+            self._insert_batch()
+
+    def warm(self) -> None:
+        """Nothing to do: a replayed resume doesn't affect the connection."""
+
+    def flush(self) -> None:
+        """Insert everything not inserted yet."""
+        self._flush_merger()
+        self._insert_batch()
+
+    def _insert_batch(self) -> None:
+        """Insert the current batch."""
+        if not self._batch:
+            return
+        if not self.dry_run:
+            self.client.insert_events(self.bucket_id, self._batch)
+            self.requests += 1
+        self.inserted += len(self._batch)
+        self._batch = []
+
+
+class Backfiller:
+    """Replays journal history through a LidWatcher to rebuild its events.
+
+    Journal entries are classified like the journal listener classifies
+    them and handed to the same LidWatcher handlers, so lid and suspend
+    events get the same semantics as when the watcher runs. Durations are
+    wall-clock differences (the boot clock of past boots is gone). At the
+    end of each boot the open event is closed at the boot's last journal
+    entry (or at `until`, if that is earlier), and the downtime until the
+    next boot becomes a boot gap event if it is longer than
+    boot_gap_threshold.
+    """
+
+    def __init__(
+        self,
+        watcher: "LidWatcher",
+        inserter: BatchInserter,
+        until: Optional[datetime] = None,
+    ) -> None:
+        """Initialize the backfiller.
+
+        Args:
+            watcher: A watcher in testing mode, used for its event logic only
+            inserter: Where the rebuilt events go
+            until: End of the history to rebuild, no event ends later (default: no limit)
+        """
+        self.watcher = watcher
+        self.inserter = inserter
+        self.until = until
+        self.watcher.sender = inserter  # type: ignore[assignment]
+        self.classifier = JournalClassifier(watcher.config.get("journal_rules"))
+        self.boot_gap_threshold = watcher.config.get("boot_gap_threshold", 300.0)
+        self.entries = 0
+
+    def run(self, boots: list[Boot], entries: Iterable[dict]) -> None:
+        """Rebuild the events of some boots.
+
+        Args:
+            boots: The boots to rebuild, oldest first
+            entries: Their journal entries, oldest first
+        """
+        index = {boot.boot_id: i for i, boot in enumerate(boots)}
+        current: Optional[int] = None
+
+        for entry in entries:
+            i = index.get(entry.get("_BOOT_ID"))  # type: ignore[arg-type]
+            if i is None:
+                continue
+            if current is None:
+                current = self._start_boot(boots, i)
+            while current < i:
+                current = self._next_boot(boots, current)
+            self.entries += 1
+            self._handle(entry)
+
+        if current is not None:
+            while current < len(boots) - 1:
+                current = self._next_boot(boots, current)
+            self._end_boot(boots[current])
+        self.inserter.flush()
+
+    def _handle(self, entry: dict) -> None:
+        """Hand a journal entry to the watcher if it is a lid or suspend event."""
+        action = self.classifier.classify(entry)
+        timestamp = _entry_time(entry) if action else None
+        if timestamp is None:
+            return
+
+        clock = timestamp.timestamp()
+        if action == LID_CLOSED:
+            self.watcher.handle_lid_event("closed", timestamp=timestamp, clock=clock)
+        elif action == LID_OPEN:
+            self.watcher.handle_lid_event("open", timestamp=timestamp, clock=clock)
+        elif action == SUSPENDED:
+            self.watcher.handle_suspend_event("suspended", timestamp=timestamp, clock=clock)
+        elif action == RESUMED:
+            self.watcher.handle_suspend_event("resumed", timestamp=timestamp, clock=clock)
+
+    def _start_boot(self, boots: list[Boot], i: int) -> int:
+        """Begin rebuilding a boot: forget the previous state, load what's covered.
+
+        Returns:
+            i
+        """
+        watcher = self.watcher
+        watcher.current_event_start = None
+        watcher.current_lid_state = None
+        watcher.current_suspend_state = None
+
+        # The boot and the downtime after it
+        end = boots[i + 1].first if i + 1 < len(boots) else boots[i].last
+        self.inserter.load_covered(boots[i].first, self._clamp(end))
+        return i
+
+    def _clamp(self, when: datetime) -> datetime:
+        """Limit an event end to the end of the history being rebuilt."""
+        return min(when, self.until) if self.until else when
+
+    def _end_boot(self, boot: Boot) -> None:
+        """Close the event still open when the boot ended."""
+        if self.watcher.current_event_start:
+            end = self._clamp(boot.last)
+            self.watcher._close_current_event(end, end.timestamp())
+
+    def _next_boot(self, boots: list[Boot], i: int) -> int:
+        """End boot i, record the downtime after it and begin boot i + 1.
+
+        Returns:
+            i + 1
+        """
+        self._end_boot(boots[i])
+        gap = (self._clamp(boots[i + 1].first) - boots[i].last).total_seconds()
+        if gap > self.boot_gap_threshold:
+            self.watcher._send_event(
+                timestamp=boots[i].last,
+                duration=gap,
+                lid_state=None,
+                suspend_state=None,
+                boot_gap=True,
+                event_source="boot",
+            )
+        return self._start_boot(boots, i + 1)
+
+
+def backfill(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    testing: bool = False,
+    dry_run: bool = False,
+    include_current_boot: bool = False,
+) -> dict[str, Any]:
+    """Rebuild the watcher's bucket from the journal.
+
+    Args:
+        since: Start of the history to rebuild (default: the start of the journal)
+        until: End of the history to rebuild (default: now)
+        testing: Use the testing aw-server
+        dry_run: Rebuild and count the events without inserting them
+        include_current_boot: Also rebuild the running boot, which the watcher
+            records itself while it runs
+
+    Returns:
+        Counts of boots, journal entries and events inserted/skipped, and the time taken
+    """
+    from aw_client import ActivityWatchClient
+
+    from .boots import list_journal_boots
+    from .lid import LidWatcher, default_bucket_id
+    from .state import current_boot_id
+
+    started = time.monotonic()
+    running = "" if include_current_boot else (current_boot_id() or "").replace("-", "")
+    boots = [
+        boot
+        for boot in list_journal_boots()
+        if (since is None or boot.last >= since)
+        and (until is None or boot.first <= until)
+        and (not running or boot.boot_id != running)
+    ]
+
+    client = ActivityWatchClient("aw-watcher-lid-backfill", testing=testing)
+    bucket_id = default_bucket_id()
+    inserter = BatchInserter(client, bucket_id, dry_run=dry_run)
+    watcher = LidWatcher(testing=True)
+    inserter.batch_size = watcher.config.get("spool_batch_size", 500)
+    if not dry_run:
+        client.create_bucket(bucket_id, event_type="systemafkstatus", queued=False)
+
+    backfiller = Backfiller(watcher, inserter, until=until)
+    if boots:
+        backfiller.run(boots, read_journal(since, until))
+
+    return {
+        "boots": len(boots),
+        "entries": backfiller.entries,
+        "inserted": inserter.inserted,
+        "skipped": inserter.skipped,
+        "requests": inserter.requests,
+        "elapsed_s": time.monotonic() - started,
+    }
@@ -1,15 +1,34 @@
 """Boot gap detection for tracking system downtime."""
 
+import json
 import logging
+import time
 from datetime import datetime, timedelta, timezone
+from fnmatch import fnmatchcase
+from functools import partial
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
+
+from .boots import BootList, Downtime, list_journal_boots, list_wtmp_boots
+from .client import POOL_SIZE
+from .state import current_boot_id
 
 if TYPE_CHECKING:
+    from aw_core.models import Event
+
     from .lid import LidWatcher
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROBE_BUCKETS = ["*window*", "*afk*"]
+
+# Maximum number of parallel requests when the query API is unavailable,
+# no more than the client keeps connections open for
+PROBE_WORKERS = POOL_SIZE
+
+# How close the fallback probe narrows down the earliest event
+PROBE_RESOLUTION = timedelta(seconds=1)
+
 
 class BootDetector:
     """Detects boot gaps and creates synthetic events for system downtime."""
@@ -22,6 +41,7 @@ class BootDetector:
         """
         self.watcher = watcher
         self.boot_gap_threshold = watcher.config.get("boot_gap_threshold", 300.0)
+        self.probe_buckets = watcher.config.get("boot_probe_buckets", DEFAULT_PROBE_BUCKETS)
 
     def check_for_boot_gap(self) -> None:
         """Check if there was a gap since last run (system was off/rebooted).
@@ -29,9 +49,19 @@ class BootDetector:
         This is called on startup to detect if the system was shut down
         between the last event and the current boot.
 
-        The boot gap is validated against actual ActivityWatch activity:
+        The gap starts at the shutdown recorded by the previous boot, or else
+        at the end of the last event (from the local state file). With the
+        boot list of the journal (or wtmp), every boot since then is known,
+        so each power-off interval in between becomes its own boot gap event,
+        from the end of one boot to the start of the next, without server
+        queries. A gap whose start isn't known that way (no boot list, or the
+        boot is older than it) is validated against actual ActivityWatch
+        activity:
         - If there's window/AFK activity during the supposed gap, the system was running
         - The boot gap is trimmed to only cover actual downtime
+
+        The activity check needs aw-server, which may still be starting, so it
+        is deferred to the sender and done once the server answers.
         """
         if not self.watcher.config.get("enable_boot_detection", True):
             logger.debug("Boot gap detection disabled")
@@ -45,29 +75,92 @@ class BootDetector:
 
         logger.info(f"System boot time: {boot_time}")
 
-        # Get last event from our lid bucket
-        last_event_time = self._get_last_event_time()
-        if not last_event_time:
+        # A shutdown recorded by the previous boot gives the exact start
+        shutdown_time = self._get_recorded_shutdown()
+        since = shutdown_time or self._get_last_event_time()
+        if not since:
             logger.info("No previous events found, skipping boot gap detection")
             return
 
-        logger.info(f"Last lid event time: {last_event_time}")
+        if not shutdown_time:
+            logger.info(f"Last lid event time: {since}")
 
-        # Calculate initial gap (from last lid event to boot time)
-        gap_duration = (boot_time - last_event_time).total_seconds()
+        if (boot_time - since).total_seconds() <= self.boot_gap_threshold:
+            logger.debug(f"Boot gap too short: {(boot_time - since).total_seconds():.0f}s")
+            return
 
-        if gap_duration <= self.boot_gap_threshold:
-            logger.debug(f"Boot gap too short: {gap_duration:.0f}s")
+        boots = self._list_boots()
+        if boots:
+            downtimes = list(boots.downtimes(since, boot_time))
+        else:
+            downtimes = [Downtime(since, boot_time, exact=False)]
+
+        for downtime in downtimes:
+            if downtime.exact or downtime.start == shutdown_time:
+                self._send_boot_gap(downtime.start, downtime.duration)
+            else:
+                self._send_trimmed_boot_gap(downtime.start, downtime.end)
+
+    def _send_trimmed_boot_gap(self, start: datetime, end: datetime) -> None:
+        """Send a boot gap after trimming it to the time without other activity.
+
+        Args:
+            start: End of the last event before the gap
+            end: When the next boot started
+        """
+        # The activity check waits in the send queue until aw-server answers
+        if self.watcher.sender:
+            self.watcher.sender.enqueue_deferred(partial(self._build_boot_gap_events, start, end))
             return
 
+        trimmed_duration = self._trim_boot_gap(start, end)
+        if trimmed_duration is not None:
+            self._send_boot_gap(start, trimmed_duration)
+
+    def _list_boots(self) -> Optional[BootList]:
+        """Get the boots since the journal (or else wtmp) begins, without the running one.
+
+        Returns:
+            The boots, or None if neither source knows earlier boots
+        """
+        if self.watcher.testing:
+            return None
+
+        # wtmp doesn't know boot IDs, but marks the running boot itself
+        running = (current_boot_id() or "").replace("-", "")
+        for source, list_boots in (("journal", list_journal_boots), ("wtmp", list_wtmp_boots)):
+            try:
+                boots = [
+                    boot for boot in list_boots() if boot.boot_id != running and not boot.running
+                ]
+            except RuntimeError as e:
+                logger.debug(f"No boot list from {source}: {e}")
+                continue
+            if boots:
+                logger.debug(f"{len(boots)} earlier boots in the {source}, since {boots[0].first}")
+                return BootList(boots)
+        return None
+
+    def _trim_boot_gap(self, start: datetime, boot_time: datetime) -> Optional[float]:
+        """Shorten a boot gap to the downtime not covered by other activity.
+
+        Args:
+            start: End of the last event before the gap
+            boot_time: When the system booted
+
+        Returns:
+            The gap duration in seconds, or None if it is below the threshold
+        """
+        gap_duration = (boot_time - start).total_seconds()
+
         # Check for activity during the supposed gap period
         # This catches cases where the lid watcher wasn't running but the system was
-        first_activity = self._get_first_activity_after(last_event_time, boot_time)
+        first_activity = self._get_first_activity_after(start, boot_time)
 
         if first_activity:
             # System was active before boot_time - trim the gap
             actual_gap_end = first_activity
-            actual_gap_duration = (actual_gap_end - last_event_time).total_seconds()
+            actual_gap_duration = (actual_gap_end - start).total_seconds()
 
             logger.info(
                 f"Found activity at {first_activity}, trimming boot gap from "
@@ -78,24 +171,101 @@ class BootDetector:
                 logger.info(
                     f"Trimmed boot gap ({actual_gap_duration:.0f}s) below threshold, skipping"
                 )
-                return
+                return None
 
             gap_duration = actual_gap_duration
 
-        logger.info(
-            f"Boot gap detected: {gap_duration:.0f}s ({gap_duration / 3600:.1f}h) "
-            f"between {last_event_time} and {last_event_time + timedelta(seconds=gap_duration)}"
-        )
+        return gap_duration
+
+    def _build_boot_gap_events(self, start: datetime, boot_time: datetime) -> list["Event"]:
+        """Build the boot gap event (called by the sender once aw-server answers).
+
+        Args:
+            start: End of the last event before the gap
+            boot_time: When the system booted
+
+        Returns:
+            The boot gap event, or nothing if the gap turned out too short
+        """
+        gap_duration = self._trim_boot_gap(start, boot_time)
+        if gap_duration is None:
+            return []
+
+        self._log_boot_gap(start, gap_duration)
+        self.watcher.note_event_end(start + timedelta(seconds=gap_duration))
+        self.watcher._save_state()
+        return [
+            self.watcher._build_event(
+                timestamp=start,
+                duration=gap_duration,
+                lid_state=None,
+                suspend_state=None,
+                boot_gap=True,
+                event_source="boot",
+            )
+        ]
+
+    def _send_boot_gap(self, start: datetime, gap_duration: float) -> None:
+        """Create a synthetic boot gap event if the gap is long enough.
 
-        # Create synthetic boot gap event
+        Args:
+            start: When the downtime started
+            gap_duration: Downtime in seconds
+        """
+        if gap_duration <= self.boot_gap_threshold:
+            logger.debug(f"Boot gap too short: {gap_duration:.0f}s")
+            return
+
+        self._log_boot_gap(start, gap_duration)
         self.watcher._send_event(
-            timestamp=last_event_time,
+            timestamp=start,
             duration=gap_duration,
             lid_state=None,
             suspend_state=None,
             boot_gap=True,
             event_source="boot",
         )
+        self.watcher._save_state()
+
+    def _log_boot_gap(self, start: datetime, gap_duration: float) -> None:
+        """Log a detected boot gap.
+
+        Args:
+            start: When the downtime started
+            gap_duration: Downtime in seconds
+        """
+        logger.info(
+            f"Boot gap detected: {gap_duration:.0f}s ({gap_duration / 3600:.1f}h) "
+            f"between {start} and {start + timedelta(seconds=gap_duration)}"
+        )
+
+    def _get_recorded_shutdown(self) -> Optional[datetime]:
+        """Get the shutdown time recorded by an earlier boot, and forget it.
+
+        Returns:
+            When the previous boot shut down, or None if it wasn't recorded
+        """
+        if not self.watcher.state:
+            return None
+
+        shutdown = self.watcher.state.load().get("shutdown")
+        if not shutdown or shutdown.get("boot_id") == current_boot_id():
+            return None
+
+        try:
+            shutdown_time = datetime.fromisoformat(shutdown["time"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid shutdown record: {e}")
+            return None
+
+        # Consumed: a restart of the watcher during this boot mustn't reuse it
+        try:
+            self.watcher.state.update(shutdown=None)
+        except OSError as e:
+            logger.warning(f"Failed to clear shutdown record: {e}")
+
+        logger.info(f"Previous boot shut down at {shutdown_time}")
+        return shutdown_time
 
     def _get_boot_time(self) -> Optional[datetime]:
         """Get the system boot time.
@@ -127,11 +297,17 @@ class BootDetector:
         return None
 
     def _get_last_event_time(self) -> Optional[datetime]:
-        """Get the timestamp of the last event from ActivityWatch.
+        """Get the end of the last event we sent.
+
+        Taken from the local state file; ActivityWatch is only asked if there
+        is none yet (first run of a version keeping one).
 
         Returns:
-            Last event timestamp, or None if no events exist
+            Last event end, or None if no events exist
         """
+        if self.watcher.last_event_end:
+            return self.watcher.last_event_end
+
         if self.watcher.testing:
             logger.debug("Testing mode, skipping last event lookup")
             return None
@@ -177,8 +353,10 @@ class BootDetector:
     ) -> Optional[datetime]:
         """Check for ActivityWatch activity during a time period.
 
-        Queries window and AFK buckets to see if the system was actually
-        active during the supposed boot gap.
+        Looks for the earliest event in the probe buckets (window and AFK by
+        default) to see if the system was actually active during the supposed
+        boot gap. This is one server-side query; servers without the query API
+        are asked bucket by bucket, in parallel.
 
         Args:
             start_time: Start of the period to check
@@ -190,45 +368,137 @@ class BootDetector:
         if self.watcher.testing:
             return None
 
-        first_activity: Optional[datetime] = None
+        started = time.monotonic()
+        bucket_ids = self._get_probe_bucket_ids()
+        if not bucket_ids:
+            logger.debug("No buckets to check for activity")
+            return None
+
+        try:
+            first_activity = self._query_first_activity(bucket_ids, start_time, end_time)
+            method = "query"
+        except Exception as e:
+            logger.debug(f"Query failed, checking buckets individually: {e}")
+            first_activity = self._fetch_first_activity(bucket_ids, start_time, end_time)
+            method = "get_events"
+
+        duration = time.monotonic() - started
+        self.watcher.metrics.observe("boot_probe_duration_seconds", duration, method=method)
+        logger.info(
+            f"Activity probe of {len(bucket_ids)} bucket(s) via {method} took "
+            f"{duration * 1000:.1f}ms"
+        )
+        return first_activity
+
+    def _get_probe_bucket_ids(self) -> list[str]:
+        """Get the IDs of the buckets to check for activity.
+
+        Returns:
+            Matching bucket IDs (empty if the bucket list can't be fetched)
+        """
+        patterns = list(self.probe_buckets)
+        if not any(c in pattern for pattern in patterns for c in "*?["):
+            # Exact bucket IDs, no need to ask the server
+            return patterns
 
-        # Get all buckets
         try:
             buckets = self.watcher.client.get_buckets()
         except Exception as e:
             logger.error(f"Failed to get buckets: {e}")
+            return []
+
+        return [
+            bucket_id
+            for bucket_id in buckets
+            if any(fnmatchcase(bucket_id, pattern) for pattern in patterns)
+        ]
+
+    def _query_first_activity(
+        self, bucket_ids: list[str], start_time: datetime, end_time: datetime
+    ) -> Optional[datetime]:
+        """Find the earliest event in the buckets with one aw query.
+
+        Args:
+            bucket_ids: Buckets to check
+            start_time: Start of the period to check
+            end_time: End of the period to check
+
+        Returns:
+            Timestamp of the earliest event, or None if there are no events
+        """
+        statements = [f"events = query_bucket({json.dumps(bucket_ids[0])});"]
+        for bucket_id in bucket_ids[1:]:
+            statements.append(f"events = concat(events, query_bucket({json.dumps(bucket_id)}));")
+        statements.append("RETURN = limit_events(sort_by_timestamp(events), 1);")
+
+        result = self.watcher.client.query("\n".join(statements), [(start_time, end_time)])
+        events = result[0]
+        if not events:
             return None
 
-        # Check window and AFK buckets for activity
-        for bucket_id in buckets:
-            if "window" not in bucket_id and "afk" not in bucket_id:
-                continue
+        first_activity = _parse_timestamp(events[0]["timestamp"])
+        logger.debug(f"Found activity at {first_activity}")
+        return first_activity
 
-            try:
-                events = self.watcher.client.get_events(
-                    bucket_id,
-                    start=start_time,
-                    end=end_time,
-                    limit=1,
-                )
+    def _fetch_first_activity(
+        self, bucket_ids: list[str], start_time: datetime, end_time: datetime
+    ) -> Optional[datetime]:
+        """Find the earliest event in the buckets with parallel get_events requests.
 
-                if events:
-                    event = events[0]
-                    event_time = (
-                        event.timestamp if hasattr(event, "timestamp") else event["timestamp"]
-                    )
+        Each request fetches a single event. The server returns the newest
+        event first, so the earliest one is found by bisecting the end of the
+        period (to PROBE_RESOLUTION) rather than by fetching every event in it.
 
-                    # Handle string timestamps
-                    if isinstance(event_time, str):
-                        event_time = datetime.fromisoformat(event_time.replace("Z", "+00:00"))
+        Args:
+            bucket_ids: Buckets to check
+            start_time: Start of the period to check
+            end_time: End of the period to check
 
-                    logger.debug(f"Found activity in {bucket_id} at {event_time}")
+        Returns:
+            Timestamp of the earliest event, or None if there are no events
+        """
 
-                    if first_activity is None or event_time < first_activity:
-                        first_activity = event_time
+        def latest_event_time(bucket_id: str, end: datetime) -> Optional[datetime]:
+            events = self.watcher.client.get_events(bucket_id, start=start_time, end=end, limit=1)
+            return _parse_timestamp(events[0]["timestamp"]) if events else None
 
+        def first_event_time(bucket_id: str) -> Optional[datetime]:
+            try:
+                event_time = latest_event_time(bucket_id, end_time)
+                # Nothing in the bucket between start_time and low
+                low = start_time
+                while event_time is not None and event_time - low > PROBE_RESOLUTION:
+                    middle = low + (event_time - low) / 2
+                    earlier = latest_event_time(bucket_id, middle)
+                    if earlier is None:
+                        low = middle
+                    else:
+                        event_time = earlier
             except Exception as e:
                 logger.debug(f"Failed to query {bucket_id}: {e}")
-                continue
+                return None
 
-        return first_activity
+            if event_time is not None:
+                logger.debug(f"Found activity in {bucket_id} at {event_time}")
+            return event_time
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(bucket_ids))) as executor:
+            times = [t for t in executor.map(first_event_time, bucket_ids) if t is not None]
+
+        return min(times, default=None)
+
+
+def _parse_timestamp(value: Any) -> datetime:
+    """Convert an event timestamp from the server to a datetime.
+
+    Args:
+        value: datetime or ISO 8601 string
+
+    Returns:
+        The timestamp as datetime
+    """
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
@@ -0,0 +1,222 @@
+"""The list of past boots, as recorded by the systemd journal or wtmp."""
+
+import bisect
+import json
+import logging
+import re
+import subprocess
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# A reboot record of `last --time-format iso reboot`: kernel, boot time, end
+WTMP_REBOOT = re.compile(r"^reboot\s+system boot\s+\S+\s+(\S+)\s+(?:- (\S+)|(still running))")
+
+
+@dataclass(frozen=True)
+class Boot:
+    """One boot of the machine: when it started and when it was last seen running.
+
+    `crashed` boots (wtmp records without a shutdown) have an unknown end;
+    `last` is then their start. The `running` boot (the "still running"
+    wtmp record) hasn't ended: `last` is when the list was read.
+    """
+
+    boot_id: str
+    first: datetime
+    last: datetime
+    crashed: bool = False
+    running: bool = False
+
+
+@dataclass(frozen=True)
+class Downtime:
+    """A period the machine was off.
+
+    `exact` is False when the start isn't known from the boot list (the
+    earlier boot is older than the list) but was taken from the caller.
+    """
+
+    start: datetime
+    end: datetime
+    exact: bool
+
+    @property
+    def duration(self) -> float:
+        """Length in seconds."""
+        return (self.end - self.start).total_seconds()
+
+
+class BootList:
+    """Boots sorted by start time, with bisect lookups."""
+
+    def __init__(self, boots: list[Boot]) -> None:
+        """Index some boots.
+
+        Args:
+            boots: The boots, in any order
+        """
+        self.boots = sorted(boots, key=lambda boot: boot.first)
+        self._firsts = [boot.first for boot in self.boots]
+
+    def __len__(self) -> int:
+        return len(self.boots)
+
+    def boot_at(self, when: datetime) -> Optional[Boot]:
+        """Get the boot running at a time (the last one started by then).
+
+        Args:
+            when: The time
+
+        Returns:
+            The boot, or None if the list starts later
+        """
+        i = bisect.bisect_right(self._firsts, when)
+        return self.boots[i - 1] if i else None
+
+    def downtimes(self, since: datetime, until: datetime) -> Iterator[Downtime]:
+        """Find the periods the machine was off between two times.
+
+        Every boot starting in between ends a downtime that began when the
+        boot before it ended. The first downtime begins at `since` if the
+        boot running then isn't in the list or crashed (inexact); later
+        downtimes after a crashed boot are skipped, as when it went down is
+        unknown.
+
+        Args:
+            since: A time the machine was known to run (e.g. the end of the last event)
+            until: Start of the boot to find the downtimes before
+
+        Yields:
+            The downtimes, oldest first (only those with a positive length)
+        """
+        i = bisect.bisect_right(self._firsts, since)
+        previous = self.boots[i - 1] if i else None
+        if previous and not previous.crashed:
+            start, exact = max(since, previous.last), True
+        else:
+            start, exact = since, False
+        known = True
+
+        for boot in self.boots[i : bisect.bisect_left(self._firsts, until)]:
+            if not known:
+                logger.info(f"The boot before {boot.first} crashed, its downtime is unknown")
+            elif start < boot.first:
+                yield Downtime(start, boot.first, exact)
+            start, exact, known = boot.last, True, not boot.crashed
+
+        if not known:
+            logger.info(f"The boot before {until} crashed, its downtime is unknown")
+        elif start < until:
+            yield Downtime(start, until, exact)
+
+
+def list_journal_boots() -> list[Boot]:
+    """Read the boots the journal knows about.
+
+    Returns:
+        Boots, oldest first, with the times of their first and last journal entries
+
+    Raises:
+        RuntimeError: If journalctl is missing or can't list the boots
+    """
+    try:
+        result = subprocess.run(
+            ["journalctl", "--list-boots", "--output=json", "--no-pager"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise RuntimeError(f"Could not list boots with journalctl: {e}") from e
+
+    try:
+        return parse_journal_boots(result.stdout)
+    except (ValueError, KeyError, TypeError) as e:
+        raise RuntimeError(f"Unexpected journalctl --list-boots output: {e}") from e
+
+
+def parse_journal_boots(output: str) -> list[Boot]:
+    """Parse `journalctl --list-boots --output=json`.
+
+    Args:
+        output: The JSON output (an empty journal gives no output at all)
+
+    Returns:
+        Boots, oldest first
+    """
+    if not output.strip():
+        return []
+    boots = [
+        Boot(
+            boot_id=record["boot_id"],
+            first=_from_usec(record["first_entry"]),
+            last=_from_usec(record["last_entry"]),
+        )
+        for record in json.loads(output)
+    ]
+    return sorted(boots, key=lambda boot: boot.first)
+
+
+def list_wtmp_boots() -> list[Boot]:
+    """Read the boots recorded in wtmp, for systems without a persistent journal.
+
+    Returns:
+        Boots, oldest first, from their boot to their shutdown time
+
+    Raises:
+        RuntimeError: If `last` is missing or fails
+    """
+    try:
+        result = subprocess.run(
+            ["last", "--time-format", "iso", "reboot"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise RuntimeError(f"Could not list boots with last: {e}") from e
+    return parse_wtmp_boots(result.stdout)
+
+
+def parse_wtmp_boots(output: str) -> list[Boot]:
+    """Parse `last --time-format iso reboot`.
+
+    Args:
+        output: The output, newest boot first
+
+    Returns:
+        Boots, oldest first; the running boot is marked running and ends
+        now, boots that ended without a shutdown record ("crash") are marked
+        crashed
+    """
+    boots = []
+    for line in output.splitlines():
+        match = WTMP_REBOOT.match(line)
+        if not match:
+            continue
+        try:
+            first = datetime.fromisoformat(match[1])
+        except ValueError:
+            logger.debug(f"Ignoring wtmp record: {line}")
+            continue
+
+        crashed = running = False
+        if match[3]:
+            last, running = datetime.now(timezone.utc), True
+        else:
+            try:
+                last = datetime.fromisoformat(match[2])
+            except ValueError:
+                # "crash" (or "down"): no shutdown was recorded
+                last, crashed = first, True
+        boots.append(Boot(f"wtmp-{first.timestamp():.0f}", first, last, crashed, running))
+    return sorted(boots, key=lambda boot: boot.first)
+
+
+def _from_usec(value: int) -> datetime:
+    """Convert a journal timestamp (microseconds since the epoch) to a datetime."""
+    return datetime.fromtimestamp(int(value) / 1_000_000, tz=timezone.utc)
@@ -0,0 +1,100 @@
+"""ActivityWatchClient sending over a pooled keep-alive connection, with timeouts."""
+
+import json
+import logging
+from typing import Any, Optional, Union
+
+import requests
+from aw_client import ActivityWatchClient
+from aw_client.client import always_raise_for_request_errors
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open to aw-server: the sender sends one request at a
+# time, the boot probe may add another
+POOL_SIZE = 2
+
+
+class SessionClient(ActivityWatchClient):
+    """ActivityWatchClient whose requests share one keep-alive session.
+
+    aw-client opens a new connection for every request and waits for the
+    server without a timeout. Here all requests go through a requests
+    Session with a small connection pool, so heartbeats reuse the open
+    connection, and every request has short connect and read timeouts, so
+    an unreachable server fails fast and the sender's retry takes over.
+    """
+
+    def __init__(
+        self,
+        client_name: str,
+        testing: bool = False,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 10.0,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the client.
+
+        Args:
+            client_name: Client name reported to aw-server
+            testing: Use the testing aw-server
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for a response
+            **kwargs: Passed to ActivityWatchClient (host, port, protocol)
+        """
+        super().__init__(client_name, testing=testing, **kwargs)
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @always_raise_for_request_errors
+    def _get(self, endpoint: str, params: Optional[dict] = None) -> requests.Response:
+        return self.session.get(self._url(endpoint), params=params, timeout=self.timeout)
+
+    @always_raise_for_request_errors
+    def _post(
+        self,
+        endpoint: str,
+        data: Union[list[Any], dict[str, Any]],
+        params: Optional[dict] = None,
+    ) -> requests.Response:
+        return self.session.post(
+            self._url(endpoint),
+            data=json.dumps(data).encode(),
+            headers={"Content-type": "application/json", "charset": "utf-8"},
+            params=params,
+            timeout=self.timeout,
+        )
+
+    @always_raise_for_request_errors
+    def _delete(self, endpoint: str, data: Any = None) -> requests.Response:
+        return self.session.delete(
+            self._url(endpoint),
+            data=json.dumps(data or {}),
+            headers={"Content-type": "application/json"},
+            timeout=self.timeout,
+        )
+
+    def warm(self) -> None:
+        """Replace the pooled connections with a fresh one to aw-server.
+
+        After a suspend the pooled connection is usually dead (the server or a
+        NAT forgot it), so the next send would fail on it first. This drops
+        it and opens a new one with a cheap request, ahead of the next event.
+
+        Raises:
+            requests.RequestException: If aw-server can't be reached
+        """
+        for adapter in self.session.adapters.values():
+            adapter.close()
+        self._get("info")
+
+    def disconnect(self) -> None:
+        """Stop the request queue, if it was started, and close the connections."""
+        # aw-client's disconnect() joins the queue thread, which fails if it never ran
+        if self.request_queue.is_alive():
+            super().disconnect()
+        self.session.close()
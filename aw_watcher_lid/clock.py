@@ -0,0 +1,40 @@
+"""Clock helpers: event durations from a clock that wall-clock steps don't affect."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+# CLOCK_BOOTTIME keeps counting during suspend, CLOCK_MONOTONIC doesn't
+CLOCK = getattr(time, "CLOCK_BOOTTIME", time.CLOCK_MONOTONIC)
+
+
+def boottime() -> float:
+    """Read the event clock.
+
+    Returns:
+        Seconds since boot, including time spent suspended where supported
+    """
+    return time.clock_gettime(CLOCK)
+
+
+def wall_time(clock: float) -> datetime:
+    """Convert a boottime() reading to wall-clock time.
+
+    Args:
+        clock: A boottime() value
+
+    Returns:
+        The wall-clock time at which boottime() returned that value
+    """
+    return datetime.now(timezone.utc) - timedelta(seconds=boottime() - clock)
+
+
+def clock_at(timestamp: datetime) -> float:
+    """Estimate the boottime() value at a recent wall-clock time.
+
+    Args:
+        timestamp: Wall-clock time, e.g. from a journal entry
+
+    Returns:
+        The boottime() value at that time
+    """
+    return boottime() - (datetime.now(timezone.utc) - timestamp).total_seconds()
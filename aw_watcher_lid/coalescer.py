@@ -0,0 +1,125 @@
+"""Client-side heartbeat coalescing, with the same merge rules as aw-server."""
+
+import sys
+import time
+from typing import Optional
+
+from aw_core.models import Event
+from aw_transform import heartbeat_merge
+
+# (first spool seq, last spool seq, merged event)
+Held = tuple[int, int, Event]
+
+
+class Coalescer:
+    """Holds the newest heartbeat back and merges the following ones into it.
+
+    A heartbeat with the same data inside the pulsetime window is merged
+    locally, exactly as aw-server would merge it into the latest event of the
+    bucket, so sending the merged event gives the same bucket contents with
+    fewer requests. The held event is handed back for sending when a
+    heartbeat doesn't merge (the state changed), when it has been held for
+    `interval` seconds, or on flush().
+    """
+
+    def __init__(self, pulsetime: float, interval: float, max_events: int = 500) -> None:
+        """Initialize the coalescer.
+
+        Args:
+            pulsetime: Heartbeat merge window in seconds (as sent to aw-server)
+            interval: Longest time in seconds to hold an event back
+            max_events: Most heartbeats merged into one held event
+        """
+        self.pulsetime = pulsetime
+        self.interval = interval
+        self.max_events = max_events
+
+        self.heartbeats = 0
+        self.merged = 0
+
+        self._held: Optional[Held] = None
+        self._held_count = 0
+        self._held_since = 0.0
+
+    @property
+    def held_count(self) -> int:
+        """Number of heartbeats merged into the held event."""
+        return self._held_count
+
+    @property
+    def held_through(self) -> int:
+        """Spool seq of the last heartbeat held back (0 if none)."""
+        return self._held[1] if self._held else 0
+
+    @property
+    def saved_ratio(self) -> float:
+        """Share of heartbeats that didn't need a request of their own."""
+        return self.merged / self.heartbeats if self.heartbeats else 0.0
+
+    def add(self, seq: int, event: Event) -> Optional[Held]:
+        """Offer the next heartbeat.
+
+        Args:
+            seq: Spool sequence number of the event
+            event: The heartbeat
+
+        Returns:
+            The previously held event if the new one didn't merge into it
+            (it must be sent now), else None
+        """
+        self.heartbeats += 1
+        if self._held and self._held_count < self.max_events:
+            first_seq, _last_seq, held = self._held
+            if heartbeat_merge(held, event, self.pulsetime) is not None:
+                self._held = (first_seq, seq, held)
+                self._held_count += 1
+                self.merged += 1
+                return None
+
+        ready = self.flush()
+        # A copy: heartbeat_merge() extends the held event in place
+        self._held = (
+            seq,
+            seq,
+            Event(timestamp=event.timestamp, duration=event.duration, data=dict(event.data)),
+        )
+        self._held_count = 1
+        self._held_since = time.monotonic()
+        return ready
+
+    def due_in(self) -> Optional[float]:
+        """Seconds until the held event must be sent (None if nothing is held)."""
+        if not self._held:
+            return None
+        return max(0.0, self._held_since + self.interval - time.monotonic())
+
+    def flush(self) -> Optional[Held]:
+        """Hand back the held event, if any.
+
+        Returns:
+            The held event with the spool range it covers, or None
+        """
+        held, self._held, self._held_count = self._held, None, 0
+        return held
+
+
+def merge_heartbeats(events: list[Event], pulsetime: float) -> list[Event]:
+    """Merge consecutive heartbeats the way aw-server would merge them one by one.
+
+    Args:
+        events: Heartbeats, oldest first
+        pulsetime: Heartbeat merge window in seconds (as sent to aw-server)
+
+    Returns:
+        The events aw-server would store for them (copies, the input is left as is)
+    """
+    merger = Coalescer(pulsetime, interval=float("inf"), max_events=sys.maxsize)
+    merged = []
+    for seq, event in enumerate(events, 1):
+        ready = merger.add(seq, event)
+        if ready:
+            merged.append(ready[2])
+    held = merger.flush()
+    if held:
+        merged.append(held[2])
+    return merged
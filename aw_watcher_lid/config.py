@@ -1,8 +1,31 @@
 """Configuration management for aw-watcher-lid."""
 
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
 from aw_core.config import load_config_toml
 
 DEFAULT_CONFIG = """
+# Event listener: "auto" (D-Bus, falling back to journal), "dbus", "dbus-fast",
+# "evdev", "journal" or "fusion"
+# "dbus-fast" talks to logind with the pure-Python dbus-fast on asyncio
+# (no dbus-python/PyGObject needed; "auto" uses it when dbus-python is missing)
+# "evdev" reads the kernel lid switch directly (lid events only, needs the "input" group)
+# "fusion" runs the fusion_listeners at once and records each change once,
+# from the source that reported it first
+listener = "auto"
+
+# Listeners run by the "fusion" listener (the ones that can't run here are skipped)
+fusion_listeners = ["dbus", "evdev", "journal"]
+
+# Reports of the same change from different sources at most this many
+# seconds apart (by event time) are one change
+fusion_window = 5.0
+
+# Lid switch input device for the evdev listener (autodetected if empty)
+evdev_device = ""
+
 # Enable boot gap detection
 enable_boot_detection = true
 
@@ -10,14 +33,166 @@ enable_boot_detection = true
 # Gaps longer than this are recorded as system downtime
 boot_gap_threshold = 300.0
 
-# Polling interval when using journal fallback (seconds)
-journal_poll_interval = 60.0
+# Buckets checked for activity during a supposed boot gap (glob patterns on
+# bucket IDs; with exact IDs only, the bucket list isn't fetched)
+boot_probe_buckets = ["*window*", "*afk*"]
+
+# Lid polling interval (seconds), only used when logind doesn't signal
+# LidClosed changes via PropertiesChanged (0: don't poll)
+lid_poll_interval = 5.0
+
+# Never wake up while nothing happens: block on file descriptors only, with
+# no LidClosed polling (use the evdev listener if logind doesn't signal lid
+# changes) and stats.json written only at startup and exit
+zero_wakeup_idle = false
+
+# Hold a logind delay inhibitor so suspend waits until the suspend event is
+# safely recorded (D-Bus listener only, logind caps the delay at InhibitDelayMaxSec)
+use_inhibitors = true
+
+# Maximum number of events waiting to be sent to aw-server
+sender_queue_size = 1000
+
+# What to do when the send queue is full: "drop_oldest", "drop_newest" or
+# "block" (wait up to sender_block_timeout seconds, then drop the new event)
+sender_overflow = "drop_oldest"
+sender_block_timeout = 0.05
+
+# Seconds before retrying when aw-server can't be reached; the wait doubles
+# (with jitter) after every failure in a row, up to sender_retry_max_interval
+sender_retry_interval = 5.0
+sender_retry_max_interval = 300.0
+
+# Timeouts (seconds) for connecting to aw-server and for its answer; all
+# requests share one keep-alive connection, renewed after every resume
+server_connect_timeout = 2.0
+server_read_timeout = 10.0
+
+# Merge consecutive heartbeats with the same data before sending, like
+# aw-server would, holding an event back at most this many seconds (0: off)
+sender_coalesce_interval = 10.0
+
+# Longest time to spend sending queued events on shutdown (seconds)
+sender_flush_timeout = 5.0
+
+# Keep unsent events in an on-disk spool (in the ActivityWatch data dir) so
+# they survive aw-server downtime and restarts
+spool_enabled = true
+
+# Maximum number of events per request when replaying a spooled backlog
+spool_batch_size = 500
+
+# Serve metrics in Prometheus text format on http://127.0.0.1:<port>/metrics
+# (0: disabled)
+metrics_port = 0
+
+# Rewrite stats.json in the ActivityWatch data dir with the metrics every
+# this many seconds (0: disabled)
+stats_file_interval = 0.0
+
+# How the journal listener recognizes lid and suspend entries; each key given
+# replaces its default (see aw_watcher_lid/journal_classifier.py):
+#   message_ids: systemd catalog MESSAGE_ID to event ("lid_closed", "lid_open",
+#     "suspended" or "resumed")
+#   identifiers: SYSLOG_IDENTIFIER/_SYSTEMD_UNIT values of the entries without
+#     a known MESSAGE_ID whose message is matched against the patterns
+#   patterns: event to regular expression for the whole message
+[journal_rules]
+# identifiers = ["systemd-logind", "systemd-sleep"]
 """.strip()
 
 
+# Listener names for "listener" (and, without "auto" and "fusion", for "fusion_listeners")
+LISTENERS = ("auto", "dbus", "dbus-fast", "evdev", "journal", "fusion")
+
+# Settings a reload can't apply to the running watcher (the boot gap check
+# only runs at startup)
+RESTART_SETTINGS = (
+    "listener",
+    "fusion_listeners",
+    "evdev_device",
+    "spool_enabled",
+    "metrics_port",
+    "stats_file_interval",
+    "enable_boot_detection",
+    "boot_gap_threshold",
+    "boot_probe_buckets",
+)
+
+# Settings that must be at least 1
+POSITIVE_SETTINGS = ("sender_queue_size", "spool_batch_size")
+
+
 def load_config() -> dict:
     """Load configuration using ActivityWatch standard approach.
 
     Config location: ~/.config/activitywatch/aw-watcher-lid/aw-watcher-lid.toml
     """
     return load_config_toml("aw-watcher-lid", DEFAULT_CONFIG)
+
+
+def config_path() -> Path:
+    """Path of the config file load_config() reads."""
+    from aw_core.dirs import get_config_dir
+
+    return Path(get_config_dir("aw-watcher-lid")) / "aw-watcher-lid.toml"
+
+
+def validate_config(config: Mapping[str, Any]) -> None:
+    """Check a loaded config, at startup and before it replaces the running one.
+
+    Every setting must have the type of its default (any number where the
+    default is a float), numbers can't be negative, and names must be known.
+    Plain Python values and tomlkit items are both accepted.
+
+    Args:
+        config: Config as returned by load_config()
+
+    Raises:
+        ValueError: Listing every invalid setting
+    """
+    import tomlkit
+
+    from .journal_classifier import JournalClassifier
+    from .sender import OVERFLOW_POLICIES
+
+    problems = []
+    # Plain Python values; config values may be plain or tomlkit items (subclasses)
+    for key, default in tomlkit.parse(DEFAULT_CONFIG).unwrap().items():
+        value = config.get(key, default)
+        if isinstance(default, bool):
+            valid, expected = isinstance(value, bool), "boolean"
+        elif isinstance(default, (int, float)):
+            types = int if isinstance(default, int) else (int, float)
+            valid = isinstance(value, types) and not isinstance(value, bool)
+            expected = "whole number" if isinstance(default, int) else "number"
+            if valid and value < 0:
+                problems.append(f"{key} can't be negative")
+        elif isinstance(default, list):
+            valid = isinstance(value, list) and all(isinstance(item, str) for item in value)
+            expected = "list of strings"
+        elif isinstance(default, dict):
+            valid, expected = isinstance(value, Mapping), "table"
+        else:
+            valid, expected = isinstance(value, str), "string"
+        if not valid:
+            problems.append(f"{key} must be a {expected}, not {value!r}")
+
+    for key in POSITIVE_SETTINGS:
+        if config.get(key, 1) == 0:
+            problems.append(f"{key} must be at least 1")
+    if config.get("listener", "auto") not in LISTENERS:
+        problems.append(f"Unknown listener: {config['listener']}")
+    fusion_listeners = config.get("fusion_listeners", [])
+    for name in fusion_listeners if isinstance(fusion_listeners, list) else []:
+        if name not in LISTENERS[1:-1]:
+            problems.append(f"Unknown fusion listener: {name}")
+    if config.get("sender_overflow", "drop_oldest") not in OVERFLOW_POLICIES:
+        problems.append(f"Unknown sender_overflow policy: {config['sender_overflow']}")
+    try:
+        JournalClassifier(config.get("journal_rules"))
+    except (TypeError, ValueError, AttributeError) as e:
+        problems.append(f"journal_rules: {e}")
+
+    if problems:
+        raise ValueError("; ".join(problems))
@@ -0,0 +1,297 @@
+"""D-Bus listener for logind events on asyncio, using the pure-Python dbus-fast."""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Optional
+
+from .clock import boottime
+from .dbus_listener import (
+    INTROSPECTABLE_IFACE,
+    LOGIND_BUS_NAME,
+    LOGIND_MANAGER_IFACE,
+    LOGIND_PATH,
+    PROPERTIES_IFACE,
+    LogindListener,
+)
+
+if TYPE_CHECKING:
+    from .lid import LidWatcher
+
+logger = logging.getLogger(__name__)
+
+DBUS_BUS_NAME = "org.freedesktop.DBus"
+DBUS_PATH = "/org/freedesktop/DBus"
+DBUS_IFACE = "org.freedesktop.DBus"
+
+# Signals we subscribe to, as (interface, member)
+SIGNALS = (
+    (LOGIND_MANAGER_IFACE, "PrepareForSleep"),
+    (LOGIND_MANAGER_IFACE, "PrepareForShutdown"),
+    (PROPERTIES_IFACE, "PropertiesChanged"),
+)
+
+
+def match_rule(interface: str, member: str) -> str:
+    """Build the bus match rule for a logind signal.
+
+    Args:
+        interface: Interface the signal belongs to
+        member: Signal name
+
+    Returns:
+        The rule for org.freedesktop.DBus.AddMatch
+    """
+    return (
+        f"type='signal',sender='{LOGIND_BUS_NAME}',path='{LOGIND_PATH}',"
+        f"interface='{interface}',member='{member}'"
+    )
+
+
+class DbusFastListener(LogindListener):
+    """Listens for lid and suspend events via D-Bus (systemd-logind).
+
+    Speaks the D-Bus wire protocol over the system bus socket with dbus-fast on
+    an asyncio event loop, so neither dbus-python nor PyGObject/GLib is needed.
+    """
+
+    name = "dbus-fast"
+
+    def __init__(self, watcher: "LidWatcher") -> None:
+        """Initialize the D-Bus listener.
+
+        Args:
+            watcher: The LidWatcher instance to notify of events
+        """
+        super().__init__(watcher)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        # Keeps scheduled calls alive until they finish
+        self._tasks: set[asyncio.Task] = set()
+        # The LidClosed polling task, if polling
+        self._poll_task: Optional[asyncio.Task] = None
+
+        try:
+            from dbus_fast import BusType, Message, MessageType
+            from dbus_fast.aio import MessageBus
+
+            self.BusType = BusType
+            self.Message = Message
+            self.MessageType = MessageType
+            self.MessageBus = MessageBus
+        except ImportError as e:
+            raise ImportError(
+                "dbus-fast not available. Install with: pip install aw-watcher-lid[dbus-fast]"
+            ) from e
+
+    def start(self) -> None:
+        """Start listening for D-Bus events (blocks until stop())."""
+        asyncio.run(self._run())
+
+    async def _run(self) -> None:
+        """Connect to the system bus and handle logind signals until stopped."""
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+
+        self.bus = await self.MessageBus(
+            bus_type=self.BusType.SYSTEM, negotiate_unix_fd=True
+        ).connect()
+        try:
+            self.bus.add_message_handler(self._on_message)
+            for interface, member in SIGNALS:
+                await self._call(
+                    DBUS_BUS_NAME,
+                    DBUS_PATH,
+                    DBUS_IFACE,
+                    "AddMatch",
+                    "s",
+                    [match_rule(interface, member)],
+                )
+
+            logger.info("D-Bus listener (dbus-fast) started, waiting for events...")
+
+            # Make logind wait for us to record suspend and shutdown events
+            await self._inhibit("sleep")
+            await self._inhibit("shutdown")
+
+            # Check initial lid state
+            await self._read_lid_closed()
+
+            # Only poll when logind has told us it won't signal LidClosed changes
+            self.lid_mode = await self._detect_lid_mode()
+            self._log_lid_mode()
+            if self.lid_mode == "poll":
+                self._restart_lid_poll()
+
+            self.watcher.listener_ready()
+            await self._stopping.wait()
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            self.bus.disconnect()
+            self.loop = None
+
+    def stop(self) -> None:
+        """Stop the D-Bus listener (may be called from any thread)."""
+        self._release_all_inhibitors()
+
+        loop, stopping = self.loop, self._stopping
+        if loop is None or stopping is None:
+            return
+        try:
+            loop.call_soon_threadsafe(stopping.set)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    async def _call(
+        self, destination: str, path: str, interface: str, member: str, signature: str, body: list
+    ) -> Any:
+        """Call a D-Bus method.
+
+        Returns:
+            The reply message
+
+        Raises:
+            RuntimeError: If the call returned a D-Bus error
+        """
+        reply = await self.bus.call(  # type: ignore[union-attr]
+            self.Message(
+                destination=destination,
+                path=path,
+                interface=interface,
+                member=member,
+                signature=signature,
+                body=body,
+            )
+        )
+        if reply.message_type == self.MessageType.ERROR:
+            raise RuntimeError(f"{reply.error_name}: {reply.body[0] if reply.body else ''}")
+        return reply
+
+    def _on_message(self, message: Any) -> None:
+        """Route logind signals to the shared handlers.
+
+        Args:
+            message: Any message the bus delivered to us
+        """
+        if message.message_type != self.MessageType.SIGNAL or message.path != LOGIND_PATH:
+            return
+
+        if message.interface == LOGIND_MANAGER_IFACE:
+            if message.member == "PrepareForSleep":
+                self._on_prepare_for_sleep(message.body[0])
+            elif message.member == "PrepareForShutdown":
+                self._on_prepare_for_shutdown(message.body[0])
+        elif message.interface == PROPERTIES_IFACE and message.member == "PropertiesChanged":
+            interface_name, changed, invalidated = message.body
+            self._on_properties_changed(
+                interface_name,
+                {name: variant.value for name, variant in changed.items()},
+                invalidated,
+            )
+
+    def _spawn(self, coroutine: Any) -> asyncio.Task:
+        """Run a coroutine on the listener loop without waiting for it."""
+        task = self.loop.create_task(coroutine)  # type: ignore[union-attr]
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _reschedule_lid_poll(self) -> None:
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._restart_lid_poll)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    def _restart_lid_poll(self) -> None:
+        """Replace the polling task by one with the current interval (on the loop)."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self.lid_poll_interval > 0:
+            self._poll_task = self._spawn(self._poll_lid_state())
+
+    def _take_inhibitor(self, what: str) -> None:
+        """Take a logind delay inhibitor lock (in the background).
+
+        Args:
+            what: Operation to delay ("sleep" or "shutdown")
+        """
+        if self.use_inhibitors and self.loop is not None:
+            self._spawn(self._inhibit(what))
+
+    def _check_lid_state(self) -> None:
+        """Check current lid state via D-Bus (in the background)."""
+        if self.loop is not None:
+            self._spawn(self._read_lid_closed())
+
+    async def _inhibit(self, what: str) -> None:
+        """Take a logind delay inhibitor lock.
+
+        Args:
+            what: Operation to delay ("sleep" or "shutdown")
+        """
+        if not self.use_inhibitors:
+            return
+
+        try:
+            with self.watcher.metrics.time("dbus_call_duration_seconds", call="Inhibit"):
+                reply = await self._call(
+                    LOGIND_BUS_NAME,
+                    LOGIND_PATH,
+                    LOGIND_MANAGER_IFACE,
+                    "Inhibit",
+                    "ssss",
+                    [what, "aw-watcher-lid", f"Recording {what} event", "delay"],
+                )
+            fd = reply.unix_fds[reply.body[0]]
+        except Exception as e:
+            logger.warning(f"Could not take {what} delay inhibitor: {e}")
+            return
+
+        self._keep_inhibitor(what, fd)
+
+    async def _read_lid_closed(self) -> None:
+        """Read logind's LidClosed property and report changes."""
+        try:
+            with self.watcher.metrics.time("dbus_call_duration_seconds", call="LidClosed"):
+                reply = await self._call(
+                    LOGIND_BUS_NAME,
+                    LOGIND_PATH,
+                    PROPERTIES_IFACE,
+                    "Get",
+                    "ss",
+                    [LOGIND_MANAGER_IFACE, "LidClosed"],
+                )
+        except Exception as e:
+            # LidClosed property not available on this system
+            logger.debug(f"LidClosed property not available: {e}")
+            return
+
+        self._apply_lid_closed(bool(reply.body[0].value), boottime())
+
+    async def _detect_lid_mode(self) -> str:
+        """Decide how lid changes will be detected.
+
+        Returns:
+            "signal", "poll" or "unavailable", like DbusListener._detect_lid_mode()
+        """
+        try:
+            reply = await self._call(
+                LOGIND_BUS_NAME, LOGIND_PATH, INTROSPECTABLE_IFACE, "Introspect", "", []
+            )
+            return self._lid_mode(reply.body[0])
+        except Exception as e:
+            logger.warning(f"Failed to introspect logind, falling back to polling: {e}")
+            return "poll"
+
+    async def _poll_lid_state(self) -> None:
+        """Read LidClosed every lid_poll_interval seconds."""
+        while True:
+            await asyncio.sleep(self.lid_poll_interval)
+            self.watcher.metrics.inc("listener_wakeups_total", listener=self.name)
+            await self._read_lid_closed()
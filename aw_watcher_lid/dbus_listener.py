@@ -1,26 +1,304 @@
 """D-Bus listener for lid and suspend events via systemd-logind."""
 
 import logging
-from typing import TYPE_CHECKING, Any, Optional
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from .clock import boottime
 
 if TYPE_CHECKING:
     from .lid import LidWatcher
 
 logger = logging.getLogger(__name__)
 
+LOGIND_BUS_NAME = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+LOGIND_MANAGER_IFACE = "org.freedesktop.login1.Manager"
+PROPERTIES_IFACE = "org.freedesktop.DBus.Properties"
+INTROSPECTABLE_IFACE = "org.freedesktop.DBus.Introspectable"
+EMITS_CHANGED_ANNOTATION = "org.freedesktop.DBus.Property.EmitsChangedSignal"
+
+# Arguments of Properties.Get reading LidClosed, built once
+LID_CLOSED_ARGS = (LOGIND_MANAGER_IFACE, "LidClosed")
+
+
+def lid_closed_emits_changed(introspection_xml: str) -> Optional[str]:
+    """Find out whether logind announces LidClosed changes via PropertiesChanged.
+
+    Args:
+        introspection_xml: Introspection data for the logind manager object
+
+    Returns:
+        The effective EmitsChangedSignal value for LidClosed ("true",
+        "invalidates", "const" or "false"), or None if the property is missing
+    """
+    root = ET.fromstring(introspection_xml)
+    for interface in root.findall("interface"):
+        if interface.get("name") != LOGIND_MANAGER_IFACE:
+            continue
+
+        # Per the D-Bus spec the annotation defaults to "true" and a
+        # property-level annotation overrides the interface-level one
+        emits = "true"
+        for annotation in interface.findall("annotation"):
+            if annotation.get("name") == EMITS_CHANGED_ANNOTATION:
+                emits = annotation.get("value", emits)
+
+        for prop in interface.findall("property"):
+            if prop.get("name") != "LidClosed":
+                continue
+            for annotation in prop.findall("annotation"):
+                if annotation.get("name") == EMITS_CHANGED_ANNOTATION:
+                    emits = annotation.get("value", emits)
+            return emits
+
+    return None
+
 
-class DbusListener:
-    """Listens for lid and suspend events via D-Bus (systemd-logind)."""
+class LogindListener(ABC):
+    """Lid, suspend and shutdown handling shared by the D-Bus listener backends.
+
+    Subclasses talk to logind (signal subscription, property reads, inhibitor
+    locks); the signal handlers and inhibitor bookkeeping live here.
+    """
+
+    # Listener name in metrics and logs
+    name = "dbus"
 
     def __init__(self, watcher: "LidWatcher") -> None:
-        """Initialize the D-Bus listener.
+        """Initialize the listener state.
 
         Args:
             watcher: The LidWatcher instance to notify of events
         """
         self.watcher = watcher
-        self.loop: Optional[Any] = None
         self.bus: Optional[Any] = None
+        self.lid_poll_interval = _lid_poll_interval(watcher.config)
+
+        # How lid changes reach us: "signal", "poll" or "unavailable" (set by start())
+        self.lid_mode: Optional[str] = None
+
+        # Delay inhibitor file descriptors we hold, by inhibited operation
+        self.use_inhibitors = watcher.config.get("use_inhibitors", True)
+        self._inhibitors: dict[str, int] = {}
+        self._inhibitor_lock = threading.Lock()
+        self.inhibitor_hold_times: list[float] = []
+
+    @abstractmethod
+    def _take_inhibitor(self, what: str) -> None:
+        """Take a logind delay inhibitor lock.
+
+        Args:
+            what: Operation to delay ("sleep" or "shutdown")
+        """
+
+    @abstractmethod
+    def _check_lid_state(self) -> None:
+        """Read logind's LidClosed property and report changes."""
+
+    @abstractmethod
+    def _reschedule_lid_poll(self) -> None:
+        """Restart LidClosed polling with the current lid_poll_interval (from any thread)."""
+
+    def apply_config(self, config: dict) -> None:
+        """Apply a reloaded config: the lid polling interval changes right away.
+
+        Args:
+            config: The new, validated config
+        """
+        interval = _lid_poll_interval(config)
+        if interval == self.lid_poll_interval:
+            return
+        self.lid_poll_interval = interval
+        # Before start() has decided, it picks up the new interval itself
+        if self.lid_mode == "poll":
+            self._reschedule_lid_poll()
+            self._log_lid_mode()
+
+    def _lid_mode(self, introspection_xml: str) -> str:
+        """Decide how lid changes will be detected from logind's introspection data.
+
+        Returns:
+            "signal" if logind emits PropertiesChanged for LidClosed, "poll" if
+            it doesn't, "unavailable" if there is no LidClosed property at all
+        """
+        emits = lid_closed_emits_changed(introspection_xml)
+        logger.debug(f"LidClosed EmitsChangedSignal: {emits}")
+        if emits is None:
+            return "unavailable"
+        if emits in ("true", "invalidates"):
+            return "signal"
+        return "poll"
+
+    def _log_lid_mode(self) -> None:
+        if self.lid_mode == "signal":
+            logger.info("Lid changes delivered by logind PropertiesChanged signal")
+        elif self.lid_mode == "poll" and self.lid_poll_interval > 0:
+            logger.info(
+                f"LidClosed changes are not signalled, polling every {self.lid_poll_interval}s"
+            )
+        elif self.lid_mode == "poll":
+            logger.warning(
+                "LidClosed changes are not signalled and polling is off, the lid state is only "
+                "read again on resume (the evdev listener sees every lid change)"
+            )
+        else:
+            logger.info("LidClosed property not available, only tracking suspend/resume")
+
+    def _release_all_inhibitors(self) -> None:
+        """Close every inhibitor we hold."""
+        with self._inhibitor_lock:
+            for fd in self._inhibitors.values():
+                os.close(fd)
+            self._inhibitors.clear()
+
+    def _keep_inhibitor(self, what: str, fd: int) -> None:
+        """Store a newly taken inhibitor, closing the one it replaces.
+
+        Args:
+            what: Inhibited operation
+            fd: The inhibitor file descriptor
+        """
+        with self._inhibitor_lock:
+            old_fd = self._inhibitors.pop(what, None)
+            self._inhibitors[what] = fd
+        if old_fd is not None:
+            os.close(old_fd)
+        logger.debug(f"Holding {what} delay inhibitor")
+
+    def _release_inhibitor(self, what: str, fd: int, signalled_at: float) -> None:
+        """Release a delay inhibitor once its event is committed.
+
+        Called from the sender thread.
+
+        Args:
+            what: Inhibited operation
+            fd: The inhibitor file descriptor to close
+            signalled_at: time.monotonic() when logind announced the operation
+        """
+        with self._inhibitor_lock:
+            if self._inhibitors.get(what) != fd:
+                return
+            del self._inhibitors[what]
+            os.close(fd)
+
+        held = time.monotonic() - signalled_at
+        self.inhibitor_hold_times.append(held)
+        del self.inhibitor_hold_times[:-100]
+        logger.info(f"Released {what} inhibitor after {held * 1000:.1f}ms")
+
+    def _inhibitor_release_callback(self, what: str) -> Optional[partial]:
+        """Build the commit callback releasing the current inhibitor.
+
+        Args:
+            what: Inhibited operation
+
+        Returns:
+            Callback for the event's on_committed, or None if we hold no inhibitor
+        """
+        fd = self._inhibitors.get(what)
+        if fd is None:
+            return None
+        return partial(self._release_inhibitor, what, fd, time.monotonic())
+
+    def _on_prepare_for_sleep(self, start: bool) -> None:
+        """Handle PrepareForSleep signal from systemd-logind.
+
+        Args:
+            start: True when going to sleep, False when waking up
+        """
+        clock = boottime()
+        self.watcher.metrics.inc("listener_wakeups_total", listener=self.name)
+        if start:
+            logger.debug("System suspending")
+            self.watcher.handle_suspend_event(
+                "suspended", on_committed=self._inhibitor_release_callback("sleep"), clock=clock
+            )
+        else:
+            logger.debug("System resuming")
+            self._take_inhibitor("sleep")
+            self.watcher.handle_suspend_event("resumed", clock=clock)
+
+            # After resume, check lid state in case it changed during sleep
+            self._check_lid_state()
+
+    def _on_prepare_for_shutdown(self, start: bool) -> None:
+        """Handle PrepareForShutdown signal from systemd-logind.
+
+        Args:
+            start: True when shutting down, False if the shutdown was cancelled
+        """
+        self.watcher.metrics.inc("listener_wakeups_total", listener=self.name)
+        if start:
+            logger.debug("System shutting down")
+            self.watcher.handle_shutdown_event(
+                on_committed=self._inhibitor_release_callback("shutdown"), clock=boottime()
+            )
+        else:
+            logger.debug("Shutdown cancelled")
+            self.watcher.handle_shutdown_cancelled(clock=boottime())
+            self._take_inhibitor("shutdown")
+            self._check_lid_state()
+
+    def _on_properties_changed(self, interface_name: str, changed: dict, invalidated: list) -> None:
+        """Handle PropertiesChanged signal on the logind manager object.
+
+        Args:
+            interface_name: Interface whose properties changed
+            changed: Changed properties with their new values
+            invalidated: Names of changed properties sent without values
+        """
+        self.watcher.metrics.inc("listener_wakeups_total", listener=self.name)
+        if interface_name != LOGIND_MANAGER_IFACE:
+            return
+
+        if "LidClosed" in changed:
+            self._apply_lid_closed(bool(changed["LidClosed"]), boottime())
+        elif "LidClosed" in invalidated:
+            self._check_lid_state()
+
+    def _apply_lid_closed(self, lid_closed: bool, clock: Optional[float] = None) -> None:
+        """Notify the watcher if the lid state differs from our tracking.
+
+        Args:
+            lid_closed: Current value of logind's LidClosed property
+            clock: clock.boottime() when the value arrived (default: now)
+        """
+        lid_state = "closed" if lid_closed else "open"
+        # Called on every poll: nothing is formatted unless the state changed
+        if lid_state != self.watcher.current_lid_state:
+            logger.debug(f"Current lid state: {lid_state}")
+            self.watcher.handle_lid_event(lid_state, clock=clock)
+
+
+class DbusListener(LogindListener):
+    """Listens for lid and suspend events via D-Bus (systemd-logind).
+
+    Uses dbus-python with a GLib main loop.
+    """
+
+    def __init__(self, watcher: "LidWatcher") -> None:
+        """Initialize the D-Bus listener.
+
+        Args:
+            watcher: The LidWatcher instance to notify of events
+        """
+        super().__init__(watcher)
+        self.loop: Optional[Any] = None
+        # GLib source of the LidClosed polling timer, if polling
+        self._poll_source: Optional[int] = None
+
+        # Unique bus name of logind, and the LidClosed read bound to it (built on first use)
+        self.logind_owner: Optional[str] = None
+        self._get_lid_closed: Optional[Callable[[], Any]] = None
+        self._observe_lid_closed = watcher.metrics.observer(
+            "dbus_call_duration_seconds", call="LidClosed"
+        )
 
         # Import D-Bus libraries
         try:
@@ -44,91 +322,195 @@ class DbusListener:
         # Connect to system bus
         self.bus = self.dbus.SystemBus()
 
+        # The cached LidClosed read is only valid for this connection and logind instance
+        self.bus.call_on_disconnection(self._on_disconnected)
+        self.bus.watch_name_owner(LOGIND_BUS_NAME, self._on_logind_owner_changed)
+
         # Subscribe to PrepareForSleep signal
         self.bus.add_signal_receiver(
             self._on_prepare_for_sleep,
             signal_name="PrepareForSleep",
-            dbus_interface="org.freedesktop.login1.Manager",
-            bus_name="org.freedesktop.login1",
-            path="/org/freedesktop/login1",
+            dbus_interface=LOGIND_MANAGER_IFACE,
+            bus_name=LOGIND_BUS_NAME,
+            path=LOGIND_PATH,
+        )
+
+        # Subscribe to PrepareForShutdown signal
+        self.bus.add_signal_receiver(
+            self._on_prepare_for_shutdown,
+            signal_name="PrepareForShutdown",
+            dbus_interface=LOGIND_MANAGER_IFACE,
+            bus_name=LOGIND_BUS_NAME,
+            path=LOGIND_PATH,
+        )
+
+        # Subscribe to property changes (LidClosed, where logind announces it)
+        self.bus.add_signal_receiver(
+            self._on_properties_changed,
+            signal_name="PropertiesChanged",
+            dbus_interface=PROPERTIES_IFACE,
+            bus_name=LOGIND_BUS_NAME,
+            path=LOGIND_PATH,
         )
 
         logger.info("D-Bus listener started, waiting for events...")
 
+        # Make logind wait for us to record suspend and shutdown events
+        self._take_inhibitor("sleep")
+        self._take_inhibitor("shutdown")
+
         # Check initial lid state
         self._check_lid_state()
 
-        # Set up periodic lid state checking (every 5 seconds)
-        # This is needed because D-Bus doesn't provide signals for lid state changes
-        self.GLib.timeout_add_seconds(5, self._periodic_lid_check)
+        # Only poll when logind has told us it won't signal LidClosed changes
+        self.lid_mode = self._detect_lid_mode()
+        self._log_lid_mode()
+        if self.lid_mode == "poll":
+            self._restart_lid_poll()
 
         # Start GLib main loop
         self.loop = self.GLib.MainLoop()
+        self.watcher.listener_ready()
         self.loop.run()
 
+    def _detect_lid_mode(self) -> str:
+        """Decide how lid changes will be detected.
+
+        Returns:
+            "signal" if logind emits PropertiesChanged for LidClosed, "poll" if
+            it doesn't (or we can't tell), "unavailable" if there is no
+            LidClosed property at all
+        """
+        try:
+            introspection_xml = self.bus.call_blocking(  # type: ignore[union-attr]
+                LOGIND_BUS_NAME, LOGIND_PATH, INTROSPECTABLE_IFACE, "Introspect", "", []
+            )
+            return self._lid_mode(str(introspection_xml))
+        except Exception as e:
+            logger.warning(f"Failed to introspect logind, falling back to polling: {e}")
+            return "poll"
+
+    def _reschedule_lid_poll(self) -> None:
+        # GLib sources belong to the main loop thread; idle_add() is thread-safe
+        self.GLib.idle_add(self._restart_lid_poll)
+
+    def _restart_lid_poll(self) -> bool:
+        """Replace the polling timer by one with the current interval (on the loop thread).
+
+        Returns:
+            False, so it runs once as an idle callback
+        """
+        if self._poll_source is not None:
+            self.GLib.source_remove(self._poll_source)
+            self._poll_source = None
+        if self.lid_poll_interval > 0:
+            self._poll_source = self.GLib.timeout_add(
+                int(self.lid_poll_interval * 1000), self._periodic_lid_check
+            )
+        return False
+
     def _periodic_lid_check(self) -> bool:
         """Periodic callback to check lid state.
 
         Returns:
             True to continue periodic calls
         """
+        self.watcher.metrics.inc("listener_wakeups_total", listener=self.name)
         self._check_lid_state()
         return True  # Continue calling
 
     def stop(self) -> None:
         """Stop the D-Bus listener."""
+        self._release_all_inhibitors()
+
         if self.loop:
             self.loop.quit()
 
-    def _on_prepare_for_sleep(self, start: bool) -> None:
-        """Handle PrepareForSleep signal from systemd-logind.
+    def _take_inhibitor(self, what: str) -> None:
+        """Take a logind delay inhibitor lock.
 
         Args:
-            start: True when going to sleep, False when waking up
+            what: Operation to delay ("sleep" or "shutdown")
         """
-        if start:
-            logger.debug("System suspending")
-            self.watcher.handle_suspend_event("suspended")
-        else:
-            logger.debug("System resuming")
-            self.watcher.handle_suspend_event("resumed")
+        if not self.use_inhibitors or self.bus is None:
+            return
 
-            # After resume, check lid state in case it changed during sleep
-            self._check_lid_state()
+        try:
+            with self.watcher.metrics.time("dbus_call_duration_seconds", call="Inhibit"):
+                fd = self.bus.call_blocking(
+                    LOGIND_BUS_NAME,
+                    LOGIND_PATH,
+                    LOGIND_MANAGER_IFACE,
+                    "Inhibit",
+                    "ssss",
+                    [what, "aw-watcher-lid", f"Recording {what} event", "delay"],
+                ).take()
+        except Exception as e:
+            logger.warning(f"Could not take {what} delay inhibitor: {e}")
+            return
+
+        self._keep_inhibitor(what, fd)
+
+    def _on_disconnected(self, connection: Any) -> None:
+        """Drop what is bound to the system bus connection when it goes away."""
+        logger.warning("Lost the connection to the system bus")
+        self.bus = None
+        self.logind_owner = None
+        self._get_lid_closed = None
+
+    def _on_logind_owner_changed(self, owner: str) -> None:
+        """Rebind the LidClosed read when logind (re)starts or goes away.
+
+        Args:
+            owner: Unique bus name of the new logind instance ("" if it isn't running)
+        """
+        if self.logind_owner and owner != self.logind_owner:
+            logger.info(f"logind changed owner: {self.logind_owner} -> {owner or 'none'}")
+        self.logind_owner = owner or None
+        self._get_lid_closed = None
+
+    def _lid_closed_reader(self) -> Callable[[], Any]:
+        """The Properties.Get call reading LidClosed, created once and reused.
+
+        A direct call_blocking() with a fixed signature: no proxy object, no
+        introspection and no signature guessing per read. It is rebuilt only
+        when the bus connection drops or logind's owner changes.
+        """
+        if self._get_lid_closed is None:
+            self._get_lid_closed = partial(
+                self.bus.call_blocking,  # type: ignore[union-attr]
+                self.logind_owner or LOGIND_BUS_NAME,
+                LOGIND_PATH,
+                PROPERTIES_IFACE,
+                "Get",
+                "ss",
+                LID_CLOSED_ARGS,
+            )
+        return self._get_lid_closed
 
     def _check_lid_state(self) -> None:
         """Check current lid state via D-Bus."""
         if self.bus is None:
             return
 
+        started = time.perf_counter()
         try:
-            # Get logind manager object
-            manager_obj = self.bus.get_object("org.freedesktop.login1", "/org/freedesktop/login1")
-            manager = self.dbus.Interface(
-                manager_obj, dbus_interface="org.freedesktop.DBus.Properties"
-            )
-
-            # Check if lid is closed
-            # Note: This property may not be available on all systems
-            try:
-                lid_closed = manager.Get("org.freedesktop.login1.Manager", "LidClosed")
-                lid_state = "closed" if lid_closed else "open"
-                logger.debug(f"Current lid state: {lid_state}")
-
-                # Only send event if state differs from our tracking
-                if lid_state != self.watcher.current_lid_state:
-                    self.watcher.handle_lid_event(lid_state)
-            except self.dbus.exceptions.DBusException:
-                # LidClosed property not available on this system
-                logger.debug("LidClosed property not available")
+            lid_closed = self._lid_closed_reader()()
+        except self.dbus.exceptions.DBusException as e:
+            # LidClosed property not available on this system, or logind is gone
+            logger.debug(f"LidClosed property not available: {e}")
+            return
         except Exception as e:
             logger.warning(f"Failed to check lid state: {e}")
+            return
+        finally:
+            self._observe_lid_closed(time.perf_counter() - started)
 
-    def _monitor_lid_events(self) -> None:
-        """Monitor lid events via udev or acpi.
+        self._apply_lid_closed(bool(lid_closed))
 
-        This is an alternative approach if LidClosed property isn't available.
-        For now, we rely on periodic checking after resume.
-        """
-        # TODO: Implement udev/acpi monitoring if needed
-        pass
+
+def _lid_poll_interval(config: dict) -> float:
+    """The LidClosed polling interval a config asks for (0: don't poll)."""
+    if config.get("zero_wakeup_idle", False):
+        return 0.0
+    return float(config.get("lid_poll_interval", 5.0))
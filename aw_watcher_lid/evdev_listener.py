@@ -0,0 +1,230 @@
+"""Kernel evdev listener for lid switch events (no D-Bus round trips)."""
+
+import errno
+import fcntl
+import logging
+import os
+import select
+import struct
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .clock import CLOCK
+from .wakeup import WakeupPipe
+
+if TYPE_CHECKING:
+    from .lid import LidWatcher
+
+logger = logging.getLogger(__name__)
+
+LID_SWITCH_NAME = "Lid Switch"
+
+# From linux/input-event-codes.h
+EV_SYN = 0x00
+EV_SW = 0x05
+SYN_DROPPED = 0x03
+SW_LID = 0x00
+SW_CNT = 0x11
+
+# struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+INPUT_EVENT = struct.Struct("@llHHi")
+
+# Read this many events per syscall
+READ_BATCH = 64
+
+
+def eviocgsw(length: int) -> int:
+    """Build the EVIOCGSW(len) ioctl request number (get all switch states).
+
+    Args:
+        length: Size of the result buffer in bytes
+
+    Returns:
+        The ioctl request number
+    """
+    ioc_read = 2
+    return (ioc_read << 30) | (length << 16) | (ord("E") << 8) | 0x1B
+
+
+# EVIOCSCLOCKID = _IOW('E', 0xa0, int): clock used for event timestamps
+EVIOCSCLOCKID = (1 << 30) | (4 << 16) | (ord("E") << 8) | 0xA0
+
+
+def find_lid_switch(sysfs_root: str = "/sys/class/input", dev_root: str = "/dev/input") -> str:
+    """Find the input device node of the lid switch.
+
+    Args:
+        sysfs_root: Directory with the eventN entries in sysfs
+        dev_root: Directory with the eventN device nodes
+
+    Returns:
+        Path of the lid switch device node
+
+    Raises:
+        FileNotFoundError: If no lid switch input device exists
+    """
+    for event_dir in sorted(Path(sysfs_root).glob("event*")):
+        try:
+            name = (event_dir / "device" / "name").read_text().strip()
+        except OSError:
+            continue
+        if name == LID_SWITCH_NAME:
+            return str(Path(dev_root) / event_dir.name)
+
+    raise FileNotFoundError(f'No "{LID_SWITCH_NAME}" input device found in {sysfs_root}')
+
+
+class EvdevListener:
+    """Reads EV_SW/SW_LID events straight from the kernel lid switch device.
+
+    Only lid events are reported; suspend/resume still needs D-Bus or the journal.
+    Reading the device requires membership of the "input" group (or root).
+    """
+
+    def __init__(self, watcher: "LidWatcher", device_path: Optional[str] = None) -> None:
+        """Initialize the evdev listener.
+
+        Args:
+            watcher: The LidWatcher instance to notify of events
+            device_path: Input device to read, autodetected if not given
+        """
+        self.watcher = watcher
+        self.device_path = device_path or watcher.config.get("evdev_device") or None
+        self.running = False
+        self.fd: Optional[int] = None
+        # Whether event timestamps are on the boot clock (else wall clock)
+        self._boottime_stamps = False
+
+        # Preallocated read buffer, reused for every read
+        self._buffer = bytearray(INPUT_EVENT.size * READ_BATCH)
+        self._view = memoryview(self._buffer)
+
+        # Used by stop() to wake up the epoll loop, closed when start() returns
+        self._wakeup = WakeupPipe()
+
+    def start(self) -> None:
+        """Start listening for lid switch events (blocks until stop())."""
+        try:
+            if not self.device_path:
+                self.device_path = find_lid_switch()
+            self.fd = os.open(self.device_path, os.O_RDONLY | os.O_NONBLOCK | os.O_CLOEXEC)
+        except OSError:
+            self._wakeup.close()
+            raise
+        self.running = True
+        self._boottime_stamps = self._set_event_clock()
+        logger.info(f"Evdev listener started on {self.device_path}")
+
+        # Report the state the lid is in right now
+        self._sync_lid_state()
+
+        epoll = select.epoll()
+        try:
+            epoll.register(self.fd, select.EPOLLIN)
+            epoll.register(self._wakeup.fd, select.EPOLLIN)
+            self.watcher.listener_ready()
+
+            while self.running:
+                events = epoll.poll()
+                self.watcher.metrics.inc("listener_wakeups_total", listener="evdev")
+                for fd, _mask in events:
+                    if fd == self._wakeup.fd:
+                        self.running = False
+                        break
+                    self._read_events()
+        finally:
+            epoll.close()
+            os.close(self.fd)
+            self.fd = None
+            self._wakeup.close()
+
+    def stop(self) -> None:
+        """Stop the evdev listener."""
+        self.running = False
+        self._wakeup.wake()
+
+    def _read_events(self) -> None:
+        """Read and dispatch all pending input events."""
+        while True:
+            try:
+                nbytes = os.readv(self.fd, [self._view])  # type: ignore[arg-type]
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if e.errno == errno.ENODEV:
+                    logger.error("Lid switch device went away")
+                    self.running = False
+                    return
+                raise
+
+            if nbytes == 0:
+                logger.error("Lid switch device closed")
+                self.running = False
+                return
+
+            for offset in range(0, nbytes - nbytes % INPUT_EVENT.size, INPUT_EVENT.size):
+                sec, usec, ev_type, code, value = INPUT_EVENT.unpack_from(self._buffer, offset)
+                if ev_type == EV_SW and code == SW_LID:
+                    self._report_event("closed" if value else "open", sec + usec / 1_000_000)
+                elif ev_type == EV_SYN and code == SYN_DROPPED:
+                    # Kernel buffer overran, the event stream can't be trusted
+                    logger.debug("Evdev events dropped, resyncing lid state")
+                    self._sync_lid_state()
+
+            if nbytes < len(self._buffer):
+                return
+
+    def _set_event_clock(self) -> bool:
+        """Ask the kernel to timestamp events with the boot clock.
+
+        Returns:
+            True if event timestamps are clock.boottime() values
+        """
+        if CLOCK != getattr(time, "CLOCK_BOOTTIME", None):
+            return False
+        try:
+            fcntl.ioctl(self.fd, EVIOCSCLOCKID, struct.pack("i", CLOCK))  # type: ignore[arg-type]
+        except OSError as e:
+            logger.debug(f"Could not switch event timestamps to CLOCK_BOOTTIME: {e}")
+            return False
+        return True
+
+    def _report_event(self, lid_state: str, event_time: float) -> None:
+        """Report a lid switch event with its kernel timestamp.
+
+        Args:
+            lid_state: "open" or "closed"
+            event_time: Event timestamp in seconds (boot clock or wall clock)
+        """
+        if self._boottime_stamps:
+            self._report(lid_state, None, event_time)
+        else:
+            self._report(lid_state, datetime.fromtimestamp(event_time, tz=timezone.utc))
+
+    def _sync_lid_state(self) -> None:
+        """Read the current lid switch state with EVIOCGSW."""
+        switches = bytearray((SW_CNT + 7) // 8)
+        try:
+            fcntl.ioctl(self.fd, eviocgsw(len(switches)), switches)  # type: ignore[arg-type]
+        except OSError as e:
+            logger.debug(f"Could not read switch state: {e}")
+            return
+
+        lid_closed = bool(switches[SW_LID // 8] & (1 << (SW_LID % 8)))
+        self._report("closed" if lid_closed else "open", None)
+
+    def _report(
+        self, lid_state: str, timestamp: Optional[datetime], clock: Optional[float] = None
+    ) -> None:
+        """Notify the watcher if the lid state differs from our tracking.
+
+        Args:
+            lid_state: "open" or "closed"
+            timestamp: Kernel event time as wall-clock time, or None
+            clock: Kernel event time on the boot clock, or None (None for both: "now")
+        """
+        logger.debug(f"Evdev lid state: {lid_state} at {timestamp or clock}")
+        if lid_state != self.watcher.current_lid_state:
+            self.watcher.handle_lid_event(lid_state, timestamp=timestamp, clock=clock)
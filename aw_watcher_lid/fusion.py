@@ -0,0 +1,341 @@
+"""Fusion listener: several event sources at once, the fastest report of each change wins."""
+
+import logging
+import queue
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from .clock import boottime
+
+if TYPE_CHECKING:
+    from .lid import LidWatcher
+
+logger = logging.getLogger(__name__)
+
+# Accepted reports kept for recognising late duplicates
+HISTORY = 32
+
+
+@dataclass
+class Report:
+    """A lid, suspend or shutdown change as reported by one source."""
+
+    source: str
+    kind: str  # "lid", "suspend" or "shutdown"
+    state: Optional[str]
+    timestamp: datetime
+    clock: float
+    # boottime() when the source reported it
+    arrived: float
+    on_committed: Optional[Callable[[], None]] = None
+
+
+class SourceWatcher:
+    """The watcher as one fused source sees it.
+
+    Reports go to the fusion dispatcher instead of the watcher's handlers;
+    everything else (config, metrics, state, current lid state) is the
+    watcher's own.
+    """
+
+    def __init__(self, fusion: "FusionListener", source: str) -> None:
+        """Initialize the source's view of the watcher.
+
+        Args:
+            fusion: The fusion listener dispatching the reports
+            source: Name of the source ("dbus", "evdev", "journal", ...)
+        """
+        self._fusion = fusion
+        self.source = source
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._fusion.watcher, name)
+
+    def handle_lid_event(
+        self,
+        lid_state: str,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
+        self._fusion.report(self.source, "lid", lid_state, timestamp, clock)
+
+    def handle_suspend_event(
+        self,
+        suspend_state: str,
+        on_committed: Optional[Callable[[], None]] = None,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
+        self._fusion.report(self.source, "suspend", suspend_state, timestamp, clock, on_committed)
+
+    def handle_shutdown_event(
+        self,
+        on_committed: Optional[Callable[[], None]] = None,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
+        self._fusion.report(self.source, "shutdown", None, timestamp, clock, on_committed)
+
+    def handle_shutdown_cancelled(
+        self,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
+        self._fusion.report(self.source, "shutdown", "cancelled", timestamp, clock)
+
+    def listener_ready(self) -> None:
+        self._fusion._post(("ready", self.source))
+
+
+class FusionListener:
+    """Runs several listeners at once and passes each change on once.
+
+    Every source listener runs in its own thread and reports to one queue;
+    the thread calling start() takes the reports off in order and is the
+    only one calling the watcher's handlers. A report of the same change as
+    the last accepted one (same kind and state, within `window` seconds of
+    event time) is a duplicate: the source that reported first wins, and
+    how much later the others were is measured. A report older than the
+    last accepted one can't be applied in order any more and is dropped too.
+    """
+
+    name = "fusion"
+
+    def __init__(self, watcher: "LidWatcher", sources: list[str], window: float = 5.0) -> None:
+        """Initialize the fusion listener.
+
+        Args:
+            watcher: The LidWatcher instance to notify of events
+            sources: Listeners to run ("dbus", "dbus-fast", "evdev", "journal");
+                "dbus" falls back to dbus-fast when dbus-python is missing
+            window: Seconds between the event times of two reports of the same change
+        """
+        self.watcher = watcher
+        self.sources = list(sources)
+        self.window = window
+        self.running = False
+        self.listeners: dict[str, Any] = {}
+        self._threads: list[threading.Thread] = []
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._accepted: deque[Report] = deque(maxlen=HISTORY)
+        # Sources that haven't reported ready or exited yet, and those still running
+        self._starting: set[str] = set()
+        self._alive: set[str] = set()
+        self._ready = False
+
+    def source(self, name: str) -> SourceWatcher:
+        """The watcher for a source listener, reporting to this dispatcher."""
+        return SourceWatcher(self, name)
+
+    def start(self) -> None:
+        """Start the source listeners and dispatch their reports (blocks until stop())."""
+        self.running = True
+        for name in self.sources:
+            listener = self._create_source(name)
+            if listener is None:
+                continue
+            self.listeners[name] = listener
+            thread = threading.Thread(
+                target=self._run_source, args=(name, listener), name=f"aw-watcher-lid-{name}"
+            )
+            thread.daemon = True
+            self._threads.append(thread)
+
+        if not self.listeners:
+            logger.error("No event source could be started")
+            self.running = False
+            return
+
+        self._starting = set(self.listeners)
+        self._alive = set(self.listeners)
+        logger.info(f"Fusion listener started with {', '.join(self.listeners)}")
+        for thread in self._threads:
+            thread.start()
+
+        while self.running:
+            self._handle(self._queue.get())
+
+    def stop(self) -> None:
+        """Stop the source listeners and the dispatcher."""
+        self.running = False
+        for listener in self.listeners.values():
+            listener.stop()
+        self._post(None)
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def apply_config(self, config: dict) -> None:
+        """Apply a reloaded config to the dispatcher and every source listener.
+
+        Args:
+            config: The new, validated config
+        """
+        self.window = config.get("fusion_window", 5.0)
+        for listener in self.listeners.values():
+            apply_config = getattr(listener, "apply_config", None)
+            if apply_config:
+                apply_config(config)
+
+    def _create_source(self, name: str) -> Optional[Any]:
+        """Create a source listener, or None if it can't run here."""
+        try:
+            try:
+                return self.watcher._create_listener(name, watcher=self.source(name))
+            except ImportError:
+                if name != "dbus":
+                    raise
+                return self.watcher._create_listener("dbus-fast", watcher=self.source(name))
+        except Exception as e:
+            logger.warning(f"Not using the {name} listener: {e}")
+            return None
+
+    def _run_source(self, name: str, listener: Any) -> None:
+        """Run one source listener (in its own thread) until it stops."""
+        try:
+            listener.start()
+        except Exception as e:
+            logger.warning(f"The {name} listener failed: {e}")
+        self._post(("exited", name))
+
+    def _post(self, item: Any) -> None:
+        self._queue.put(item)
+
+    def report(
+        self,
+        source: str,
+        kind: str,
+        state: Optional[str],
+        timestamp: Optional[datetime],
+        clock: Optional[float],
+        on_committed: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Queue a source's report for the dispatcher (called from the source's thread).
+
+        Args:
+            source: Reporting source
+            kind: "lid", "suspend" or "shutdown"
+            state: New lid or suspend state (None for shutdown, "cancelled" when it is)
+            timestamp: When it happened according to the source, if known
+            clock: clock.boottime() when it happened, if the source knows it
+            on_committed: Called once the event is safely queued, or dropped as a duplicate
+        """
+        from .lid import _event_time
+
+        # Completed here, so "now" is when the source saw it, not when it was dispatched
+        timestamp, clock = _event_time(timestamp, clock)
+        self._post(Report(source, kind, state, timestamp, clock, boottime(), on_committed))
+
+    def dispatch_pending(self) -> None:
+        """Handle every report queued so far, without waiting for more."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._handle(item)
+
+    def _handle(self, item: Any) -> None:
+        """Handle one item from the queue: a report or a source starting or exiting."""
+        if isinstance(item, Report):
+            self._dispatch(item)
+            return
+        if item is None:
+            return
+
+        what, name = item
+        self._starting.discard(name)
+        if what == "exited":
+            self._alive.discard(name)
+            if not self._alive:
+                if self.running:
+                    logger.error("All event sources stopped")
+                self.running = False
+                return
+        # Ready once every source is either waiting for events or gone
+        if not self._starting and not self._ready:
+            self._ready = True
+            self.watcher.listener_ready()
+
+    def _dispatch(self, report: Report) -> None:
+        """Pass a report on to the watcher, unless another source was faster.
+
+        Args:
+            report: The report
+        """
+        metrics = self.watcher.metrics
+        newest = self._accepted[-1] if self._accepted else None
+        duplicate = None
+        if newest and report.clock < newest.clock:
+            duplicate = self._same_change(report)
+            reason = "duplicate" if duplicate else "late"
+        elif (
+            newest
+            and (newest.kind, newest.state) == (report.kind, report.state)
+            and report.clock - newest.clock <= self.window
+        ):
+            duplicate, reason = newest, "duplicate"
+        else:
+            reason = ""
+
+        if reason:
+            metrics.inc("fusion_dropped_total", source=report.source, reason=reason)
+            if duplicate:
+                lag = report.arrived - duplicate.arrived
+                metrics.observe("fusion_lag_seconds", max(0.0, lag), source=report.source)
+                logger.debug(
+                    f"{report.source}: {report.kind} {report.state or ''} already reported by "
+                    f"{duplicate.source} {lag * 1000:.1f}ms earlier"
+                )
+            else:
+                logger.info(
+                    f"Ignoring {report.kind} {report.state or ''} at {report.timestamp} from "
+                    f"{report.source}: older than the last event"
+                )
+            # The change was recorded from the faster report
+            if report.on_committed:
+                report.on_committed()
+            return
+
+        self._accepted.append(report)
+        metrics.inc("fusion_events_total", source=report.source)
+        logger.info(f"{report.kind} {report.state or ''} reported first by {report.source}")
+        if report.kind == "lid":
+            self.watcher.handle_lid_event(
+                report.state,  # type: ignore[arg-type]
+                timestamp=report.timestamp,
+                clock=report.clock,
+            )
+        elif report.kind == "suspend":
+            self.watcher.handle_suspend_event(
+                report.state,  # type: ignore[arg-type]
+                on_committed=report.on_committed,
+                timestamp=report.timestamp,
+                clock=report.clock,
+            )
+        elif report.state == "cancelled":
+            self.watcher.handle_shutdown_cancelled(timestamp=report.timestamp, clock=report.clock)
+        else:
+            self.watcher.handle_shutdown_event(
+                on_committed=report.on_committed, timestamp=report.timestamp, clock=report.clock
+            )
+
+    def _same_change(self, report: Report) -> Optional[Report]:
+        """Find the accepted report of the same change, for a report arriving late.
+
+        Returns:
+            The closest accepted report with the same kind and state within
+            the window, or None
+        """
+        best = None
+        for accepted in self._accepted:
+            if (accepted.kind, accepted.state) != (report.kind, report.state):
+                continue
+            distance = abs(report.clock - accepted.clock)
+            if distance <= self.window and (
+                best is None or distance < abs(report.clock - best.clock)
+            ):
+                best = accepted
+        return best
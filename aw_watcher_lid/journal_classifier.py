@@ -0,0 +1,107 @@
+"""Classification of journal entries into lid and suspend events."""
+
+import re
+from collections.abc import Mapping
+from typing import Any, Optional
+
+# Events a journal entry can signal
+LID_CLOSED = "lid_closed"
+LID_OPEN = "lid_open"
+SUSPENDED = "suspended"
+RESUMED = "resumed"
+ACTIONS = (LID_CLOSED, LID_OPEN, SUSPENDED, RESUMED)
+
+# Catalog message IDs from systemd's sd-messages.h
+DEFAULT_MESSAGE_IDS = {
+    "b72ea4a2881545a0b50e200e55b9b06f": LID_OPEN,  # SD_MESSAGE_LID_OPENED
+    "b72ea4a2881545a0b50e200e55b9b070": LID_CLOSED,  # SD_MESSAGE_LID_CLOSED
+    "6bbd95ee977941e497c48be27c254128": SUSPENDED,  # SD_MESSAGE_SLEEP_START
+    "8811e6df2a8e40f58a94cea26f8ebf14": RESUMED,  # SD_MESSAGE_SLEEP_STOP
+}
+
+# Only messages from these programs/units are matched against the patterns
+DEFAULT_IDENTIFIERS = [
+    "systemd-logind",
+    "systemd-sleep",
+    "systemd-logind.service",
+    "systemd-suspend.service",
+    "systemd-sleep.service",
+]
+
+# Full-message patterns for entries without a known MESSAGE_ID (older systemd)
+DEFAULT_PATTERNS = {
+    LID_CLOSED: r"Lid closed\.",
+    LID_OPEN: r"Lid opened\.",
+    SUSPENDED: (
+        r"(?:Entering sleep state|Performing sleep operation) '(?:suspend|hibernate|"
+        r"hybrid-sleep|suspend-then-hibernate)'\.\.\.|Suspending system\.\.\."
+    ),
+    RESUMED: r"System (?:returned from sleep (?:state|operation)\b.*|resumed\.)",
+}
+
+
+class JournalClassifier:
+    """Maps journal entries to lid/suspend events using their structured fields.
+
+    Entries are looked up by MESSAGE_ID first; only entries without a known
+    ID that come from one of the configured programs or units are matched,
+    with a single anchored regular expression, against their message.
+    """
+
+    def __init__(self, rules: Optional[Mapping[str, Any]] = None) -> None:
+        """Build the lookup tables.
+
+        Args:
+            rules: Overrides for "message_ids" (ID to event), "identifiers"
+                (SYSLOG_IDENTIFIER/_SYSTEMD_UNIT values) and "patterns" (event
+                to regex); each given key replaces its default
+
+        Raises:
+            ValueError: If a rule names an unknown event or has an invalid pattern
+        """
+        rules = rules or {}
+        message_ids = dict(rules.get("message_ids", DEFAULT_MESSAGE_IDS))
+        patterns = dict(rules.get("patterns", DEFAULT_PATTERNS))
+
+        for action in [*message_ids.values(), *patterns]:
+            if action not in ACTIONS:
+                raise ValueError(f"Unknown journal rule event: {action}")
+
+        self.message_ids = {str(key).lower(): str(value) for key, value in message_ids.items()}
+        self.identifiers = frozenset(str(i) for i in rules.get("identifiers", DEFAULT_IDENTIFIERS))
+        self._pattern_actions = [str(action) for action in patterns]
+        try:
+            self.pattern = re.compile(
+                "|".join(f"(?P<{action}>{pattern})" for action, pattern in patterns.items())
+            )
+        except re.error as e:
+            raise ValueError(f"Invalid journal rule pattern: {e}") from e
+
+    def classify(self, entry: Mapping[str, Any]) -> Optional[str]:
+        """Find out which event a journal entry signals.
+
+        Args:
+            entry: Journal entry (JSON output or sd-journal reader)
+
+        Returns:
+            One of ACTIONS, or None if the entry is not a lid/suspend event
+        """
+        message_id = entry.get("MESSAGE_ID")
+        if message_id is not None:
+            action = self.message_ids.get(str(message_id).replace("-", ""))
+            if action:
+                return action
+
+        if (
+            entry.get("SYSLOG_IDENTIFIER") not in self.identifiers
+            and entry.get("_SYSTEMD_UNIT") not in self.identifiers
+        ):
+            return None
+
+        message = entry.get("MESSAGE")
+        if not isinstance(message, str):
+            return None
+        match = self.pattern.fullmatch(message)
+        if not match:
+            return None
+        return next(action for action in self._pattern_actions if match.group(action) is not None)
@@ -2,20 +2,31 @@
 
 import json
 import logging
+import select
 import subprocess
-import threading
-import time
 from datetime import datetime, timezone
-from typing import TYPE_CHECKING
+from typing import IO, TYPE_CHECKING, Any, Optional
+
+from .journal_classifier import LID_CLOSED, LID_OPEN, RESUMED, SUSPENDED, JournalClassifier
+from .wakeup import WakeupPipe
 
 if TYPE_CHECKING:
     from .lid import LidWatcher
 
 logger = logging.getLogger(__name__)
 
+# Units whose messages tell about lid and suspend events
+JOURNAL_UNITS = ["systemd-logind.service", "systemd-suspend.service", "systemd-sleep.service"]
+
 
 class JournalListener:
-    """Polls journalctl for lid and suspend events."""
+    """Follows the systemd journal for lid and suspend events.
+
+    Uses the native sd-journal reader (python-systemd) when it is installed,
+    otherwise a long-lived `journalctl -f -o json` process. The cursor of the
+    last handled entry is kept in the local state file, so a restart continues
+    exactly where the previous run stopped.
+    """
 
     def __init__(self, watcher: "LidWatcher") -> None:
         """Initialize the journal listener.
@@ -25,117 +36,200 @@ class JournalListener:
         """
         self.watcher = watcher
         self.running = False
-        self.thread: threading.Thread | None = None
-        self.poll_interval = watcher.config.get("journal_poll_interval", 60.0)
+        self.cursor: Optional[str] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.classifier = JournalClassifier(watcher.config.get("journal_rules"))
+
+        # Used by stop() to wake up the native reader, closed when start() returns
+        self._wakeup = WakeupPipe()
 
     def start(self) -> None:
-        """Start polling the journal for events."""
+        """Start following the journal (blocks until stop())."""
         self.running = True
-        self.thread = threading.Thread(target=self._poll_loop, daemon=True)
-        self.thread.start()
-        logger.info(f"Journal listener started (polling every {self.poll_interval}s)")
+        if self.watcher.state:
+            self.cursor = self.watcher.state.load().get("journal_cursor")
 
-        # Keep main thread alive
         try:
-            while self.running:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            self.stop()
-
-    def stop(self) -> None:
-        """Stop polling the journal."""
-        self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
+            try:
+                from systemd import journal
+            except ImportError:
+                self._follow_journalctl()
+            else:
+                self._follow_native(journal)
+        finally:
+            self._wakeup.close()
 
-    def _poll_loop(self) -> None:
-        """Main polling loop."""
-        # Track last seen timestamp to avoid duplicates
-        last_timestamp = datetime.now(timezone.utc)
+    def apply_config(self, config: dict) -> None:
+        """Apply a reloaded config: new journal rules are used from the next entry on.
 
-        while self.running:
-            try:
-                self._check_journal(since=last_timestamp)
-                last_timestamp = datetime.now(timezone.utc)
-            except Exception as e:
-                logger.error(f"Error polling journal: {e}")
+        Args:
+            config: The new, validated config
+        """
+        self.classifier = JournalClassifier(config.get("journal_rules"))
 
-            time.sleep(self.poll_interval)
+    def stop(self) -> None:
+        """Stop following the journal."""
+        self.running = False
+        self._wakeup.wake()
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
 
-    def _check_journal(self, since: datetime) -> None:
-        """Check journal for lid and suspend events since given time.
+    def _follow_native(self, journal: Any) -> None:
+        """Follow the journal with the sd-journal reader.
 
         Args:
-            since: Only check events after this time
+            journal: The systemd.journal module
         """
-        # Format timestamp for journalctl
-        since_str = since.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Query journalctl for relevant events
-        # We look for:
-        # - systemd-logind messages about lid state
-        # - systemd messages about suspend/resume
-        cmd = [
-            "journalctl",
-            "--since",
-            since_str,
-            "--output=json",
-            "--no-pager",
-            "-u",
-            "systemd-logind",
-            "-u",
-            "systemd-suspend.service",
-            "-u",
-            "systemd-sleep.service",
-        ]
+        reader = journal.Reader()
+        reader.add_match(*(f"_SYSTEMD_UNIT={unit}" for unit in JOURNAL_UNITS))
+        reader.add_disjunction()
+        reader.add_match(*(f"UNIT={unit}" for unit in JOURNAL_UNITS))
+
+        if self.cursor:
+            reader.seek_cursor(self.cursor)
+            # seek_cursor() positions on the entry we already handled
+            entry = reader.get_next()
+            if entry and entry.get("__CURSOR") != self.cursor:
+                self._handle_entry(entry)
+        else:
+            reader.seek_tail()
+            reader.get_previous()
+        logger.info("Journal listener started (sd-journal)")
+
+        poll = select.poll()
+        poll.register(reader.fileno(), reader.get_events())
+        poll.register(self._wakeup.fd, select.POLLIN)
+        self.watcher.listener_ready()
+        try:
+            while self.running:
+                for entry in reader:
+                    self._handle_entry(entry)
+                timeout = reader.get_timeout_ms()
+                poll.poll(None if timeout < 0 else timeout)
+                self.watcher.metrics.inc("listener_wakeups_total", listener="journal")
+                reader.process()
+        finally:
+            reader.close()
+            self._save_cursor()
+
+    def _follow_journalctl(self) -> None:
+        """Follow the journal through a journalctl subprocess."""
+        cmd = ["journalctl", "--follow", "--output=json", "--no-pager"]
+        for unit in JOURNAL_UNITS:
+            cmd += ["-u", unit]
+        if self.cursor:
+            cmd += ["--after-cursor", self.cursor, "--no-tail"]
+        else:
+            cmd += ["--lines=0"]
 
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10, check=False)
+            self.process = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+        except FileNotFoundError:
+            logger.error("journalctl not found - journal monitoring unavailable")
+            self.running = False
+            return
+
+        logger.info("Journal listener started (journalctl --follow)")
+        self.watcher.listener_ready()
+        try:
+            self._read_stream(self.process.stdout)  # type: ignore[arg-type]
+        finally:
+            if self.process.poll() is None:
+                self.process.terminate()
+            self.process.wait()
+            self._save_cursor()
+            if self.running:
+                logger.error(f"journalctl exited with {self.process.returncode}")
+
+    def _read_stream(self, stream: IO[str]) -> None:
+        """Handle journal entries from a JSON lines stream as they arrive.
 
-            if result.returncode != 0:
-                logger.warning(f"journalctl returned {result.returncode}")
+        Args:
+            stream: journalctl output, one JSON object per line
+        """
+        metrics = self.watcher.metrics
+        for line in stream:
+            metrics.inc("listener_wakeups_total", listener="journal")
+            if not self.running:
                 return
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.debug(f"Failed to parse journal entry: {line[:100]}")
+                continue
+            self._handle_entry(entry)
 
-            # Parse JSON output (one JSON object per line)
-            for line in result.stdout.strip().split("\n"):
-                if not line:
-                    continue
+    def _handle_entry(self, entry: dict) -> None:
+        """Process a journal entry and remember its cursor.
 
-                try:
-                    entry = json.loads(line)
-                    self._process_journal_entry(entry)
-                except json.JSONDecodeError:
-                    logger.debug(f"Failed to parse journal entry: {line[:100]}")
+        The cursor is saved after every entry that produced an event; unrelated
+        entries since then are just read again after a restart.
 
-        except subprocess.TimeoutExpired:
-            logger.warning("journalctl command timed out")
-        except FileNotFoundError:
-            logger.error("journalctl not found - journal monitoring unavailable")
-            self.running = False
+        Args:
+            entry: Journal entry (JSON output or sd-journal reader)
+        """
+        try:
+            handled = self._process_journal_entry(entry)
+        except Exception as e:
+            logger.error(f"Error processing journal entry: {e}")
+            handled = True
+
+        self.cursor = entry.get("__CURSOR") or self.cursor
+        if handled:
+            self._save_cursor()
+
+    def _save_cursor(self) -> None:
+        """Store the cursor of the last handled entry in the local state file."""
+        if not self.cursor or not self.watcher.state:
+            return
+        try:
+            self.watcher.state.update(durable=False, journal_cursor=self.cursor)
+        except OSError as e:
+            logger.warning(f"Failed to save journal cursor: {e}")
 
-    def _process_journal_entry(self, entry: dict) -> None:
+    def _process_journal_entry(self, entry: dict) -> bool:
         """Process a single journal entry.
 
         Args:
             entry: Parsed JSON journal entry
+
+        Returns:
+            True if the entry was a lid or suspend event
         """
-        message = entry.get("MESSAGE", "")
-
-        # Check for lid events
-        if "Lid" in message:
-            if "closed" in message.lower():
-                logger.debug(f"Journal: lid closed - {message}")
-                self.watcher.handle_lid_event("closed")
-            elif "opened" in message.lower():
-                logger.debug(f"Journal: lid opened - {message}")
-                self.watcher.handle_lid_event("open")
-
-        # Check for suspend events
-        if "Suspending" in message or "suspend" in message.lower():
-            logger.debug(f"Journal: suspending - {message}")
-            self.watcher.handle_suspend_event("suspended")
-
-        # Check for resume events
-        if "Resumed" in message or "resume" in message.lower():
-            logger.debug(f"Journal: resumed - {message}")
-            self.watcher.handle_suspend_event("resumed")
+        action = self.classifier.classify(entry)
+        if action is None:
+            return False
+
+        logger.debug(f"Journal: {action} - {entry.get('MESSAGE')}")
+        timestamp = _entry_time(entry)
+        if action == LID_CLOSED:
+            self.watcher.handle_lid_event("closed", timestamp=timestamp)
+        elif action == LID_OPEN:
+            self.watcher.handle_lid_event("open", timestamp=timestamp)
+        elif action == SUSPENDED:
+            self.watcher.handle_suspend_event("suspended", timestamp=timestamp)
+        elif action == RESUMED:
+            self.watcher.handle_suspend_event("resumed", timestamp=timestamp)
+        return True
+
+
+def _entry_time(entry: dict) -> Optional[datetime]:
+    """Get the time a journal entry was written.
+
+    Args:
+        entry: Journal entry (JSON output or sd-journal reader)
+
+    Returns:
+        The entry's realtime timestamp, or None if it has none
+    """
+    realtime = entry.get("__REALTIME_TIMESTAMP")
+    if realtime is None:
+        return None
+    if isinstance(realtime, datetime):
+        return realtime.astimezone(timezone.utc)
+    try:
+        return datetime.fromtimestamp(int(realtime) / 1_000_000, tz=timezone.utc)
+    except (TypeError, ValueError):
+        return None
@@ -2,16 +2,25 @@
 
 import logging
 import platform
-from datetime import datetime, timezone
-from typing import TYPE_CHECKING, Optional, Union
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
 
-from aw_client import ActivityWatchClient
 from aw_core.models import Event
 
-from .config import load_config
+from .clock import boottime, clock_at, wall_time
+from .config import RESTART_SETTINGS, config_path, load_config, validate_config
+from .metrics import Metrics, MetricsServer, StatsFile
+from .reload import ConfigReloader
+from .sender import EventSender
+from .spool import Spool
+from .state import LocalState, current_boot_id
 
 if TYPE_CHECKING:
+    from .dbus_fast_listener import DbusFastListener
     from .dbus_listener import DbusListener
+    from .evdev_listener import EvdevListener
+    from .fusion import FusionListener, SourceWatcher
     from .journal_listener import JournalListener
 
 logger = logging.getLogger(__name__)
@@ -25,55 +34,166 @@ class LidWatcher:
 
         Args:
             testing: If True, don't connect to ActivityWatch (for testing)
+
+        Raises:
+            ValueError: If the config file has invalid settings
         """
         self.config = load_config()
+        validate_config(self.config)
         self.testing = testing
 
         # Initialize ActivityWatch client
         if not testing:
-            self.client = ActivityWatchClient("aw-watcher-lid", testing=testing)
-            self.bucket_id = f"aw-watcher-lid_{platform.node()}"
+            # Imported here: aw_client pulls in requests and persistqueue, which
+            # --help and testing mode don't need
+            from aw_core.dirs import get_data_dir
+
+            from .client import SessionClient
+
+            self.client = SessionClient(
+                "aw-watcher-lid",
+                testing=testing,
+                connect_timeout=self.config.get("server_connect_timeout", 2.0),
+                read_timeout=self.config.get("server_read_timeout", 10.0),
+            )
+            self.bucket_id = default_bucket_id()
+            self.data_dir: Optional[Path] = Path(get_data_dir("aw-watcher-lid"))
         else:
             self.client = None  # type: ignore
             self.bucket_id = "aw-watcher-lid_test"
+            self.data_dir = None
+
+        # Local state (last event, shutdown records), read at startup without asking the server
+        self.state: Optional[LocalState] = None
+        if self.data_dir:
+            self.state = LocalState(self.data_dir / "state.json")
+        self.boot_id = current_boot_id()
+        self.last_event_end = self._load_last_event_end()
+
+        # Counters and latencies, exported by start() if configured
+        self.metrics = Metrics()
+        self._metrics_exporters: list[Union[MetricsServer, StatsFile]] = []
+
+        # Events are delivered by a background thread so handlers never block on the network
+        self.sender: Optional[EventSender] = None
+        if not testing:
+            self.sender = EventSender(
+                self.client,
+                self.bucket_id,
+                spool=self._open_spool(),
+                batch_size=self.config.get("spool_batch_size", 500),
+                queue_size=self.config.get("sender_queue_size", 1000),
+                overflow=self.config.get("sender_overflow", "drop_oldest"),
+                block_timeout=self.config.get("sender_block_timeout", 0.05),
+                retry_interval=self.config.get("sender_retry_interval", 5.0),
+                retry_max_interval=self.config.get("sender_retry_max_interval", 300.0),
+                metrics=self.metrics,
+                coalesce_interval=self.config.get("sender_coalesce_interval", 10.0),
+            )
 
         # Track current state
         self.current_event_start: Optional[datetime] = None
+        # clock.boottime() at current_event_start, for the duration
+        self.current_event_clock = 0.0
         self.current_lid_state: Optional[str] = None
         self.current_suspend_state: Optional[str] = None
+        # Lid and suspend state when a shutdown was announced, back if it is cancelled
+        self._before_shutdown: tuple[Optional[str], Optional[str]] = (None, None)
 
         # Event listener (will be set by start())
-        self.listener: Optional[Union["DbusListener", "JournalListener"]] = None
+        self.listener: Optional[
+            Union[
+                "DbusListener",
+                "DbusFastListener",
+                "EvdevListener",
+                "JournalListener",
+                "FusionListener",
+            ]
+        ] = None
+        # Called once the listener waits for events
+        self.on_ready: Optional[Callable[[], None]] = None
         self._stopped = False
 
-    def _setup_bucket(self) -> None:
-        """Create the ActivityWatch bucket if it doesn't exist."""
+        # Applies config changes without a restart (started by start())
+        self.reloader: Optional[ConfigReloader] = None
+
+    def _open_spool(self) -> Optional[Spool]:
+        """Open the on-disk event spool, if enabled.
+
+        Returns:
+            The spool, or None to keep unsent events in memory only
+        """
+        if not self.data_dir or not self.config.get("spool_enabled", True):
+            return None
+
         try:
-            self.client.create_bucket(
-                self.bucket_id,
-                event_type="systemafkstatus",
-                queued=False,  # Create bucket immediately, not queued
-            )
-            logger.info(f"Bucket created/verified: {self.bucket_id}")
-        except Exception as e:
-            logger.warning(f"Failed to create bucket (server may be down): {e}")
-            logger.info("Will retry bucket creation on first event")
+            return Spool(self.data_dir / "spool")
+        except OSError as e:
+            logger.warning(f"Could not open event spool, unsent events won't survive restarts: {e}")
+            return None
+
+    def _load_last_event_end(self) -> Optional[datetime]:
+        """Get the end of the last event sent, as kept in the local state file.
 
-    def handle_lid_event(self, lid_state: str) -> None:
+        Returns:
+            End of the last event, or None if unknown
+        """
+        if not self.state:
+            return None
+
+        last_event = self.state.load().get("last_event") or {}
+        if not last_event.get("end"):
+            return None
+        try:
+            return datetime.fromisoformat(last_event["end"])
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid last event record: {e}")
+            return None
+
+    def _save_state(self, durable: bool = False, **fields: Any) -> None:
+        """Write the current lid/suspend state and last event end to the local state file.
+
+        Args:
+            durable: fsync the state file (not needed for the frequent lid/suspend updates)
+            **fields: Additional fields to store
+        """
+        if not self.state:
+            return
+
+        last_event = {
+            "end": self.last_event_end.isoformat() if self.last_event_end else None,
+            "lid_state": self.current_lid_state,
+            "suspend_state": self.current_suspend_state,
+            "boot_id": self.boot_id,
+        }
+        try:
+            self.state.update(durable=durable, last_event=last_event, **fields)
+        except OSError as e:
+            logger.warning(f"Failed to write local state: {e}")
+
+    def handle_lid_event(
+        self,
+        lid_state: str,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
         """Handle a lid state change event.
 
         Args:
             lid_state: "open" or "closed"
+            timestamp: When the lid changed according to the event source (default: now)
+            clock: clock.boottime() at the lid change, if the source knows it
         """
-        now = datetime.now(timezone.utc)
+        now, clock = _event_time(timestamp, clock)
         logger.info(f"Lid event: {lid_state} at {now}")
 
         # If we have a pending event, close it
         if self.current_event_start:
-            self._close_current_event(now)
+            self._close_current_event(now, clock)
 
         # Start new event
         self.current_event_start = now
+        self.current_event_clock = clock
         self.current_lid_state = lid_state
         self.current_suspend_state = None
 
@@ -89,21 +209,34 @@ class LidWatcher:
                 event_source="lid",
             )
 
-    def handle_suspend_event(self, suspend_state: str) -> None:
+        self._save_state()
+
+    def handle_suspend_event(
+        self,
+        suspend_state: str,
+        on_committed: Optional[Callable[[], None]] = None,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
         """Handle a suspend/resume event.
 
         Args:
             suspend_state: "suspended" or "resumed"
+            on_committed: Called once the "suspended" event is safely queued or sent
+                (right away for "resumed")
+            timestamp: When it happened according to the event source (default: now)
+            clock: clock.boottime() at the event, if the source knows it
         """
-        now = datetime.now(timezone.utc)
+        now, clock = _event_time(timestamp, clock)
         logger.info(f"Suspend event: {suspend_state} at {now}")
 
         # If we have a pending event, close it
         if self.current_event_start:
-            self._close_current_event(now)
+            self._close_current_event(now, clock)
 
         # Start new event
         self.current_event_start = now
+        self.current_event_clock = clock
         self.current_suspend_state = suspend_state
         self.current_lid_state = None
 
@@ -116,18 +249,118 @@ class LidWatcher:
                 suspend_state=suspend_state,
                 boot_gap=False,
                 event_source="suspend",
+                on_committed=on_committed,
             )
+        elif on_committed:
+            on_committed()
 
-    def _close_current_event(self, end_time: datetime) -> None:
+        # The connection to aw-server likely died during the sleep
+        if suspend_state == "resumed" and self.sender:
+            self.sender.warm()
+
+        self._save_state()
+
+    def handle_shutdown_event(
+        self,
+        on_committed: Optional[Callable[[], None]] = None,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
+        """Handle the system announcing a shutdown or reboot.
+
+        Records a "shutdown" marker event and a local shutdown record, so the
+        next boot knows exactly when the downtime started.
+
+        Args:
+            on_committed: Called once the marker event is safely queued or sent
+            timestamp: When the shutdown was announced (default: now)
+            clock: clock.boottime() at the announcement, if the source knows it
+        """
+        now, clock = _event_time(timestamp, clock)
+        logger.info(f"Shutdown event at {now}")
+
+        if self.current_event_start:
+            self._close_current_event(now, clock)
+
+        self._before_shutdown = (self.current_lid_state, self.current_suspend_state)
+        self.current_lid_state = None
+        self.current_suspend_state = None
+
+        # Written before the marker is queued: committing it releases the shutdown inhibitor
+        self.note_event_end(now)
+        self._save_state(durable=True, shutdown={"time": now.isoformat(), "boot_id": self.boot_id})
+
+        self._send_event(
+            timestamp=now,
+            duration=0,
+            lid_state=None,
+            suspend_state=None,
+            boot_gap=False,
+            event_source="shutdown",
+            on_committed=on_committed,
+        )
+
+    def handle_shutdown_cancelled(
+        self,
+        timestamp: Optional[datetime] = None,
+        clock: Optional[float] = None,
+    ) -> None:
+        """Handle the system cancelling an announced shutdown.
+
+        Drops the local shutdown record, so the next boot doesn't start its
+        gap at the cancelled shutdown, and picks the lid or suspend state from
+        before the shutdown up again after the "shutdown" marker.
+
+        Args:
+            timestamp: When the shutdown was cancelled (default: now)
+            clock: clock.boottime() at the cancellation, if the source knows it
+        """
+        now, clock = _event_time(timestamp, clock)
+        logger.info(f"Shutdown cancelled at {now}")
+
+        lid_state, suspend_state = self._before_shutdown
+        self._before_shutdown = (None, None)
+        if self.current_event_start:
+            self._close_current_event(now, clock)
+
+        if lid_state or suspend_state:
+            self.current_event_start = now
+            self.current_event_clock = clock
+            self.current_lid_state = lid_state
+            self.current_suspend_state = suspend_state
+            # Like handle_lid_event(): a closed lid is sent right away
+            if lid_state == "closed":
+                self._send_event(
+                    timestamp=now,
+                    duration=0,
+                    lid_state=lid_state,
+                    suspend_state=None,
+                    boot_gap=False,
+                    event_source="lid",
+                )
+
+        # The system was still running: a later gap starts no earlier than this
+        self.note_event_end(now)
+        self._save_state(durable=True, shutdown=None)
+
+    def _close_current_event(self, end_time: datetime, end_clock: float) -> None:
         """Close the current event and send it to ActivityWatch.
 
+        The duration is measured on the boot clock, so a wall-clock step
+        (e.g. NTP correcting the time after a resume) doesn't distort it.
+
         Args:
             end_time: When the event ended
+            end_clock: clock.boottime() when the event ended
         """
         if not self.current_event_start:
             return
 
-        duration = (end_time - self.current_event_start).total_seconds()
+        duration = max(0.0, end_clock - self.current_event_clock)
+        logger.debug(
+            f"Event duration {duration:.3f}s "
+            f"(wall clock: {(end_time - self.current_event_start).total_seconds():.3f}s)"
+        )
 
         # Send the completed event (no filtering - that happens in aw-export-timewarrior)
         self._send_event(
@@ -141,7 +374,7 @@ class LidWatcher:
 
         self.current_event_start = None
 
-    def _send_event(
+    def _build_event(
         self,
         timestamp: datetime,
         duration: float,
@@ -149,8 +382,8 @@ class LidWatcher:
         suspend_state: Optional[str],
         boot_gap: bool,
         event_source: str,
-    ) -> None:
-        """Send an event to ActivityWatch.
+    ) -> Event:
+        """Build an ActivityWatch event.
 
         Args:
             timestamp: Event start time
@@ -158,10 +391,18 @@ class LidWatcher:
             lid_state: "open", "closed", or None
             suspend_state: "suspended", "resumed", or None
             boot_gap: Whether this is a boot gap event
-            event_source: "lid", "suspend", or "boot"
+            event_source: "lid", "suspend", "boot" or "shutdown"
+
+        Returns:
+            The event
         """
         # Determine status based on state
-        if lid_state == "closed" or suspend_state == "suspended" or boot_gap:
+        if (
+            lid_state == "closed"
+            or suspend_state == "suspended"
+            or boot_gap
+            or event_source == "shutdown"
+        ):
             status = "system-afk"
         else:
             status = "not-afk"
@@ -173,30 +414,122 @@ class LidWatcher:
             "boot_gap": boot_gap,
             "event_source": event_source,
         }
+        return Event(timestamp=timestamp, duration=duration, data=event_data)
 
-        if not self.testing:
-            # Create Event object and use heartbeat with large pulsetime for event merging
-            event = Event(timestamp=timestamp, duration=duration, data=event_data)
-            self.client.heartbeat(
-                self.bucket_id,
-                event=event,
-                pulsetime=3600,  # 1 hour - events within this window will be merged
-            )
+    def _send_event(
+        self,
+        timestamp: datetime,
+        duration: float,
+        lid_state: Optional[str],
+        suspend_state: Optional[str],
+        boot_gap: bool,
+        event_source: str,
+        on_committed: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Send an event to ActivityWatch.
+
+        Args:
+            timestamp: Event start time
+            duration: Event duration in seconds
+            lid_state: "open", "closed", or None
+            suspend_state: "suspended", "resumed", or None
+            boot_gap: Whether this is a boot gap event
+            event_source: "lid", "suspend", "boot" or "shutdown"
+            on_committed: Called once the event is durably queued or sent
+        """
+        event = self._build_event(
+            timestamp, duration, lid_state, suspend_state, boot_gap, event_source
+        )
+        status = event.data["status"]
+        self.metrics.inc("events_total", source=event_source)
+
+        if self.sender:
+            # Sent as a heartbeat with a 1 hour pulsetime, so the server merges events
+            self.sender.enqueue(event, on_committed=on_committed)
+        elif on_committed:
+            on_committed()
+
+        self.note_event_end(timestamp + timedelta(seconds=duration))
 
         logger.info(
-            f"Event sent: {event_source} {status} at {timestamp} for {duration}s "
+            f"Event queued: {event_source} {status} at {timestamp} for {duration}s "
             f"(lid={lid_state}, suspend={suspend_state})"
         )
 
+    def apply_config(self, config: dict) -> list[str]:
+        """Switch to a new, validated config while running.
+
+        Sender settings, server timeouts and the listener's intervals and
+        rules change right away; RESTART_SETTINGS (e.g. the boot gap
+        settings, only used at startup) are logged as needing a restart. The
+        current event and all other state are kept.
+
+        Args:
+            config: The new config
+
+        Returns:
+            Names of the settings that changed
+        """
+        changed = sorted(
+            key for key in {*config, *self.config} if config.get(key) != self.config.get(key)
+        )
+        self.config = config
+
+        if self.sender:
+            self.sender.reconfigure(
+                queue_size=config.get("sender_queue_size", 1000),
+                overflow=config.get("sender_overflow", "drop_oldest"),
+                block_timeout=config.get("sender_block_timeout", 0.05),
+                retry_interval=config.get("sender_retry_interval", 5.0),
+                retry_max_interval=config.get("sender_retry_max_interval", 300.0),
+                batch_size=config.get("spool_batch_size", 500),
+                coalesce_interval=config.get("sender_coalesce_interval", 10.0),
+            )
+        if self.client is not None and hasattr(self.client, "timeout"):
+            self.client.timeout = (
+                config.get("server_connect_timeout", 2.0),
+                config.get("server_read_timeout", 10.0),
+            )
+        apply_config = getattr(self.listener, "apply_config", None)
+        if apply_config:
+            apply_config(config)
+
+        restart = [key for key in changed if key in RESTART_SETTINGS]
+        if restart:
+            logger.warning(f"Restart to apply: {', '.join(restart)}")
+        return changed
+
+    def listener_ready(self) -> None:
+        """Called by the listener once it is set up and waiting for events."""
+        logger.debug("Listener ready")
+        if self.on_ready:
+            self.on_ready()
+
+    def note_event_end(self, end: datetime) -> None:
+        """Remember the end of a sent event (saved with the next _save_state()).
+
+        Args:
+            end: When the event ended
+        """
+        if self.last_event_end is None or end > self.last_event_end:
+            self.last_event_end = end
+
     def start(self) -> None:
         """Start the watcher.
 
-        This will set up the appropriate event listener (D-Bus or journal)
-        and begin monitoring for lid and suspend events.
+        This will set up the appropriate event listener (D-Bus or journal,
+        or several at once with "fusion") and begin monitoring for lid and
+        suspend events.
         """
-        # Setup bucket (with retry if server is down)
-        if not self.testing:
-            self._setup_bucket()
+        # The sender creates the bucket once aw-server is reachable
+        if self.sender:
+            self.sender.start()
+
+        self._start_metrics_exporters()
+
+        # Reload the config on SIGHUP (see __main__) and when the file changes
+        self.reloader = ConfigReloader(self, config_path())
+        self.reloader.start()
 
         # Check for boot gaps on startup
         from .boot_detector import BootDetector
@@ -204,12 +537,22 @@ class LidWatcher:
         boot_detector = BootDetector(self)
         boot_detector.check_for_boot_gap()
 
-        # Try D-Bus first
-        try:
-            from .dbus_listener import DbusListener
+        # An explicitly configured listener gets no fallback
+        listener_name = self.config.get("listener", "auto")
+        if listener_name != "auto":
+            self.listener = self._create_listener(listener_name)
+            logger.info(f"Using {listener_name} listener")
+            self.listener.start()
+            return
 
-            self.listener = DbusListener(self)
-            logger.info("Using D-Bus listener")
+        # Try D-Bus first: dbus-python, or dbus-fast if that isn't installed
+        try:
+            try:
+                self.listener = self._create_listener("dbus")
+                logger.info("Using D-Bus listener")
+            except ImportError:
+                self.listener = self._create_listener("dbus-fast")
+                logger.info("Using D-Bus listener (dbus-fast)")
             self.listener.start()
         except (ImportError, Exception) as e:
             logger.warning(f"D-Bus not available: {e}")
@@ -221,6 +564,67 @@ class LidWatcher:
             self.listener = JournalListener(self)
             self.listener.start()
 
+    def _start_metrics_exporters(self) -> None:
+        """Start the metrics endpoint and stats file writer, if configured."""
+        port = self.config.get("metrics_port", 0)
+        if port:
+            server = MetricsServer(self.metrics, port)
+            try:
+                server.start()
+                self._metrics_exporters.append(server)
+            except OSError as e:
+                logger.warning(f"Could not serve metrics on port {port}: {e}")
+
+        interval = self.config.get("stats_file_interval", 0.0)
+        if interval and self.data_dir:
+            if self.config.get("zero_wakeup_idle", False):
+                logger.info("zero_wakeup_idle: stats.json is only written at startup and exit")
+                interval = 0
+            stats_file = StatsFile(self.metrics, self.data_dir / "stats.json", interval)
+            stats_file.start()
+            self._metrics_exporters.append(stats_file)
+
+    def _create_listener(
+        self, name: str, watcher: Optional["SourceWatcher"] = None
+    ) -> Union[
+        "DbusListener", "DbusFastListener", "EvdevListener", "JournalListener", "FusionListener"
+    ]:
+        """Create an event listener by name.
+
+        Args:
+            name: "dbus", "dbus-fast", "evdev", "journal" or "fusion"
+            watcher: What the listener reports to, if not this watcher (a fused source)
+
+        Returns:
+            The listener (not started yet)
+        """
+        target: Any = watcher or self
+        if name == "dbus":
+            from .dbus_listener import DbusListener
+
+            return DbusListener(target)
+        if name == "dbus-fast":
+            from .dbus_fast_listener import DbusFastListener
+
+            return DbusFastListener(target)
+        if name == "evdev":
+            from .evdev_listener import EvdevListener
+
+            return EvdevListener(target)
+        if name == "journal":
+            from .journal_listener import JournalListener
+
+            return JournalListener(target)
+        if name == "fusion" and watcher is None:
+            from .fusion import FusionListener
+
+            return FusionListener(
+                self,
+                self.config.get("fusion_listeners", ["dbus", "evdev", "journal"]),
+                window=self.config.get("fusion_window", 5.0),
+            )
+        raise ValueError(f"Unknown listener: {name}")
+
     def stop(self) -> None:
         """Stop the watcher."""
         if self._stopped:
@@ -229,14 +633,52 @@ class LidWatcher:
 
         # Close any pending event
         if self.current_event_start:
-            self._close_current_event(datetime.now(timezone.utc))
+            self._close_current_event(*_event_time(None, None))
+
+        self._save_state()
+
+        if self.reloader:
+            self.reloader.stop()
 
         # Stop the listener
         if self.listener:
             self.listener.stop()
 
+        # Send what is still queued, but don't hang shutdown on a dead server
+        if self.sender:
+            self.sender.stop(timeout=self.config.get("sender_flush_timeout", 5.0))
+
         # Disconnect from ActivityWatch (flushes queued requests)
         if not self.testing and self.client:
             self.client.disconnect()
 
+        # Last, so the stats file has the final counts
+        for exporter in self._metrics_exporters:
+            exporter.stop()
+        self._metrics_exporters = []
+
         logger.info("Watcher stopped")
+
+
+def _event_time(timestamp: Optional[datetime], clock: Optional[float]) -> tuple[datetime, float]:
+    """Complete an event time from what the event source provided.
+
+    Args:
+        timestamp: Wall-clock time of the event, if known
+        clock: clock.boottime() at the event, if known
+
+    Returns:
+        (wall-clock time, boot clock time) of the event, "now" if neither is known
+    """
+    if clock is None:
+        if timestamp is None:
+            return datetime.now(timezone.utc), boottime()
+        return timestamp, clock_at(timestamp)
+    if timestamp is None:
+        return wall_time(clock), clock
+    return timestamp, clock
+
+
+def default_bucket_id() -> str:
+    """Name of the watcher's bucket on this host."""
+    return f"aw-watcher-lid_{platform.node()}"
@@ -0,0 +1,376 @@
+"""In-process metrics, exported as Prometheus text and as a JSON stats file."""
+
+import bisect
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from .wakeup import WakeupPipe
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "aw_watcher_lid_"
+
+# Histogram bucket bounds in seconds, from fast local calls to a slow aw-server
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Metrics every watcher has: (type, name, help)
+METRICS = [
+    ("counter", "events_total", "Events queued for aw-server, by event source"),
+    ("histogram", "send_duration_seconds", "Time to deliver events to aw-server, by request"),
+    ("counter", "send_failures_total", "Failed deliveries to aw-server"),
+    ("counter", "send_retries_total", "Deliveries retried after a failure"),
+    ("counter", "listener_wakeups_total", "Times a listener woke up, by listener"),
+    ("histogram", "dbus_call_duration_seconds", "Duration of D-Bus calls to logind, by call"),
+    ("histogram", "boot_probe_duration_seconds", "Duration of the boot gap activity probe"),
+    ("counter", "fusion_events_total", "Changes passed on by the fusion listener, by first source"),
+    (
+        "counter",
+        "fusion_dropped_total",
+        "Reports the fusion listener dropped, by source and reason",
+    ),
+    ("histogram", "fusion_lag_seconds", "How much later than the first source a duplicate came"),
+    ("counter", "config_reloads_total", "Config reloads, by result (applied or invalid)"),
+]
+
+INF = float("inf")
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = [*labels, extra] if extra else list(labels)
+    if not pairs:
+        return ""
+    escaped = (
+        key + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _bound_label(bound: float) -> str:
+    return "+Inf" if bound == INF else f"{bound:g}"
+
+
+class _Histogram:
+    """Counts of observations per bucket, plus their sum."""
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Registry of counters, histograms and gauges, safe to update from any thread.
+
+    Updating a metric is a dict lookup and an addition under a lock, cheap
+    enough for every event and every listener wake-up.
+    """
+
+    def __init__(self) -> None:
+        """Register the standard metrics."""
+        self._lock = threading.Lock()
+        self._types: dict[str, str] = {}
+        self._help: dict[str, str] = {}
+        self._values: dict[str, dict[Labels, Any]] = {}
+        self._callbacks: dict[str, Callable[[], float]] = {}
+        for kind, name, help_text in METRICS:
+            self._register(kind, name, help_text)
+
+    def _register(self, kind: str, name: str, help_text: str) -> None:
+        self._types[name] = kind
+        self._help[name] = help_text
+        self._values.setdefault(name, {})
+
+    def register_callback(
+        self, kind: str, name: str, help_text: str, read: Callable[[], float]
+    ) -> None:
+        """Add a metric whose value is read when exported (e.g. queue depth).
+
+        Args:
+            kind: "gauge" or "counter"
+            name: Metric name without the aw_watcher_lid_ prefix
+            help_text: Description
+            read: Returns the current value
+        """
+        with self._lock:
+            self._register(kind, name, help_text)
+            self._callbacks[name] = read
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Increase a counter.
+
+        Args:
+            name: Counter name
+            value: Amount to add
+            **labels: Label values
+        """
+        key = _labels(labels)
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a histogram observation.
+
+        Args:
+            name: Histogram name
+            value: Observed value (seconds)
+            **labels: Label values
+        """
+        key = _labels(labels)
+        with self._lock:
+            values = self._values[name]
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = _Histogram(LATENCY_BUCKETS)
+            histogram.observe(value)
+
+    def observer(self, name: str, **labels: Any) -> Callable[[float], None]:
+        """Bind one labelled histogram, for recording on a hot path.
+
+        Args:
+            name: Histogram name
+            **labels: Label values
+
+        Returns:
+            Records an observation (seconds) without looking up the labels again
+        """
+        key = _labels(labels)
+        with self._lock:
+            values = self._values[name]
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = _Histogram(LATENCY_BUCKETS)
+
+        def observe(value: float) -> None:
+            with self._lock:
+                histogram.observe(value)
+
+        return observe
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe the duration of a block in a histogram (also if it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def _read_callbacks(self) -> dict[str, float]:
+        values = {}
+        for name, read in self._callbacks.items():
+            try:
+                values[name] = float(read())
+            except Exception as e:
+                logger.debug(f"Failed to read metric {name}: {e}")
+        return values
+
+    def render_prometheus(self) -> str:
+        """Export all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            callbacks = self._read_callbacks()
+            for name, kind in self._types.items():
+                full_name = PREFIX + name
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                if name in callbacks:
+                    lines.append(f"{full_name} {callbacks[name]:g}")
+                    continue
+                for labels, value in sorted(self._values[name].items(), key=lambda item: item[0]):
+                    if kind != "histogram":
+                        lines.append(f"{full_name}{_format_labels(labels)} {value:g}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([*value.bounds, INF], value.counts):
+                        cumulative += count
+                        le = ("le", _bound_label(bound))
+                        lines.append(f"{full_name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {value.sum:g}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, Any]:
+        """Export all metrics as plain data (for the stats file).
+
+        Returns:
+            Metric name to value; labelled metrics map "key=value,..." to values,
+            histograms give count, sum and the bucket counts
+        """
+        result: dict[str, Any] = {}
+        with self._lock:
+            result.update(self._read_callbacks())
+            for name, kind in self._types.items():
+                if name in self._callbacks:
+                    continue
+                entries = {}
+                for labels, value in self._values[name].items():
+                    key = ",".join(f"{k}={v}" for k, v in labels)
+                    if kind == "histogram":
+                        entries[key] = {
+                            "count": value.count,
+                            "sum": value.sum,
+                            "buckets": {
+                                _bound_label(bound): count
+                                for bound, count in zip([*value.bounds, INF], value.counts)
+                            },
+                        }
+                    else:
+                        entries[key] = value
+                result[name] = entries
+        return result
+
+
+class MetricsServer:
+    """Serves the metrics at http://<host>:<port>/metrics from a daemon thread."""
+
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1") -> None:
+        """Initialize the endpoint.
+
+        Args:
+            metrics: Metrics to serve
+            port: Port to listen on
+            host: Address to listen on (localhost only by default)
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._httpd: Optional["ThreadingHTTPServer"] = None
+        self._thread: Optional[threading.Thread] = None
+        # Used by stop() to wake up the accept loop (open while it runs)
+        self._wakeup: Optional[WakeupPipe] = None
+
+    def start(self) -> None:
+        """Start listening."""
+        # Only loaded when the endpoint is enabled
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._wakeup = WakeupPipe()
+        self._thread = threading.Thread(
+            target=self._serve, args=(self._wakeup,), name="aw-watcher-lid-metrics", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def _serve(self, wakeup: WakeupPipe) -> None:
+        """Accept requests until stop().
+
+        Unlike serve_forever(), which polls for shutdown every 0.5s, this
+        blocks on the listening socket and the wake-up pipe only.
+
+        Args:
+            wakeup: The pipe stop() wakes the loop with, closed when it exits
+        """
+        httpd = self._httpd
+        try:
+            while httpd is not None:
+                readable, _, _ = select.select([httpd.fileno(), wakeup.fd], [], [])
+                if wakeup.fd in readable:
+                    return
+                httpd.handle_request()
+        finally:
+            wakeup.close()
+
+    def stop(self) -> None:
+        """Stop listening."""
+        if self._httpd:
+            if self._wakeup:
+                self._wakeup.wake()
+                self._wakeup = None
+            if self._thread:
+                self._thread.join()
+                self._thread = None
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class StatsFile:
+    """Rewrites a JSON stats file with the current metrics at a fixed interval."""
+
+    def __init__(self, metrics: Metrics, path: Path, interval: float) -> None:
+        """Initialize the writer.
+
+        Args:
+            metrics: Metrics to write
+            path: File to (re)write
+            interval: Seconds between writes (0: only when starting and stopping)
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._thread = threading.Thread(target=self._run, name="aw-watcher-lid-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the writer, writing the file one last time."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            self.write()
+            if self._stop.wait(self.interval or None):
+                self.write()
+                return
+
+    def write(self) -> None:
+        """Write the stats file atomically."""
+        stats = {"time": datetime.now(timezone.utc).isoformat(), **self.metrics.snapshot()}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(stats, indent=2, sort_keys=True) + "\n")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write stats file {self.path}: {e}")
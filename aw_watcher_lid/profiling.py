@@ -0,0 +1,184 @@
+"""Profiling on demand for a running watcher: SIGUSR1 for cProfile, SIGUSR2 for tracemalloc."""
+
+import io
+import logging
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Frames kept per traced allocation
+TRACEMALLOC_FRAMES = 10
+
+
+class Profiler:
+    """CPU and memory profiles of a running watcher, written to a directory.
+
+    SIGUSR1 starts cProfile and, sent again, stops it and writes the profile
+    (`cpu-<time>.pstats` for pstats/snakeviz, `cpu-<time>.txt` with the top
+    functions). cProfile records every thread on Python 3.12 and later, so
+    it covers the listener and the sender thread (older versions only see
+    the main thread, where the listener runs).
+
+    SIGUSR2 writes `memory-<time>.txt` with the allocations that grew most
+    since the previous SIGUSR2. The first one starts tracemalloc (which
+    slows allocations down until the watcher exits) and writes the current
+    top allocations.
+    """
+
+    def __init__(self, profile_dir: Optional[Path] = None, top: int = 25) -> None:
+        """Initialize the profiler.
+
+        Args:
+            profile_dir: Where to write profiles (default: "profiles" in the
+                ActivityWatch data dir, created when first needed)
+            top: Number of functions or allocation sites listed
+        """
+        self._profile_dir = profile_dir
+        self.top = top
+        self._cpu: Optional[Any] = None
+        self._snapshot: Optional[Any] = None
+        # Reentrant: SIGUSR1 is handled on the main thread, which may hold it in stop()
+        self._lock = threading.RLock()
+
+    @property
+    def profile_dir(self) -> Path:
+        """The directory profiles are written to."""
+        if self._profile_dir is None:
+            from aw_core.dirs import get_data_dir
+
+            self._profile_dir = Path(get_data_dir("aw-watcher-lid")) / "profiles"
+        self._profile_dir.mkdir(parents=True, exist_ok=True)
+        return self._profile_dir
+
+    def install(self) -> None:
+        """Handle SIGUSR1 and SIGUSR2 (must be called from the main thread)."""
+        signal.signal(signal.SIGUSR1, self._on_sigusr1)
+        signal.signal(signal.SIGUSR2, self._on_sigusr2)
+
+    def _on_sigusr1(self, signum: int, frame: Any) -> None:
+        # cProfile is switched here, on the main thread: before Python 3.12 it
+        # only sees the thread that enabled it. Writing the profile takes a while
+        profile = self._run_safely(self._switch_cpu)
+        if profile is not None:
+            self._run_in_thread(self._write_cpu, profile)
+
+    def _on_sigusr2(self, signum: int, frame: Any) -> None:
+        # Comparing snapshots takes a while: not on the listener's (main) thread
+        self._run_in_thread(self.snapshot_memory)
+
+    def _run_safely(self, action: Any, *args: Any) -> Any:
+        """Run a profiling action; a failure is logged, never raised into the watcher.
+
+        Returns:
+            What the action returned, or None if it failed
+        """
+        try:
+            return action(*args)
+        except Exception as e:
+            logger.error(f"Profiling failed: {e}", exc_info=True)
+            return None
+
+    def _run_in_thread(self, action: Any, *args: Any) -> None:
+        """Run a profiling action on a thread of its own, off the listener's (main) thread."""
+        threading.Thread(
+            target=self._run_safely,
+            args=(action, *args),
+            name="aw-watcher-lid-profiler",
+            daemon=True,
+        ).start()
+
+    def toggle_cpu(self) -> Optional[Path]:
+        """Start cProfile, or stop it and write the profile.
+
+        Returns:
+            The .pstats file written, or None if profiling just started
+        """
+        profile = self._switch_cpu()
+        return None if profile is None else self._write_cpu(profile)
+
+    def _switch_cpu(self) -> Optional[Any]:
+        """Start cProfile, or stop it.
+
+        Returns:
+            The stopped profile, still to be written, or None if profiling just started
+        """
+        import cProfile
+
+        with self._lock:
+            if self._cpu is None:
+                profile = cProfile.Profile()
+                profile.enable()
+                self._cpu = profile
+                logger.info("CPU profiling started (send SIGUSR1 again to stop)")
+                return None
+            profile, self._cpu = self._cpu, None
+
+        profile.disable()
+        return profile
+
+    def _write_cpu(self, profile: Any) -> Path:
+        """Write a cProfile profile and its top functions."""
+        import pstats
+
+        path = self._path("cpu", ".pstats")
+        profile.dump_stats(path)
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        path.with_suffix(".txt").write_text(summary.getvalue())
+        logger.info(f"CPU profile written to {path}")
+        return path
+
+    def snapshot_memory(self) -> Path:
+        """Write the allocations that grew most since the previous snapshot.
+
+        Returns:
+            The file written
+        """
+        import tracemalloc
+
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                logger.info("Memory tracing started (send SIGUSR2 again for a diff)")
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+            previous, self._snapshot = self._snapshot, snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Traced memory: {current / 1024:.1f} KiB (peak {peak / 1024:.1f} KiB)"]
+        if previous is None:
+            lines.append(f"Top {self.top} allocation sites:")
+            lines += [str(stat) for stat in snapshot.statistics("lineno")[: self.top]]
+        else:
+            lines.append(f"Top {self.top} changes since the previous snapshot:")
+            lines += [str(stat) for stat in snapshot.compare_to(previous, "lineno")[: self.top]]
+
+        path = self._path("memory", ".txt")
+        path.write_text("\n".join(lines) + "\n")
+        logger.info(f"Memory snapshot written to {path}")
+        return path
+
+    def stop(self) -> None:
+        """Write the CPU profile if one is running, and stop memory tracing."""
+        import tracemalloc
+
+        with self._lock:
+            profile, self._cpu = self._cpu, None
+        if profile:
+            profile.disable()
+            self._run_safely(self._write_cpu, profile)
+        if self._snapshot is not None:
+            tracemalloc.stop()
+            self._snapshot = None
+
+    def _path(self, kind: str, suffix: str) -> Path:
+        """A new file name with the current time, e.g. cpu-20250115T140000.123.pstats."""
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now)) + f".{int(now % 1 * 1000):03d}"
+        return self.profile_dir / f"{kind}-{stamp}{suffix}"
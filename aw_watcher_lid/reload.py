@@ -0,0 +1,176 @@
+"""Config reload without a restart, on SIGHUP or when the config file changes."""
+
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .config import load_config, validate_config
+from .wakeup import WakeupPipe
+
+if TYPE_CHECKING:
+    from .lid import LidWatcher
+
+logger = logging.getLogger(__name__)
+
+# From linux/inotify.h: a file opened for writing was closed, a file was moved in
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+# struct inotify_event: int wd, uint32 mask, uint32 cookie, uint32 len, char name[len]
+INOTIFY_EVENT = struct.Struct("@iIII")
+
+# Bytes written to the wakeup pipe
+RELOAD = b"r"
+STOP = b"\0"
+
+
+def inotify_watch(directory: Path) -> int:
+    """Watch a directory for files written or moved into it.
+
+    Editors either rewrite a file in place (IN_CLOSE_WRITE) or write a new
+    one and rename it over the old one (IN_MOVED_TO), so the directory is
+    watched rather than the file.
+
+    Args:
+        directory: Directory to watch
+
+    Returns:
+        The inotify file descriptor (non-blocking)
+
+    Raises:
+        OSError: If inotify isn't available
+    """
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    fd = int(libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC))
+    if fd < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        errno = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(errno, f"{os.strerror(errno)}: {directory}")
+    return fd
+
+
+def inotify_names(data: bytes) -> set[str]:
+    """Get the file names from a read() of inotify events.
+
+    Args:
+        data: What read() returned
+
+    Returns:
+        Names of the files the events are about
+    """
+    names = set()
+    offset = 0
+    while offset + INOTIFY_EVENT.size <= len(data):
+        _wd, _mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+        offset += INOTIFY_EVENT.size
+        names.add(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+        offset += length
+    return names
+
+
+class ConfigReloader:
+    """Reloads the config when asked (SIGHUP) or when the config file changes.
+
+    A reloaded config is validated first; an invalid one is logged and the
+    running config kept. A valid one is applied to the running watcher (see
+    LidWatcher.apply_config()), so intervals, journal rules and sender
+    settings change without restarting, which would check for a boot gap again and
+    split the current event. Reloads run in one thread that blocks on the
+    inotify descriptor and a wakeup pipe, so it never wakes up on its own.
+    """
+
+    def __init__(self, watcher: "LidWatcher", path: Path) -> None:
+        """Initialize the reloader.
+
+        Args:
+            watcher: The watcher to apply reloaded configs to
+            path: The config file load_config() reads
+        """
+        self.watcher = watcher
+        self.path = path
+        self.reloads = 0
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[int] = None
+        # Closed by the reloader thread when it exits (or by stop() if it never ran)
+        self._wakeup = WakeupPipe()
+
+    def start(self) -> None:
+        """Start watching the config file and waiting for reload requests."""
+        try:
+            self._inotify = inotify_watch(self.path.parent)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Not watching {self.path} for changes, reload with SIGHUP: {e}")
+
+        self._thread = threading.Thread(target=self._run, name="aw-watcher-lid-config", daemon=True)
+        self._thread.start()
+
+    def request(self) -> None:
+        """Ask for a reload (safe to call from a signal handler)."""
+        self._wakeup.wake(RELOAD)
+
+    def stop(self) -> None:
+        """Stop the reloader thread."""
+        self._wakeup.wake(STOP)
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        else:
+            self._wakeup.close()
+
+    def _run(self) -> None:
+        """Reload whenever asked or the config file changed, until stop()."""
+        poll = select.poll()
+        poll.register(self._wakeup.fd, select.POLLIN)
+        if self._inotify is not None:
+            poll.register(self._inotify, select.POLLIN)
+        try:
+            while True:
+                reload = False
+                for fd, _mask in poll.poll():
+                    if fd == self._wakeup.fd:
+                        if STOP in self._wakeup.read():
+                            return
+                        reload = True
+                    elif self.path.name in inotify_names(os.read(fd, 4096)):
+                        reload = True
+                if reload:
+                    self.reload()
+        finally:
+            if self._inotify is not None:
+                os.close(self._inotify)
+                self._inotify = None
+            self._wakeup.close()
+
+    def reload(self) -> bool:
+        """Load, check and apply the config file.
+
+        Returns:
+            True if the new config was applied, False if it was invalid
+        """
+        started = time.perf_counter()
+        try:
+            config = load_config()
+            validate_config(config)
+        except Exception as e:
+            logger.error(f"Invalid config in {self.path}, keeping the current one: {e}")
+            self.watcher.metrics.inc("config_reloads_total", result="invalid")
+            return False
+
+        changed = self.watcher.apply_config(config)
+        self.reloads += 1
+        self.watcher.metrics.inc("config_reloads_total", result="applied")
+        took = (time.perf_counter() - started) * 1000
+        if changed:
+            logger.info(f"Config reloaded in {took:.1f}ms, changed: {', '.join(changed)}")
+        else:
+            logger.info(f"Config reloaded in {took:.1f}ms, nothing changed")
+        return True
@@ -0,0 +1,565 @@
+"""Background sender delivering events to ActivityWatch off the listener threads."""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence, Union
+
+from .coalescer import Coalescer, Held, merge_heartbeats
+from .metrics import Metrics
+from .spool import MemorySpool, Spool
+
+if TYPE_CHECKING:
+    from aw_core.models import Event
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Backlogs up to this size are sent as individual heartbeats (merged by the
+# server as usual), longer ones merged locally and sent in insert_events batches
+HEARTBEAT_BACKLOG = 10
+
+
+class EventSender:
+    """Drains a bounded in-memory event queue into aw-server from a worker thread.
+
+    Listener callbacks only append to the queue, so a slow or unreachable
+    aw-server never stalls them. The worker moves queued events into the spool
+    (write-ahead) and delivers from there: events as heartbeats while they
+    trickle in, a backlog in batches with insert_events, merged first as
+    aw-server would merge the heartbeats. With a coalesce interval,
+    heartbeats that aw-server would merge are merged here first (see
+    Coalescer); they stay in the spool until the merged event is sent.
+    Failed deliveries are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket_id: str,
+        spool: Optional[Union[Spool, MemorySpool]] = None,
+        queue_size: int = 1000,
+        overflow: str = "drop_oldest",
+        block_timeout: float = 0.05,
+        retry_interval: float = 5.0,
+        retry_max_interval: float = 300.0,
+        batch_size: int = 500,
+        pulsetime: float = 3600.0,
+        event_type: str = "systemafkstatus",
+        metrics: Optional[Metrics] = None,
+        coalesce_interval: float = 0.0,
+    ) -> None:
+        """Initialize the sender.
+
+        Args:
+            client: ActivityWatchClient used for delivery
+            bucket_id: Bucket to send events to
+            spool: Where events wait for delivery (default: in memory only)
+            queue_size: Maximum number of events waiting to be spooled
+            overflow: What to do when the queue is full: "drop_oldest",
+                "drop_newest" or "block" (wait up to block_timeout, then drop the new event)
+            block_timeout: Longest time enqueue() may wait with the "block" policy
+            retry_interval: Seconds to wait before the first retry of a failed delivery
+            retry_max_interval: Longest wait between retries (the wait doubles
+                after every failure in a row, with jitter)
+            batch_size: Maximum number of spooled events per insert request
+            pulsetime: Heartbeat merge window in seconds
+            event_type: Event type used when creating the bucket
+            metrics: Where to count requests and failures (default: a private registry)
+            coalesce_interval: Longest time in seconds to hold a heartbeat back
+                for merging with the next ones (0: send every heartbeat)
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.client = client
+        self.bucket_id = bucket_id
+        self.spool = spool if spool is not None else MemorySpool()
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.retry_interval = retry_interval
+        self.retry_max_interval = retry_max_interval
+        self.batch_size = batch_size
+        self.pulsetime = pulsetime
+        self.event_type = event_type
+
+        self.sent = 0
+        self.requests = 0
+        self.dropped = 0
+        self.failures = 0
+
+        self.coalescer: Optional[Coalescer] = None
+        if coalesce_interval > 0:
+            self.coalescer = Coalescer(pulsetime, coalesce_interval, max_events=batch_size)
+
+        self.metrics = metrics or Metrics()
+        self.metrics.register_callback(
+            "gauge", "pending_events", "Events waiting to be sent", lambda: self.pending
+        )
+        self.metrics.register_callback(
+            "counter",
+            "dropped_events_total",
+            "Events dropped from a full send queue",
+            lambda: self.dropped,
+        )
+        self.metrics.register_callback(
+            "counter",
+            "coalesced_heartbeats_total",
+            "Heartbeats merged into another one before sending, saving a request",
+            lambda: self.coalescer.merged if self.coalescer else 0,
+        )
+
+        self._queue: deque[tuple["Event", Optional[Callable[[], None]]]] = deque()
+        # Builders of events that can only be made once aw-server answers
+        self._deferred: deque[Callable[[], list["Event"]]] = deque()
+        # Commit callbacks waiting for delivery (only used with a non-durable spool)
+        self._awaiting_delivery: list[Callable[[], None]] = []
+        self._cond = threading.Condition()
+        self._closing = False
+        self._abort = False
+        self._warm = False
+        # Failed deliveries in a row, for the retry backoff
+        self._retries = 0
+        self._bucket_ready = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def pending(self) -> int:
+        """Number of events waiting to be sent."""
+        return len(self._queue) + len(self.spool) + len(self._deferred)
+
+    @property
+    def held(self) -> int:
+        """Number of spooled events held back by the coalescer."""
+        return self.coalescer.held_count if self.coalescer else 0
+
+    def start(self) -> None:
+        """Start the sender worker thread."""
+        self._thread = threading.Thread(target=self._run, name="aw-watcher-lid-sender", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, event: "Event", on_committed: Optional[Callable[[], None]] = None) -> bool:
+        """Queue an event for delivery.
+
+        Args:
+            event: The event to send
+            on_committed: Called from the worker thread once the event is
+                durably spooled (or sent, if the spool is in memory only)
+
+        Returns:
+            False if the event (or, with "drop_oldest", an older one) was dropped
+        """
+        with self._cond:
+            accepted = True
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "block":
+                    self._cond.wait_for(
+                        lambda: len(self._queue) < self.queue_size, timeout=self.block_timeout
+                    )
+                if len(self._queue) >= self.queue_size:
+                    self.dropped += 1
+                    accepted = False
+                    if self.overflow == "drop_oldest":
+                        _dropped, dropped_callback = self._queue.popleft()
+                        logger.warning("Send queue full, dropped oldest event")
+                        _run_callbacks([dropped_callback])
+                    else:
+                        logger.warning("Send queue full, dropped new event")
+                        _run_callbacks([on_committed])
+                        return False
+
+            self._queue.append((event, on_committed))
+            self._cond.notify_all()
+            return accepted
+
+    def reconfigure(
+        self,
+        queue_size: int,
+        overflow: str,
+        block_timeout: float,
+        retry_interval: float,
+        retry_max_interval: float,
+        batch_size: int,
+        coalesce_interval: float,
+    ) -> None:
+        """Apply new settings while the sender runs (see __init__ for their meaning).
+
+        Queued and spooled events are kept. A waiting worker re-reads the
+        settings right away, a retry already waiting for its backoff keeps
+        its delay. Coalescing can be turned off (held heartbeats are then
+        sent right away), but only turned on at startup.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        with self._cond:
+            self.queue_size = queue_size
+            self.overflow = overflow
+            self.block_timeout = block_timeout
+            self.retry_interval = retry_interval
+            self.retry_max_interval = retry_max_interval
+            self.batch_size = batch_size
+            if self.coalescer:
+                self.coalescer.interval = coalesce_interval
+                self.coalescer.max_events = batch_size
+            elif coalesce_interval > 0:
+                logger.warning("Heartbeat coalescing is only turned on at startup")
+            self._cond.notify_all()
+
+    def enqueue_deferred(self, build: Callable[[], list["Event"]]) -> None:
+        """Queue events that need aw-server to be built (e.g. checks against other buckets).
+
+        The builder is called from the worker thread once aw-server answers,
+        and called again later if it raises.
+
+        Args:
+            build: Returns the events to send
+        """
+        with self._cond:
+            self._deferred.append(build)
+            self._cond.notify_all()
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """Stop the worker, sending what is still queued until the deadline.
+
+        Args:
+            timeout: Longest time in seconds to spend flushing
+
+        Returns:
+            True if every queued event was sent
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                with self._cond:
+                    self._abort = True
+                    self._cond.notify_all()
+                self._thread.join(1.0)
+
+        # Keep what is still queued for the next run
+        if not (self._thread and self._thread.is_alive()):
+            self._spool_queued()
+
+        if self.coalescer and self.coalescer.heartbeats:
+            logger.info(
+                f"Coalesced {self.coalescer.merged} of {self.coalescer.heartbeats} heartbeat(s), "
+                f"{self.coalescer.saved_ratio:.0%} of the requests saved"
+            )
+
+        if self.pending:
+            logger.warning(f"Sender stopped with {self.pending} unsent event(s)")
+            return False
+        return True
+
+    def _run(self) -> None:
+        """Worker loop: spool queued events and deliver them, retrying failures."""
+        while True:
+            with self._cond:
+                # Held heartbeats don't wake us up until they are due
+                self._cond.wait_for(
+                    lambda: (
+                        self._queue
+                        or len(self.spool) > self.held
+                        or self._deferred
+                        or self._warm
+                        or self._closing
+                        or self._abort
+                    ),
+                    timeout=self.coalescer.due_in() if self.coalescer else None,
+                )
+                if self._abort:
+                    return
+                warm, self._warm = self._warm, False
+
+            if warm:
+                self._warm_connection()
+
+            # Write-ahead: events are on disk before we try to send them
+            self._spool_queued()
+
+            if not len(self.spool) and not self._deferred:
+                if self._closing:
+                    return
+                continue
+
+            built = self._build_deferred()
+            if not len(self.spool) or self._deliver_spool():
+                _run_callbacks(self._awaiting_delivery)
+                self._awaiting_delivery = []
+                if built:
+                    self._retries = 0
+                    continue
+
+            # A warm-up request (after a resume) retries right away
+            with self._cond:
+                if self._cond.wait_for(
+                    lambda: self._abort or self._warm, timeout=self._retry_delay()
+                ):
+                    if self._abort:
+                        return
+                    self._retries = 0
+                else:
+                    self._retries += 1
+            self.metrics.inc("send_retries_total")
+
+    def warm(self) -> None:
+        """Have the worker open a fresh connection to aw-server (e.g. after a resume).
+
+        Returns right away; the worker warms the connection up and retries a
+        failed delivery without waiting for its backoff.
+        """
+        with self._cond:
+            self._warm = True
+            self._cond.notify_all()
+
+    def _warm_connection(self) -> None:
+        """Open a fresh connection, if the client supports it."""
+        warm = getattr(self.client, "warm", None)
+        if not warm:
+            return
+        started = time.monotonic()
+        try:
+            warm()
+        except Exception as e:
+            logger.debug(f"Connection warm-up failed: {e}")
+            return
+        logger.debug(f"Connection warmed up in {(time.monotonic() - started) * 1000:.1f}ms")
+
+    def _retry_delay(self) -> float:
+        """Seconds to wait before the next retry: exponential backoff with jitter.
+
+        Doubles with every failure in a row up to retry_max_interval, and is
+        drawn from the upper half of that, so watchers that lost the server
+        at the same moment don't all come back at the same moment.
+        """
+        delay = min(self.retry_max_interval, self.retry_interval * 2 ** min(self._retries, 32))
+        return random.uniform(delay / 2, delay)
+
+    def _spool_queued(self) -> None:
+        """Move queued events into the spool and make them durable."""
+        with self._cond:
+            items = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+
+        callbacks = []
+        for event, on_committed in items:
+            self.spool.append(event)
+            if on_committed:
+                callbacks.append(on_committed)
+        self.spool.sync()
+
+        if self.spool.durable:
+            _run_callbacks(callbacks)
+        else:
+            self._awaiting_delivery.extend(callbacks)
+
+    def _build_deferred(self) -> bool:
+        """Build the deferred events once aw-server answers, and spool them.
+
+        Returns:
+            True if no deferred events are left
+        """
+        if not self._deferred:
+            return True
+
+        try:
+            self._ensure_bucket()
+            while self._deferred:
+                for event in self._deferred[0]():
+                    self.spool.append(event)
+                self.spool.sync()
+                self._deferred.popleft()
+        except Exception as e:
+            self.failures += 1
+            self.metrics.inc("send_failures_total")
+            logger.warning(f"Failed to build deferred events, will retry: {e}")
+            return False
+
+        return True
+
+    def _deliver_spool(self) -> bool:
+        """Send everything in the spool.
+
+        Returns:
+            True if the spool was emptied
+        """
+        try:
+            self._ensure_bucket()
+            if self.spool.inflight:
+                self._recover_inflight()
+
+            while batch := self._peek_unheld():
+                if len(batch) <= HEARTBEAT_BACKLOG:
+                    batch = batch[:1]
+                    if self.coalescer:
+                        self._send_held(self.coalescer.add(*batch[0]))
+                        continue
+                else:
+                    # A backlog goes out in order, after what is held back
+                    self._send_held(self.coalescer.flush() if self.coalescer else None)
+                first_seq, last_seq = batch[0][0], batch[-1][0]
+                events = [event for _seq, event in batch]
+
+                self.spool.begin(first_seq, last_seq)
+                self._send_backlog(events)
+                self.spool.ack(last_seq)
+                self.sent += len(events)
+
+            # Commit callbacks of a memory-only spool wait for the actual send
+            if self.coalescer and (
+                self._closing or self._awaiting_delivery or self.coalescer.due_in() == 0
+            ):
+                self._send_held(self.coalescer.flush())
+        except Exception as e:
+            if self.coalescer:
+                # Everything held back is still spooled and is read again on retry
+                self.coalescer.flush()
+            self.failures += 1
+            self.metrics.inc("send_failures_total")
+            logger.warning(f"Failed to send events, will retry: {e}")
+            return False
+
+        return True
+
+    def _peek_unheld(self) -> list[tuple[int, "Event"]]:
+        """Read the next spooled events, skipping those held back by the coalescer."""
+        held = self.held
+        if not held:
+            return self.spool.peek(self.batch_size)
+        held_through = self.coalescer.held_through  # type: ignore[union-attr]
+        return [
+            (seq, event)
+            for seq, event in self.spool.peek(held + self.batch_size)
+            if seq > held_through
+        ]
+
+    def _send_held(self, held: Optional[Held]) -> None:
+        """Send a merged heartbeat and acknowledge the events it covers.
+
+        Args:
+            held: Event handed back by the coalescer, or None
+        """
+        if held is None:
+            return
+        first_seq, last_seq, event = held
+        self.spool.begin(first_seq, last_seq)
+        self._send([event])
+        self.spool.ack(last_seq)
+        self.sent += last_seq - first_seq + 1
+
+    def _send_backlog(self, events: list["Event"]) -> None:
+        """Send spooled events so the bucket ends up as if each one was a heartbeat.
+
+        The heartbeats are merged here with aw-server's rules, since
+        insert_events stores events as they are. The first merged event is
+        still sent as a heartbeat: aw-server merges it into the latest event
+        of the bucket, which can't be known here.
+
+        Args:
+            events: Spooled heartbeats, oldest first
+        """
+        merged = merge_heartbeats(events, self.pulsetime) if len(events) > 1 else events
+        self._send(merged[:1])
+        if len(merged) > 1:
+            self._send(merged[1:])
+
+    def _ensure_bucket(self) -> None:
+        """Create the bucket once, before the first delivery."""
+        if self._bucket_ready:
+            return
+        self.client.create_bucket(self.bucket_id, event_type=self.event_type, queued=False)
+        self.requests += 1
+        self._bucket_ready = True
+        logger.info(f"Bucket created/verified: {self.bucket_id}")
+
+    def _send(self, events: list["Event"]) -> None:
+        """Deliver events in one request.
+
+        Args:
+            events: Events to send, oldest first
+        """
+        started = time.monotonic()
+        if len(events) == 1:
+            with self.metrics.time("send_duration_seconds", request="heartbeat"):
+                self.client.heartbeat(self.bucket_id, event=events[0], pulsetime=self.pulsetime)
+        else:
+            with self.metrics.time("send_duration_seconds", request="insert_events"):
+                self.client.insert_events(self.bucket_id, events)
+        self.requests += 1
+        logger.debug(f"Sent {len(events)} event(s) in {(time.monotonic() - started) * 1000:.1f}ms")
+
+    def _recover_inflight(self) -> None:
+        """Finish a batch that was being sent when we last stopped.
+
+        Events the server already has (also as part of a merged heartbeat) are
+        skipped, so a crash in the middle of a send never duplicates events.
+        """
+        first_seq, last_seq = self.spool.inflight  # type: ignore[misc]
+        batch = [
+            (seq, event)
+            for seq, event in self.spool.peek(last_seq - first_seq + 1)
+            if first_seq <= seq <= last_seq
+        ]
+        if not batch:
+            self.spool.ack(last_seq)
+            return
+
+        start = min(event.timestamp for _seq, event in batch)
+        end = max(event.timestamp + event.duration for _seq, event in batch)
+        existing = self.client.get_events(self.bucket_id, start=start, end=end)
+        self.requests += 1
+
+        missing = [event for _seq, event in batch if not _covered(event, existing)]
+        logger.info(
+            f"Recovering interrupted send: {len(batch) - len(missing)} of {len(batch)} "
+            "event(s) already on the server"
+        )
+        if missing:
+            self._send_backlog(missing)
+            self.sent += len(missing)
+        self.spool.ack(last_seq)
+
+
+def _run_callbacks(callbacks: Sequence[Optional[Callable[[], None]]]) -> None:
+    """Call commit callbacks, never letting one break the sender.
+
+    Args:
+        callbacks: Callbacks to run (None entries are skipped)
+    """
+    for callback in callbacks:
+        if callback is None:
+            continue
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Commit callback failed: {e}")
+
+
+def _covered(event: "Event", existing: list[Any]) -> bool:
+    """Check whether the server already holds an event.
+
+    Args:
+        event: Spooled event
+        existing: Events returned by the server for the same period
+
+    Returns:
+        True if an event with the same data spans the whole event
+    """
+    end = event.timestamp + event.duration
+    for other in existing:
+        if (
+            other.data == event.data
+            and other.timestamp <= event.timestamp
+            and other.timestamp + other.duration >= end
+        ):
+            return True
+    return False
@@ -0,0 +1,293 @@
+"""Write-ahead spool keeping events on disk until aw-server has accepted them."""
+
+import json
+import logging
+import os
+import struct
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from aw_core.models import Event
+
+logger = logging.getLogger(__name__)
+
+# seq, timestamp (epoch seconds), duration, lid, suspend, source, flags, crc32
+RECORD = struct.Struct("<QddBBBBI")
+CRC_OFFSET = RECORD.size - 4
+
+LID_STATES: list[Optional[str]] = [None, "open", "closed"]
+SUSPEND_STATES: list[Optional[str]] = [None, "suspended", "resumed"]
+EVENT_SOURCES = ["lid", "suspend", "boot", "shutdown"]
+
+FLAG_BOOT_GAP = 0x01
+FLAG_SYSTEM_AFK = 0x02
+
+
+def encode_record(seq: int, event: "Event") -> bytes:
+    """Pack an event into a fixed-size spool record.
+
+    Args:
+        seq: Sequence number of the record
+        event: Event with the aw-watcher-lid data fields
+
+    Returns:
+        The encoded record
+    """
+    data = event.data
+    flags = (FLAG_BOOT_GAP if data["boot_gap"] else 0) | (
+        FLAG_SYSTEM_AFK if data["status"] == "system-afk" else 0
+    )
+    body = RECORD.pack(
+        seq,
+        event.timestamp.timestamp(),
+        event.duration.total_seconds(),
+        LID_STATES.index(data["lid_state"]),
+        SUSPEND_STATES.index(data["suspend_state"]),
+        EVENT_SOURCES.index(data["event_source"]),
+        flags,
+        0,
+    )[:CRC_OFFSET]
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def decode_record(record: bytes) -> Optional[tuple[int, "Event"]]:
+    """Unpack a spool record.
+
+    Args:
+        record: RECORD.size bytes read from the spool
+
+    Returns:
+        (seq, event), or None if the record is torn or corrupt
+    """
+    from aw_core.models import Event
+
+    seq, timestamp, duration, lid, suspend, source, flags, crc = RECORD.unpack(record)
+    if crc != zlib.crc32(record[:CRC_OFFSET]):
+        return None
+
+    event = Event(
+        timestamp=datetime.fromtimestamp(timestamp, tz=timezone.utc),
+        duration=timedelta(seconds=duration),
+        data={
+            "status": "system-afk" if flags & FLAG_SYSTEM_AFK else "not-afk",
+            "lid_state": LID_STATES[lid],
+            "suspend_state": SUSPEND_STATES[suspend],
+            "boot_gap": bool(flags & FLAG_BOOT_GAP),
+            "event_source": EVENT_SOURCES[source],
+        },
+    )
+    return seq, event
+
+
+class MemorySpool:
+    """Spool kept in memory only (events are lost if the process dies)."""
+
+    durable = False
+
+    def __init__(self) -> None:
+        """Initialize an empty in-memory spool."""
+        self._records: deque[tuple[int, "Event"]] = deque()
+        self._next_seq = 1
+        self.inflight: Optional[tuple[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def append(self, event: "Event") -> int:
+        """Add an event, returning its sequence number."""
+        seq = self._next_seq
+        self._next_seq += 1
+        self._records.append((seq, event))
+        return seq
+
+    def sync(self) -> None:
+        """Nothing to make durable."""
+
+    def peek(self, limit: int) -> list[tuple[int, "Event"]]:
+        """Return up to limit unacknowledged records, oldest first."""
+        return [self._records[i] for i in range(min(limit, len(self._records)))]
+
+    def begin(self, first_seq: int, last_seq: int) -> None:
+        """Mark a range of records as being sent."""
+        self.inflight = (first_seq, last_seq)
+
+    def ack(self, last_seq: int) -> None:
+        """Drop all records up to and including last_seq."""
+        while self._records and self._records[0][0] <= last_seq:
+            self._records.popleft()
+        self.inflight = None
+
+
+class Spool:
+    """Append-only on-disk event spool with an acknowledgement marker.
+
+    Records have a fixed size and a CRC, so a write torn by a crash is detected
+    and cut off on the next start. The marker file holds the last sequence
+    number aw-server acknowledged and the range that was being sent, which lets
+    a replay after a crash skip events the server already has.
+    """
+
+    durable = True
+
+    def __init__(self, directory: Path) -> None:
+        """Open (or create) the spool.
+
+        Args:
+            directory: Directory for the spool and marker files
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.path = directory / "spool.bin"
+        self.marker_path = directory / "spool.ack"
+
+        self.acked = 0
+        self.inflight: Optional[tuple[int, int]] = None
+        self._load_marker()
+
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_CLOEXEC, 0o600)
+        self.first_seq, self.last_seq = self._scan()
+        self._dirty = False
+
+        if len(self):
+            logger.info(f"Spool holds {len(self)} unsent event(s)")
+
+    def __len__(self) -> int:
+        return max(0, self.last_seq - self.acked)
+
+    def _load_marker(self) -> None:
+        """Read the acknowledgement marker."""
+        try:
+            marker = json.loads(self.marker_path.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable spool marker: {e}")
+            return
+
+        self.acked = int(marker.get("acked", 0))
+        if marker.get("inflight"):
+            first, last = marker["inflight"]
+            self.inflight = (int(first), int(last))
+
+    def _write_marker(self, durable: bool) -> None:
+        """Atomically replace the acknowledgement marker.
+
+        Args:
+            durable: fsync the marker before it replaces the old one
+        """
+        tmp_path = self.marker_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"acked": self.acked, "inflight": self.inflight}, f)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.marker_path)
+
+    def _scan(self) -> tuple[int, int]:
+        """Validate the spool file and cut off a torn or corrupt tail.
+
+        Returns:
+            (first_seq, last_seq) of the records in the file
+        """
+        size = os.fstat(self.fd).st_size
+        base = max(self.acked, self.inflight[1] if self.inflight else 0)
+        first_seq = base + 1
+        last_seq = base
+        valid_size = 0
+
+        for offset in range(0, size - size % RECORD.size, RECORD.size):
+            decoded = decode_record(os.pread(self.fd, RECORD.size, offset))
+            if decoded is None or (offset and decoded[0] != last_seq + 1):
+                break
+            if offset == 0:
+                first_seq = decoded[0]
+            last_seq = decoded[0]
+            valid_size = offset + RECORD.size
+
+        if valid_size != size:
+            logger.warning(f"Discarding {size - valid_size} bytes of damaged spool data")
+            os.ftruncate(self.fd, valid_size)
+
+        if valid_size == 0:
+            # Only an acknowledged spool is ever emptied, so nothing is in flight
+            self.acked = base
+            self.inflight = None
+            return base + 1, base
+        return first_seq, last_seq
+
+    def append(self, event: "Event") -> int:
+        """Append an event (not durable until sync()).
+
+        Args:
+            event: The event to spool
+
+        Returns:
+            Sequence number of the new record
+        """
+        seq = self.last_seq + 1
+        os.write(self.fd, encode_record(seq, event))
+        self.last_seq = seq
+        self._dirty = True
+        return seq
+
+    def sync(self) -> None:
+        """Make all appended records durable (one fsync per batch of appends)."""
+        if self._dirty:
+            os.fsync(self.fd)
+            self._dirty = False
+
+    def peek(self, limit: int) -> list[tuple[int, "Event"]]:
+        """Read up to limit unacknowledged records, oldest first.
+
+        Args:
+            limit: Maximum number of records to return
+
+        Returns:
+            List of (seq, event)
+        """
+        first = max(self.acked + 1, self.first_seq)
+        count = min(limit, self.last_seq - first + 1)
+        if count <= 0:
+            return []
+
+        data = os.pread(self.fd, count * RECORD.size, (first - self.first_seq) * RECORD.size)
+        records = []
+        for offset in range(0, len(data), RECORD.size):
+            decoded = decode_record(data[offset : offset + RECORD.size])
+            if decoded is not None:
+                records.append(decoded)
+        return records
+
+    def begin(self, first_seq: int, last_seq: int) -> None:
+        """Durably mark a range of records as being sent.
+
+        Args:
+            first_seq: First record of the batch
+            last_seq: Last record of the batch
+        """
+        self.inflight = (first_seq, last_seq)
+        self._write_marker(durable=True)
+
+    def ack(self, last_seq: int) -> None:
+        """Mark records up to last_seq as accepted by aw-server.
+
+        Args:
+            last_seq: Last acknowledged record
+        """
+        self.acked = max(self.acked, last_seq)
+        self.inflight = None
+        # A lost ack only means the batch is checked against the server again
+        self._write_marker(durable=False)
+
+        if self.acked >= self.last_seq and self.last_seq >= self.first_seq:
+            os.ftruncate(self.fd, 0)
+            self.first_seq = self.acked + 1
+
+    def close(self) -> None:
+        """Flush and close the spool file."""
+        self.sync()
+        os.close(self.fd)
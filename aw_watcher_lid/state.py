@@ -0,0 +1,83 @@
+"""Small local state file that survives restarts and reboots."""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+BOOT_ID_PATH = Path("/proc/sys/kernel/random/boot_id")
+
+
+def current_boot_id() -> Optional[str]:
+    """Get the kernel's random ID for the running boot.
+
+    Returns:
+        The boot ID, or None if unavailable
+    """
+    try:
+        return BOOT_ID_PATH.read_text().strip()
+    except OSError:
+        return None
+
+
+class LocalState:
+    """JSON state file, atomically replaced on every update."""
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the state file.
+
+        Args:
+            path: Location of the state file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[dict[str, Any]] = None
+
+    def load(self) -> dict[str, Any]:
+        """Read the state (cached after the first read).
+
+        Returns:
+            The stored fields, empty if there is no usable state file
+        """
+        with self._lock:
+            if self._data is None:
+                try:
+                    self._data = json.loads(self.path.read_text())
+                except FileNotFoundError:
+                    self._data = {}
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable state file {self.path}: {e}")
+                    self._data = {}
+            return dict(self._data)
+
+    def update(self, durable: bool = True, **fields: Any) -> None:
+        """Change some fields and write the state.
+
+        The file is always replaced atomically; without durable a crash may
+        leave the previous version in place.
+
+        Args:
+            durable: fsync the new file before it replaces the old one
+            **fields: Fields to set (None removes a field)
+        """
+        self.load()
+        with self._lock:
+            assert self._data is not None
+            for key, value in fields.items():
+                if value is None:
+                    self._data.pop(key, None)
+                else:
+                    self._data[key] = value
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self._data, f)
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,60 @@
+"""Self-pipe for waking up a thread blocked in poll(), epoll() or select()."""
+
+import os
+import threading
+
+
+class WakeupPipe:
+    """A non-blocking pipe whose read end a loop waits on next to its own descriptors.
+
+    Other threads (and signal handlers) write to it with wake() to have the
+    loop look at its flags. The loop closes the pipe with close() once it is
+    done; a wake() after that does nothing, so a stop() racing with the loop
+    exiting never writes to a closed (or reused) descriptor.
+    """
+
+    def __init__(self) -> None:
+        """Open the pipe."""
+        self.fd, self._write_fd = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        # Reentrant: a signal handler may wake() while the same thread closes
+        self._lock = threading.RLock()
+
+    @property
+    def closed(self) -> bool:
+        """Whether close() was called."""
+        return self.fd < 0
+
+    def wake(self, data: bytes = b"\0") -> None:
+        """Wake up the loop (safe to call from a signal handler).
+
+        Args:
+            data: Bytes for the loop to read
+        """
+        with self._lock:
+            if self._write_fd < 0:
+                return
+            try:
+                os.write(self._write_fd, data)
+            except OSError:
+                # Full: the loop has a wake-up to read already
+                pass
+
+    def read(self) -> bytes:
+        """Read what was written so far (call once the read end is readable).
+
+        Returns:
+            The bytes passed to wake()
+        """
+        try:
+            return os.read(self.fd, 4096)
+        except BlockingIOError:
+            return b""
+
+    def close(self) -> None:
+        """Close both ends of the pipe."""
+        with self._lock:
+            read_fd, write_fd = self.fd, self._write_fd
+            self.fd = self._write_fd = -1
+            for fd in (read_fd, write_fd):
+                if fd >= 0:
+                    os.close(fd)
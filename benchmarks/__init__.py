@@ -0,0 +1 @@
+"""Benchmarks for aw-watcher-lid (run with python -m benchmarks.<name>)."""
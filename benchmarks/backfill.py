@@ -0,0 +1,142 @@
+"""Backfill a synthetic year of journal history.
+
+Generates the journal of one boot per day for --days days, each with
+lid close/open cycles, suspend/resume cycles and unrelated logind noise,
+and streams it through the backfiller into a server stand-in that only
+counts what it receives (so its own memory doesn't grow with the history).
+Reports entries/sec, events and requests, and how much the peak RSS grew.
+
+Usage:
+
+    python -m benchmarks.backfill
+    python -m benchmarks.backfill --days 1825 --cycles 50
+"""
+
+import argparse
+import random
+import resource
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from aw_core.models import Event
+
+from aw_watcher_lid.backfill import Backfiller, BatchInserter
+from aw_watcher_lid.boots import Boot
+from aw_watcher_lid.lid import LidWatcher
+
+START = datetime(2024, 1, 1, 7, 0, tzinfo=timezone.utc)
+
+MESSAGES = [
+    ("systemd-logind.service", "Lid closed."),
+    ("systemd-logind.service", "Lid opened."),
+    ("systemd-suspend.service", "Suspending system..."),
+    ("systemd-suspend.service", "System resumed."),
+]
+NOISE = [
+    "New session 3 of user tobias.",
+    "Session 3 logged out. Waiting for processes to exit.",
+    "Operation 'sleep' finished.",
+]
+
+
+class CountingServer:
+    """Accepts inserts and counts them, with an empty bucket."""
+
+    def __init__(self) -> None:
+        self.requests: Counter[str] = Counter()
+        self.received = 0
+
+    def get_events(
+        self, bucket_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> list[Event]:
+        self.requests["get_events"] += 1
+        return []
+
+    def insert_events(self, bucket_id: str, events: list[Event]) -> None:
+        self.requests["insert_events"] += 1
+        self.received += len(events)
+
+
+def synthetic_boots(days: int) -> list[Boot]:
+    """One boot per day, running 14 hours."""
+    return [
+        Boot(
+            f"{day:032x}",
+            START + timedelta(days=day),
+            START + timedelta(days=day, hours=14),
+        )
+        for day in range(days)
+    ]
+
+
+def synthetic_journal(boots: list[Boot], cycles: int, seed: int = 0) -> Iterator[dict]:
+    """Journal entries of the boots: cycles lid/suspend pairs per boot, plus noise."""
+    rng = random.Random(seed)
+    for boot in boots:
+        step = (boot.last - boot.first) / (cycles * 2 + 1)
+        for i in range(cycles * 2):
+            when = boot.first + step * (i + 1)
+            if rng.random() < 0.5:
+                yield _entry(boot, when, "systemd-logind.service", rng.choice(NOISE))
+            unit, message = MESSAGES[(i % 2) + (2 if rng.random() < 0.3 else 0)]
+            yield _entry(boot, when, unit, message)
+
+
+def _entry(boot: Boot, when: datetime, unit: str, message: str) -> dict:
+    return {
+        "__REALTIME_TIMESTAMP": str(int(when.timestamp() * 1_000_000)),
+        "_BOOT_ID": boot.boot_id,
+        "_SYSTEMD_UNIT": unit,
+        "MESSAGE": message,
+    }
+
+
+def run(days: int, cycles: int) -> dict[str, Any]:
+    """Backfill the synthetic history once and measure it."""
+    boots = synthetic_boots(days)
+    server = CountingServer()
+    inserter = BatchInserter(server, "aw-watcher-lid_bench")
+    backfiller = Backfiller(LidWatcher(testing=True), inserter)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    backfiller.run(boots, synthetic_journal(boots, cycles))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "boots": len(boots),
+        "entries": backfiller.entries,
+        "elapsed_s": elapsed,
+        "entries_per_s": backfiller.entries / elapsed,
+        "heartbeats": inserter.heartbeats,
+        "inserted": server.received,
+        "requests": dict(server.requests),
+        "rss_growth_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+    }
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365, help="Boots (one per day)")
+    parser.add_argument("--cycles", type=int, default=20, help="Lid/suspend cycles per boot")
+    args = parser.parse_args()
+
+    # The watcher logs every event at INFO
+    import logging
+
+    logging.disable(logging.INFO)
+
+    result = run(args.days, args.cycles)
+    print(f"== backfill: {args.days} days, {args.cycles} cycles/day ==")
+    for key, value in result.items():
+        print(f"  {key:<16}{value:.1f}" if isinstance(value, float) else f"  {key:<16}{value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
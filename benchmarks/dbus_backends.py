@@ -0,0 +1,119 @@
+"""Memory and startup time of the two D-Bus listener backends.
+
+Compares the dbus-python/GLib listener (`listener = "dbus"`) with the
+dbus-fast/asyncio one (`listener = "dbus-fast"`). Both talk to a fake logind
+on a private dbus-daemon (see benchmarks/fake_logind.py), so no system bus is
+needed. For each backend it reports how long importing the D-Bus libraries
+takes, how long the watcher needs until its listener waits for events, and
+the watcher's resident memory at that point. A backend whose libraries aren't
+installed is reported as unavailable.
+
+    python -m benchmarks.dbus_backends
+    python -m benchmarks.dbus_backends --runs 10
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from .fake_logind import FakeLogind, PrivateBus
+from .startup import isolated_env, start_once
+
+# Listener name and the imports its backend needs
+BACKENDS = {
+    "dbus": "import dbus, dbus.mainloop.glib; from gi.repository import GLib",
+    "dbus-fast": "import dbus_fast, dbus_fast.aio",
+}
+
+IMPORT_TIMER = """
+import time
+started = time.perf_counter()
+{imports}
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def import_time(imports: str) -> Optional[float]:
+    """Time the backend imports in a fresh interpreter.
+
+    Returns:
+        Milliseconds, or None if the libraries aren't installed
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_TIMER.format(imports=imports)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        return None
+    return float(result.stdout)
+
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of a process in MB."""
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure(backend: str, bus_address: str, runs: int) -> Optional[dict[str, float]]:
+    """Start the watcher with a backend several times.
+
+    Returns:
+        Median import time, time until ready and RSS, or None if unavailable
+    """
+    imports = [import_time(BACKENDS[backend]) for _ in range(runs)]
+    if None in imports:
+        return None
+
+    ready, rss = [], []
+    with tempfile.TemporaryDirectory(prefix="aw-watcher-lid-dbus-") as workdir:
+        env = isolated_env(Path(workdir), f'listener = "{backend}"\n')
+        env["DBUS_SYSTEM_BUS_ADDRESS"] = bus_address
+        # One unmeasured run to fill the page cache and write .pyc files
+        start_once(env)
+        for _ in range(runs):
+            phases = start_once(env, on_ready=lambda pid: rss.append(rss_mb(pid)))
+            ready.append(phases["ready after"] - phases["interpreter"])
+
+    return {
+        "import_ms": statistics.median(imports),  # type: ignore[type-var]
+        "ready_ms": statistics.median(ready),
+        "rss_mb": statistics.median(rss),
+    }
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        private_bus = PrivateBus()
+    except FileNotFoundError as e:
+        print(f"Skipped: {e}")
+        return 0
+
+    with private_bus as bus, FakeLogind(bus.address):
+        results = {backend: measure(backend, bus.address, args.runs) for backend in BACKENDS}
+
+    print(f"{'backend':>10} {'imports':>10} {'to ready':>10} {'RSS':>10}")
+    for backend, result in results.items():
+        if result is None:
+            print(f"{backend:>10} {'unavailable (libraries not installed)':>32}")
+            continue
+        print(
+            f"{backend:>10} {result['import_ms']:8.1f}ms {result['ready_ms']:8.1f}ms "
+            f"{result['rss_mb']:8.1f}MB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
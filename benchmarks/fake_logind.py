@@ -0,0 +1,172 @@
+"""A stand-in for systemd-logind on a private D-Bus daemon.
+
+Starts `dbus-daemon --session` and serves the parts of
+org.freedesktop.login1.Manager the watcher uses (LidClosed, Inhibit,
+PrepareForSleep, PrepareForShutdown) with dbus-fast. Point the watcher at it
+with DBUS_SYSTEM_BUS_ADDRESS:
+
+    python -m benchmarks.fake_logind
+"""
+
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from typing import Any, Optional
+
+from dbus_fast import BusType, PropertyAccess
+from dbus_fast.aio import MessageBus
+from dbus_fast.service import ServiceInterface, dbus_property, method, signal
+
+LOGIND_BUS_NAME = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+
+
+class PrivateBus:
+    """A dbus-daemon of our own, stopped when the context exits."""
+
+    def __init__(self) -> None:
+        """Find the dbus-daemon binary.
+
+        Raises:
+            FileNotFoundError: If dbus-daemon isn't installed
+        """
+        self.binary = shutil.which("dbus-daemon") or os.path.join(
+            os.path.dirname(sys.executable), "dbus-daemon"
+        )
+        if not os.access(self.binary, os.X_OK):
+            raise FileNotFoundError("dbus-daemon not found")
+        self.address = ""
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "PrivateBus":
+        """Start the daemon and read its address."""
+        self._process = subprocess.Popen(
+            [self.binary, "--session", "--print-address", "--nofork"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        self.address = self._process.stdout.readline().strip()  # type: ignore[union-attr]
+        if not self.address:
+            self._process.kill()
+            raise RuntimeError("dbus-daemon did not start")
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Stop the daemon."""
+        if self._process:
+            self._process.terminate()
+            self._process.wait()
+
+
+class FakeManager(ServiceInterface):
+    """org.freedesktop.login1.Manager with just what the watcher talks to."""
+
+    def __init__(self) -> None:
+        """Start with the lid open and no inhibitors taken."""
+        super().__init__("org.freedesktop.login1.Manager")
+        self.lid_closed = False
+        # Read ends of the inhibitor pipes we handed out, by operation
+        self.inhibitors: dict[str, list[int]] = {}
+
+    @dbus_property(access=PropertyAccess.READ)
+    def LidClosed(self) -> "b":  # type: ignore[name-defined] # noqa: F821, N802
+        """Whether the lid is closed."""
+        return self.lid_closed
+
+    @method()
+    def Inhibit(self, what: "s", who: "s", why: "s", mode: "s") -> "h":  # type: ignore[name-defined] # noqa: F821, N802
+        """Hand out an inhibitor: the write end of a pipe, whose read end we keep."""
+        read_fd, write_fd = os.pipe()
+        self.inhibitors.setdefault(what, []).append(read_fd)
+        return write_fd
+
+    @signal()
+    def PrepareForSleep(self, start: bool) -> "b":  # type: ignore[name-defined] # noqa: F821, N802
+        """Announce suspend (True) or resume (False)."""
+        return start
+
+    @signal()
+    def PrepareForShutdown(self, start: bool) -> "b":  # type: ignore[name-defined] # noqa: F821, N802
+        """Announce shutdown (True) or its cancellation (False)."""
+        return start
+
+    def set_lid_closed(self, closed: bool) -> None:
+        """Change the lid state and announce it with PropertiesChanged."""
+        self.lid_closed = closed
+        self.emit_properties_changed({"LidClosed": closed})
+
+
+class FakeLogind:
+    """Serves FakeManager on a bus from an event loop in a background thread."""
+
+    def __init__(self, address: str) -> None:
+        """Initialize the fake logind.
+
+        Args:
+            address: D-Bus address of the bus to serve on
+        """
+        self.address = address
+        self.manager = FakeManager()
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._bus: Optional[MessageBus] = None
+
+    def __enter__(self) -> "FakeLogind":
+        """Connect, export the manager and own the logind bus name."""
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._serve(), self._loop).result(timeout=10)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Disconnect and stop the event loop."""
+        if self._bus:
+            self._loop.call_soon_threadsafe(self._bus.disconnect)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    async def _serve(self) -> None:
+        self._bus = await MessageBus(
+            bus_address=self.address, bus_type=BusType.SYSTEM, negotiate_unix_fd=True
+        ).connect()
+        self._bus.export(LOGIND_PATH, self.manager)
+        await self._bus.request_name(LOGIND_BUS_NAME)
+
+    def call(self, function: Any, *args: Any) -> None:
+        """Run a FakeManager method on the bus thread and wait for it."""
+
+        async def run() -> None:
+            function(*args)
+
+        asyncio.run_coroutine_threadsafe(run(), self._loop).result(timeout=10)
+
+    def prepare_for_sleep(self, start: bool) -> None:
+        """Emit PrepareForSleep."""
+        self.call(self.manager.PrepareForSleep, start)
+
+    def prepare_for_shutdown(self, start: bool) -> None:
+        """Emit PrepareForShutdown."""
+        self.call(self.manager.PrepareForShutdown, start)
+
+    def set_lid_closed(self, closed: bool) -> None:
+        """Change LidClosed and emit PropertiesChanged."""
+        self.call(self.manager.set_lid_closed, closed)
+
+
+def main() -> int:
+    """Serve a fake logind until interrupted."""
+    with PrivateBus() as bus, FakeLogind(bus.address):
+        print(f"DBUS_SYSTEM_BUS_ADDRESS={bus.address}", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""In-process aw-server stand-in, used in place of ActivityWatchClient."""
+
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from aw_core.models import Event
+
+
+def heartbeat_merge(last: Optional[Event], event: Event, pulsetime: float) -> bool:
+    """Merge a heartbeat into the previous event the way aw-server does.
+
+    Args:
+        last: Latest event in the bucket
+        event: The heartbeat
+        pulsetime: Merge window in seconds after the end of the latest event
+
+    Returns:
+        True if the heartbeat was merged into last (last is extended in place)
+    """
+    if last is None or last.data != event.data:
+        return False
+
+    last_end = last.timestamp + last.duration
+    if not last.timestamp <= event.timestamp <= last_end + timedelta(seconds=pulsetime):
+        return False
+
+    last.duration = max(last.duration, event.timestamp + event.duration - last.timestamp)
+    return True
+
+
+class FakeServer:
+    """Keeps buckets in memory and counts requests like an aw-server would see them.
+
+    Implements the ActivityWatchClient methods aw-watcher-lid uses. Every call
+    counts as one request; on_receive is called with the events of each
+    heartbeat/insert, e.g. to measure delivery latency.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """Initialize an empty server.
+
+        Args:
+            latency: Seconds every request takes
+        """
+        self.latency = latency
+        self.buckets: dict[str, dict[str, Any]] = {}
+        self.events: dict[str, list[Event]] = {}
+        self.requests: Counter[str] = Counter()
+        self.received = 0
+        self.on_receive: Optional[Callable[[list[Event]], None]] = None
+        self._lock = threading.Lock()
+
+    def _request(self, endpoint: str) -> None:
+        self.requests[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _receive(self, events: list[Event]) -> None:
+        self.received += len(events)
+        if self.on_receive:
+            self.on_receive(events)
+
+    def create_bucket(self, bucket_id: str, event_type: str, queued: bool = False) -> None:
+        """Create a bucket (no-op if it exists)."""
+        self._request("create_bucket")
+        with self._lock:
+            self.buckets.setdefault(bucket_id, {"id": bucket_id, "type": event_type})
+            self.events.setdefault(bucket_id, [])
+
+    def get_buckets(self) -> dict[str, dict[str, Any]]:
+        """Return all buckets by ID."""
+        self._request("get_buckets")
+        with self._lock:
+            return dict(self.buckets)
+
+    def heartbeat(
+        self,
+        bucket_id: str,
+        event: Event,
+        pulsetime: float,
+        queued: bool = False,
+        commit_interval: Optional[float] = None,
+    ) -> None:
+        """Merge an event into the latest one, or add it."""
+        self._request("heartbeat")
+        with self._lock:
+            events = self.events[bucket_id]
+            if not heartbeat_merge(events[-1] if events else None, event, pulsetime):
+                events.append(Event(**event.to_json_dict()))
+        self._receive([event])
+
+    def insert_events(self, bucket_id: str, events: list[Event]) -> None:
+        """Add events without merging."""
+        self._request("insert_events")
+        with self._lock:
+            self.events[bucket_id].extend(Event(**event.to_json_dict()) for event in events)
+            self.events[bucket_id].sort(key=lambda event: event.timestamp)
+        self._receive(events)
+
+    def get_events(
+        self,
+        bucket_id: str,
+        limit: int = -1,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> list[Event]:
+        """Return events overlapping the period, newest first."""
+        self._request("get_events")
+        with self._lock:
+            events = [
+                event
+                for event in reversed(self.events.get(bucket_id, []))
+                if (start is None or event.timestamp + event.duration >= start)
+                and (end is None or event.timestamp <= end)
+            ]
+        return events if limit < 0 else events[:limit]
+
+    def disconnect(self) -> None:
+        """Nothing to disconnect."""
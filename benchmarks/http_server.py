@@ -0,0 +1,440 @@
+"""Local HTTP aw-server stand-in for offline integration tests and benchmarks.
+
+Serves the REST endpoints aw-watcher-lid uses (info, buckets, heartbeat,
+events, query) on localhost, so a real ActivityWatchClient can talk to it.
+Storage and heartbeat merging come from FakeServer. It speaks HTTP/1.1
+with keep-alive, like aw-server, and counts the connections it accepted.
+Latency, errors and downtime can be injected, and every request is recorded:
+
+    with HttpAwServer(latency=0.002) as server:
+        client = server.client()
+        ...
+        server.down()  # connections are refused until up()
+        server.fail_next(3, status=503)
+        print(server.requests_by_endpoint())
+"""
+
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+
+from .fake_server import FakeServer
+
+API_PREFIX = "/api/0/"
+
+
+class QueryError(Exception):
+    """An aw query the stand-in can't evaluate."""
+
+
+@dataclass
+class RecordedRequest:
+    """One request as the server saw it."""
+
+    method: str
+    path: str
+    endpoint: str
+    status: int
+    size: int
+    duration: float
+
+
+# Tokens of the query2 subset: strings, numbers, names and punctuation
+_QUERY_TOKEN = re.compile(
+    r"""\s*(?:("(?:[^"\\]|\\.)*"|'[^']*')|(-?\d+(?:\.\d+)?)|([A-Za-z_]\w*)|([(),=;]))"""
+)
+
+
+def _tokenize(query: str) -> list[tuple[str, Any]]:
+    tokens: list[tuple[str, Any]] = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _QUERY_TOKEN.match(query, pos)
+        if not match:
+            raise QueryError(f"Unexpected character in query at {pos}: {query[pos : pos + 20]!r}")
+        string, number, name, punct = match.groups()
+        if string is not None:
+            tokens.append(("value", json.loads(string) if string[0] == '"' else string[1:-1]))
+        elif number is not None:
+            tokens.append(("value", float(number) if "." in number else int(number)))
+        elif name is not None:
+            tokens.append(("name", name))
+        else:
+            tokens.append((punct, punct))
+        pos = match.end()
+    return tokens
+
+
+class QueryEvaluator:
+    """Evaluates the subset of aw-server's query2 language used by the watcher.
+
+    Supports assignments, RETURN, query_bucket, concat, sort_by_timestamp
+    and limit_events over a single time period.
+    """
+
+    def __init__(self, store: FakeServer, start: datetime, end: datetime) -> None:
+        """Set up evaluation of one time period.
+
+        Args:
+            store: Buckets and events
+            start: Start of the time period
+            end: End of the time period
+        """
+        self.store = store
+        self.start = start
+        self.end = end
+        self.variables: dict[str, Any] = {}
+        self.functions = {
+            "query_bucket": self._query_bucket,
+            "concat": self._concat,
+            "sort_by_timestamp": self._sort_by_timestamp,
+            "limit_events": self._limit_events,
+        }
+
+    def run(self, query: str) -> Any:
+        """Evaluate a query.
+
+        Returns:
+            The value assigned to RETURN
+        """
+        tokens = _tokenize(query)
+        pos = 0
+        while pos < len(tokens):
+            if tokens[pos] == (";", ";"):
+                pos += 1
+                continue
+            kind, name = tokens[pos]
+            if kind != "name" or pos + 1 >= len(tokens) or tokens[pos + 1][0] != "=":
+                raise QueryError("Expected an assignment")
+            value, pos = self._expression(tokens, pos + 2)
+            self.variables[name] = value
+
+        if "RETURN" not in self.variables:
+            raise QueryError("Query has no RETURN")
+        return self.variables["RETURN"]
+
+    def _expression(self, tokens: list[tuple[str, Any]], pos: int) -> tuple[Any, int]:
+        if pos >= len(tokens):
+            raise QueryError("Unexpected end of query")
+        kind, value = tokens[pos]
+        if kind == "value":
+            return value, pos + 1
+        if kind != "name":
+            raise QueryError(f"Unexpected {value!r} in query")
+
+        if pos + 1 < len(tokens) and tokens[pos + 1][0] == "(":
+            if value not in self.functions:
+                raise QueryError(f"Unknown query function: {value}")
+            args = []
+            pos += 2
+            while tokens[pos][0] != ")":
+                arg, pos = self._expression(tokens, pos)
+                args.append(arg)
+                if tokens[pos][0] == ",":
+                    pos += 1
+            return self.functions[value](*args), pos + 1
+
+        if value not in self.variables:
+            raise QueryError(f"Undefined variable: {value}")
+        return self.variables[value], pos + 1
+
+    def _query_bucket(self, bucket_id: str) -> list[Event]:
+        if bucket_id not in self.store.events:
+            raise QueryError(f"There's no bucket named '{bucket_id}'")
+        with self.store._lock:
+            return [
+                event
+                for event in reversed(self.store.events[bucket_id])
+                if event.timestamp + event.duration >= self.start and event.timestamp <= self.end
+            ]
+
+    @staticmethod
+    def _concat(first: list[Event], second: list[Event]) -> list[Event]:
+        return first + second
+
+    @staticmethod
+    def _sort_by_timestamp(events: list[Event]) -> list[Event]:
+        return sorted(events, key=lambda event: event.timestamp)
+
+    @staticmethod
+    def _limit_events(events: list[Event], count: int) -> list[Event]:
+        return events[:count]
+
+
+class HttpAwServer:
+    """aw-server REST API on localhost, backed by an in-memory FakeServer."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the server (call start() or use it as a context manager).
+
+        Args:
+            host: Address to listen on
+            port: Port to listen on (0: pick a free one)
+            latency: Seconds every request takes
+            error_rate: Fraction of requests answered with HTTP 500
+            seed: Seed for picking the failing requests
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.store = FakeServer()
+        self.requests: list[RecordedRequest] = []
+        self.connections = 0
+        self._open: set[socket.socket] = set()
+        self._random = random.Random(seed)
+        self._fail_next: list[int] = []
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> None:
+        """Start answering requests (again, after down())."""
+        server = self
+
+        class Handler(_RequestHandler):
+            aw_server = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="aw-server-stand-in", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop answering; open connections are cut and new ones refused."""
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        with self._lock:
+            for sock in self._open:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    # Downtime is a stopped server, like an aw-server that isn't running
+    down = stop
+    up = start
+
+    def __enter__(self) -> "HttpAwServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 500) -> None:
+        """Answer the next requests with an error.
+
+        Args:
+            count: Number of requests to fail
+            status: HTTP status to answer with
+        """
+        with self._lock:
+            self._fail_next.extend([status] * count)
+
+    def client(self, name: str = "aw-watcher-lid", session: bool = False) -> ActivityWatchClient:
+        """Create an ActivityWatchClient talking to this server.
+
+        Args:
+            name: Client name
+            session: Use the watcher's keep-alive SessionClient instead of aw-client's own
+        """
+        if session:
+            from aw_watcher_lid.client import SessionClient
+
+            return SessionClient(name, testing=True, host=self.host, port=self.port)
+        return ActivityWatchClient(name, testing=True, host=self.host, port=self.port)
+
+    def requests_by_endpoint(self) -> Counter[str]:
+        """Count the recorded requests per endpoint."""
+        with self._lock:
+            return Counter(request.endpoint for request in self.requests)
+
+    def _injected_error(self) -> Optional[int]:
+        with self._lock:
+            if self._fail_next:
+                return self._fail_next.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 500
+        return None
+
+    def _record(self, request: RecordedRequest) -> None:
+        with self._lock:
+            self.requests.append(request)
+
+    def handle(
+        self, method: str, path: str, params: dict[str, str], body: Any
+    ) -> tuple[str, int, Any]:
+        """Answer one API request.
+
+        Args:
+            method: HTTP method
+            path: Path below /api/0/
+            params: Query string parameters
+            body: Decoded JSON body (None for GET)
+
+        Returns:
+            (endpoint name, HTTP status, JSON response)
+        """
+        store = self.store
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+
+        if parts == ["info"] and method == "GET":
+            return "info", 200, {"hostname": "stand-in", "version": "v0.0.0", "testing": True}
+
+        if parts == ["query"] and method == "POST":
+            try:
+                results = []
+                for period in body["timeperiods"]:
+                    start, end = (datetime.fromisoformat(t) for t in period.split("/"))
+                    result = QueryEvaluator(store, start, end).run("\n".join(body["query"]))
+                    if isinstance(result, list):
+                        result = [
+                            item.to_json_dict() if isinstance(item, Event) else item
+                            for item in result
+                        ]
+                    results.append(result)
+            except (QueryError, KeyError, ValueError) as e:
+                return "query", 400, {"type": type(e).__name__, "message": str(e)}
+            return "query", 200, results
+
+        if parts[0] != "buckets":
+            return "unknown", 404, {"message": f"No such endpoint: {path}"}
+
+        if len(parts) == 1 and method == "GET":
+            return "get_buckets", 200, store.get_buckets()
+
+        bucket_id = parts[1]
+        if len(parts) == 2 and method == "POST":
+            if bucket_id in store.buckets:
+                store._request("create_bucket")
+                return "create_bucket", 304, None
+            store.create_bucket(bucket_id, body.get("type", ""))
+            return "create_bucket", 200, None
+
+        if bucket_id not in store.buckets:
+            return "unknown", 404, {"message": f"There's no bucket named {bucket_id}"}
+
+        if parts[2:] == ["heartbeat"] and method == "POST":
+            store.heartbeat(bucket_id, Event(**body), pulsetime=float(params["pulsetime"]))
+            return "heartbeat", 200, None
+
+        if parts[2:] == ["events"] and method == "POST":
+            store.insert_events(bucket_id, [Event(**event) for event in body])
+            return "insert_events", 200, None
+
+        if parts[2:] == ["events"] and method == "GET":
+            events = store.get_events(
+                bucket_id,
+                limit=int(params.get("limit", -1)),
+                start=datetime.fromisoformat(params["start"]) if "start" in params else None,
+                end=datetime.fromisoformat(params["end"]) if "end" in params else None,
+            )
+            return "get_events", 200, [event.to_json_dict() for event in events]
+
+        return "unknown", 404, {"message": f"No such endpoint: {method} {path}"}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    aw_server: HttpAwServer
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.aw_server._lock:
+            self.aw_server.connections += 1
+            self.aw_server._open.add(self.connection)
+
+    def finish(self) -> None:
+        with self.aw_server._lock:
+            self.aw_server._open.discard(self.connection)
+        super().finish()
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        server = self.aw_server
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        endpoint = "unknown"
+        if not url.path.startswith(API_PREFIX):
+            status, response = 404, {"message": "Not found"}
+        elif (injected := server._injected_error()) is not None:
+            status, response = injected, {"message": "Injected error"}
+            endpoint = "injected_error"
+        else:
+            try:
+                body = json.loads(raw) if raw else None
+                endpoint, status, response = server.handle(
+                    self.command, url.path[len(API_PREFIX) :], params, body
+                )
+            except Exception as e:
+                status, response = 500, {"message": f"{type(e).__name__}: {e}"}
+
+        # Recorded before answering, so the client never sees an unrecorded request
+        server._record(
+            RecordedRequest(
+                method=self.command,
+                path=url.path,
+                endpoint=endpoint,
+                status=status,
+                size=len(raw),
+                duration=time.perf_counter() - started,
+            )
+        )
+
+        payload = b"" if response is None else json.dumps(response).encode()
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
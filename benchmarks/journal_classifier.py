@@ -0,0 +1,237 @@
+"""Throughput and accuracy of the journal entry classifier.
+
+Runs the classifier over a labelled journal sample and reports entries/sec,
+false positives and false negatives (the old substring scan is measured on
+the same sample for comparison). Exits with status 1 on any false positive.
+
+A real journal dump can be measured too (without accuracy figures):
+
+    journalctl -o json --since -7d > journal.json
+    python -m benchmarks.journal_classifier --journal journal.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from typing import Any, Optional
+
+from aw_watcher_lid.journal_classifier import (
+    LID_CLOSED,
+    LID_OPEN,
+    RESUMED,
+    SUSPENDED,
+    JournalClassifier,
+)
+
+SLEEP_START_ID = "6bbd95ee977941e497c48be27c254128"
+SLEEP_STOP_ID = "8811e6df2a8e40f58a94cea26f8ebf14"
+LID_OPENED_ID = "b72ea4a2881545a0b50e200e55b9b06f"
+LID_CLOSED_ID = "b72ea4a2881545a0b50e200e55b9b070"
+
+# (SYSLOG_IDENTIFIER, _SYSTEMD_UNIT, MESSAGE_ID, MESSAGE, expected event)
+EVENTS: list[tuple[str, str, Optional[str], str, Optional[str]]] = [
+    ("systemd-logind", "systemd-logind.service", LID_CLOSED_ID, "Lid closed.", LID_CLOSED),
+    ("systemd-logind", "systemd-logind.service", LID_OPENED_ID, "Lid opened.", LID_OPEN),
+    ("systemd-logind", "systemd-logind.service", None, "Lid closed.", LID_CLOSED),
+    ("systemd-logind", "systemd-logind.service", None, "Lid opened.", LID_OPEN),
+    (
+        "systemd-sleep",
+        "systemd-suspend.service",
+        SLEEP_START_ID,
+        "Performing sleep operation 'suspend'...",
+        SUSPENDED,
+    ),
+    (
+        "systemd-sleep",
+        "systemd-suspend.service",
+        SLEEP_STOP_ID,
+        "System returned from sleep operation 'suspend'.",
+        RESUMED,
+    ),
+    (
+        "systemd-sleep",
+        "systemd-suspend.service",
+        None,
+        "Entering sleep state 'suspend'...",
+        SUSPENDED,
+    ),
+    (
+        "systemd-sleep",
+        "systemd-suspend.service",
+        None,
+        "System returned from sleep state.",
+        RESUMED,
+    ),
+    ("systemd-sleep", "systemd-suspend.service", None, "Suspending system...", SUSPENDED),
+    ("systemd-sleep", "systemd-suspend.service", None, "System resumed.", RESUMED),
+]
+
+NOISE: list[tuple[str, str, str]] = [
+    ("systemd-logind", "systemd-logind.service", "New session 3 of user tobias."),
+    (
+        "systemd-logind",
+        "systemd-logind.service",
+        "Session 3 logged out. Waiting for processes to exit.",
+    ),
+    ("systemd-logind", "systemd-logind.service", "The system will suspend now!"),
+    ("systemd-logind", "systemd-logind.service", "Suspend key pressed."),
+    ("systemd-logind", "systemd-logind.service", "Operation 'sleep' finished."),
+    ("systemd-logind", "systemd-logind.service", "Lid closed while docked, ignoring."),
+    (
+        "systemd-logind",
+        "systemd-logind.service",
+        "Delay lock is active (UID 1000/tobias, PID 1234/aw-watcher-lid) but inhibitor "
+        "timeout is reached.",
+    ),
+    (
+        "systemd-sleep",
+        "systemd-suspend.service",
+        "Failed to put system to sleep. System resumed again: Device or resource busy",
+    ),
+    ("systemd", "init.scope", "Starting System Suspend..."),
+    ("systemd", "init.scope", "Finished System Suspend."),
+    ("systemd", "init.scope", "Reached target Sleep."),
+    ("kernel", "", "PM: suspend entry (deep)"),
+    ("kernel", "", "PM: suspend exit"),
+    ("kernel", "", "ACPI: PM: Waking up from system sleep state S3"),
+    ("kernel", "", "Freezing user space processes"),
+    (
+        "NetworkManager",
+        "NetworkManager.service",
+        "<info>  manager: sleep: sleep requested (sleeping: no  enabled: yes)",
+    ),
+    (
+        "NetworkManager",
+        "NetworkManager.service",
+        "<info>  manager: NetworkManager state is now ASLEEP",
+    ),
+    ("gnome-shell", "user@1000.service", "Lid closed, blanking screen"),
+    ("firefox", "user@1000.service", "Download resumed: archive.tar.gz"),
+    ("sshd", "sshd.service", "Accepted publickey for tobias from 10.0.0.2 port 51234 ssh2"),
+    ("cron", "cron.service", "(root) CMD (run-parts /etc/cron.hourly)"),
+]
+
+
+def labelled_sample(size: int, event_ratio: float, seed: int) -> list[tuple[dict, Optional[str]]]:
+    """Generate journal entries with the event each one should be classified as.
+
+    Args:
+        size: Number of entries
+        event_ratio: Fraction of entries that are lid/suspend events
+        seed: Random seed
+
+    Returns:
+        List of (entry, expected event or None)
+    """
+    rng = random.Random(seed)
+    sample = []
+    for i in range(size):
+        if rng.random() < event_ratio:
+            identifier, unit, message_id, message, expected = rng.choice(EVENTS)
+        else:
+            identifier, unit, message = rng.choice(NOISE)
+            message_id, expected = None, None
+
+        entry = {
+            "__CURSOR": f"s=0;i={i:x}",
+            "__REALTIME_TIMESTAMP": str(1_736_949_600_000_000 + i * 1_000_000),
+            "SYSLOG_IDENTIFIER": identifier,
+            "MESSAGE": message,
+        }
+        if unit:
+            entry["_SYSTEMD_UNIT"] = unit
+        if message_id:
+            entry["MESSAGE_ID"] = message_id
+        sample.append((entry, expected))
+    return sample
+
+
+def substring_scan(entry: dict) -> Optional[str]:
+    """The classification done before the classifier existed (first match wins)."""
+    message = entry.get("MESSAGE", "")
+    if "Lid" in message:
+        if "closed" in message.lower():
+            return LID_CLOSED
+        if "opened" in message.lower():
+            return LID_OPEN
+    if "Suspending" in message or "suspend" in message.lower():
+        return SUSPENDED
+    if "Resumed" in message or "resume" in message.lower():
+        return RESUMED
+    return None
+
+
+def measure(
+    classify: Callable[[dict], Optional[str]], entries: list[dict], rounds: int
+) -> tuple[list[Optional[str]], float]:
+    """Classify all entries, keeping the best of several rounds.
+
+    Returns:
+        (results, entries per second)
+    """
+    best = float("inf")
+    results: list[Optional[str]] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        results = [classify(entry) for entry in entries]
+        best = min(best, time.perf_counter() - started)
+    return results, len(entries) / best
+
+
+def read_journal(path: str) -> Iterator[dict[str, Any]]:
+    """Read a `journalctl -o json` dump."""
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000, help="Size of the generated sample")
+    parser.add_argument("--event-ratio", type=float, default=0.05, help="Fraction of real events")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--journal", help="Measure a journalctl -o json dump instead")
+    args = parser.parse_args()
+
+    classifier = JournalClassifier()
+
+    if args.journal:
+        entries = list(read_journal(args.journal))
+        results, rate = measure(classifier.classify, entries, args.rounds)
+        counts = Counter(result for result in results if result)
+        print(f"{len(entries)} entries, {rate:,.0f} entries/sec")
+        for action, count in sorted(counts.items()):
+            print(f"  {action}: {count}")
+        return 0
+
+    sample = labelled_sample(args.entries, args.event_ratio, args.seed)
+    entries = [entry for entry, _expected in sample]
+    expected = [label for _entry, label in sample]
+
+    false_positives = 0
+    for name, classify in (("classifier", classifier.classify), ("substring scan", substring_scan)):
+        results, rate = measure(classify, entries, args.rounds)
+        wrong = [(got, want) for got, want in zip(results, expected) if got != want]
+        fp = sum(1 for got, _want in wrong if got is not None)
+        fn = sum(1 for got, _want in wrong if got is None)
+        print(
+            f"{name:>15}: {rate:>12,.0f} entries/sec, "
+            f"{fp} false positive(s), {fn} false negative(s)"
+        )
+        if classify == classifier.classify:
+            false_positives = fp
+
+    return 1 if false_positives else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""Replay lid/suspend/journal traces through LidWatcher against a fake aw-server.
+
+Each input goes through the parsing path of the listener that would see it
+(evdev input events, D-Bus signal handlers, journal JSON lines), then through
+the real sender and spool into an in-process aw-server stand-in. Reports
+events/sec, handler-to-send latency, requests issued and peak RSS.
+
+Trace format: JSON lines, one input per line, "t" in seconds from the start:
+
+    {"t": 0.0, "source": "evdev", "lid": "closed"}
+    {"t": 0.5, "source": "dbus", "signal": "PrepareForSleep", "args": [true]}
+    {"t": 0.5, "source": "dbus", "signal": "PropertiesChanged",
+     "args": ["org.freedesktop.login1.Manager", {"LidClosed": true}, []]}
+    {"t": 9.0, "source": "journal", "entry": {"MESSAGE": "Lid closed.", ...}}
+
+Usage:
+
+    python -m benchmarks.replay                  # all scenarios
+    python -m benchmarks.replay suspend-cycles --speed 1000
+    python -m benchmarks.replay --trace my-trace.jsonl
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+from unittest.mock import MagicMock
+
+from aw_core.models import Event
+
+from aw_watcher_lid.evdev_listener import EV_SW, EV_SYN, INPUT_EVENT, SW_LID, EvdevListener
+from aw_watcher_lid.journal_listener import JournalListener
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.sender import EventSender
+from aw_watcher_lid.spool import Spool
+from aw_watcher_lid.state import LocalState
+
+from .fake_server import FakeServer
+from .journal_classifier import labelled_sample
+
+# Start of every trace on the wall clock
+TRACE_EPOCH = datetime(2025, 1, 15, 8, 0, tzinfo=timezone.utc).timestamp()
+BUCKET_ID = "aw-watcher-lid_replay"
+
+
+def flapping_lid(toggles: int = 10_000, interval: float = 0.05) -> list[dict]:
+    """A worn hinge switch bouncing between open and closed."""
+    return [
+        {"t": i * interval, "source": "evdev", "lid": "closed" if i % 2 == 0 else "open"}
+        for i in range(toggles)
+    ]
+
+
+def suspend_cycles(cycles: int = 1000, awake: float = 1800.0, asleep: float = 3600.0) -> list[dict]:
+    """Close lid, suspend, resume, open lid; over and over."""
+    manager = "org.freedesktop.login1.Manager"
+    trace = []
+    t = 0.0
+    for _ in range(cycles):
+        t += awake
+        trace.append(
+            {
+                "t": t,
+                "source": "dbus",
+                "signal": "PropertiesChanged",
+                "args": [manager, {"LidClosed": True}, []],
+            }
+        )
+        trace.append({"t": t + 0.2, "source": "dbus", "signal": "PrepareForSleep", "args": [True]})
+        t += asleep
+        trace.append({"t": t, "source": "dbus", "signal": "PrepareForSleep", "args": [False]})
+        trace.append(
+            {
+                "t": t + 0.5,
+                "source": "dbus",
+                "signal": "PropertiesChanged",
+                "args": [manager, {"LidClosed": False}, []],
+            }
+        )
+    return trace
+
+
+def journal_day(entries: int = 86_400, event_ratio: float = 0.001) -> list[dict]:
+    """A day of journal output, mostly unrelated messages."""
+    trace = []
+    for entry, _expected in labelled_sample(entries, event_ratio, seed=1):
+        t = int(entry["__REALTIME_TIMESTAMP"]) / 1_000_000 - 1_736_949_600
+        entry["__REALTIME_TIMESTAMP"] = str(int((TRACE_EPOCH + t) * 1_000_000))
+        trace.append({"t": t, "source": "journal", "entry": entry})
+    return trace
+
+
+SCENARIOS = {
+    "flapping-lid": flapping_lid,
+    "suspend-cycles": suspend_cycles,
+    "journal-day": journal_day,
+}
+
+
+def load_trace(path: str) -> list[dict]:
+    """Read a trace file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_trace(trace: Iterable[dict], path: str) -> None:
+    """Write a trace file."""
+    with open(path, "w") as f:
+        for item in trace:
+            f.write(json.dumps(item) + "\n")
+
+
+def _event_key(event: Event) -> tuple:
+    return (round(event.timestamp.timestamp(), 3), tuple(sorted(event.data.items())))
+
+
+class Replayer:
+    """Feeds a trace to LidWatcher through the listeners' parsing code."""
+
+    def __init__(self, workdir: Path, speed: float = 0.0, spool: bool = True) -> None:
+        """Set up a watcher wired to a fake aw-server.
+
+        Args:
+            workdir: Directory for the state file and spool
+            speed: Replay speed relative to the trace timeline (0: as fast as possible)
+            spool: Use the on-disk spool (else events wait in memory)
+        """
+        self.speed = speed
+        self.server = FakeServer()
+        self.server.on_receive = self._on_receive
+
+        self.watcher = LidWatcher(testing=True)
+        # stop() waits until everything is sent
+        self.watcher.config["sender_flush_timeout"] = 600.0
+        self.watcher.state = LocalState(workdir / "state.json")
+        self.watcher.client = self.server  # type: ignore[assignment]
+        self.watcher.sender = EventSender(
+            self.server, BUCKET_ID, spool=Spool(workdir / "spool") if spool else None
+        )
+
+        # Input time of each queued event, to measure handler-to-send latency
+        self._input_time = 0.0
+        self._pending: defaultdict[tuple, deque[float]] = defaultdict(deque)
+        self.latencies: list[float] = []
+        enqueue = self.watcher.sender.enqueue
+
+        def timed_enqueue(event: Event, on_committed: Any = None) -> bool:
+            self._pending[_event_key(event)].append(self._input_time)
+            return enqueue(event, on_committed=on_committed)
+
+        self.watcher.sender.enqueue = timed_enqueue  # type: ignore[method-assign]
+
+        self._evdev: Optional[EvdevListener] = None
+        self._evdev_w: Optional[int] = None
+        self._dbus: Any = None
+        self._journal: Optional[JournalListener] = None
+
+    def _on_receive(self, events: list[Event]) -> None:
+        now = time.perf_counter()
+        for event in events:
+            pending = self._pending.get(_event_key(event))
+            if pending:
+                self.latencies.append(now - pending.popleft())
+
+    def _evdev_listener(self) -> tuple[EvdevListener, int]:
+        if self._evdev is None:
+            read_fd, self._evdev_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+            self._evdev = EvdevListener(self.watcher, device_path="replay")
+            self._evdev.fd = read_fd
+        return self._evdev, self._evdev_w  # type: ignore[return-value]
+
+    def _dbus_listener(self) -> Any:
+        if self._dbus is None:
+            try:
+                import dbus  # noqa: F401
+                from gi.repository import GLib  # noqa: F401
+            except ImportError:
+                # Signals are injected straight into the handlers, so the
+                # libraries are never used; they only need to be importable
+                for name in ("dbus", "dbus.mainloop", "dbus.mainloop.glib", "gi", "gi.repository"):
+                    sys.modules.setdefault(name, MagicMock())
+            from aw_watcher_lid.dbus_listener import DbusListener
+
+            self._dbus = DbusListener(self.watcher)
+        return self._dbus
+
+    def _journal_listener(self) -> JournalListener:
+        if self._journal is None:
+            self._journal = JournalListener(self.watcher)
+            self._journal.running = True
+        return self._journal
+
+    def _dispatch(self, item: dict) -> None:
+        source = item["source"]
+        if source == "evdev":
+            listener, write_fd = self._evdev_listener()
+            stamp = TRACE_EPOCH + item["t"]
+            sec, usec = int(stamp), int(stamp % 1 * 1_000_000)
+            closed = item["lid"] == "closed"
+            os.write(
+                write_fd,
+                INPUT_EVENT.pack(sec, usec, EV_SW, SW_LID, int(closed))
+                + INPUT_EVENT.pack(sec, usec, EV_SYN, 0, 0),
+            )
+            listener._read_events()
+        elif source == "dbus":
+            listener = self._dbus_listener()
+            handler = {
+                "PrepareForSleep": listener._on_prepare_for_sleep,
+                "PrepareForShutdown": listener._on_prepare_for_shutdown,
+                "PropertiesChanged": listener._on_properties_changed,
+            }[item["signal"]]
+            handler(*item["args"])
+        elif source == "journal":
+            self._journal_listener()._read_stream(iter([item["line"]]))
+        else:
+            raise ValueError(f"Unknown trace source: {source}")
+
+    def run(self, trace: list[dict]) -> dict[str, Any]:
+        """Replay a trace and wait until every event reached the server.
+
+        Returns:
+            The measurements
+        """
+        for item in trace:
+            if item["source"] == "journal":
+                item["line"] = json.dumps(item["entry"]) + "\n"
+
+        self.watcher.sender.start()  # type: ignore[union-attr]
+        started = time.perf_counter()
+        for item in trace:
+            if self.speed:
+                delay = started + item["t"] / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._input_time = time.perf_counter()
+            self._dispatch(item)
+
+        replayed = time.perf_counter()
+        self.watcher.stop()
+        elapsed = time.perf_counter() - started
+
+        # The listeners were fed directly, their loops never ran to close these
+        if self._evdev is not None:
+            os.close(self._evdev.fd)  # type: ignore[arg-type]
+            os.close(self._evdev_w)  # type: ignore[arg-type]
+            self._evdev._wakeup.close()
+            self._evdev = None
+        if self._journal is not None:
+            self._journal._wakeup.close()
+            self._journal = None
+
+        sender = self.watcher.sender
+        latencies = sorted(self.latencies)
+        return {
+            "inputs": len(trace),
+            # Delivered, also as part of a merged event
+            "events": sender.sent,  # type: ignore[union-attr]
+            "dropped": sender.dropped,  # type: ignore[union-attr]
+            "replay_s": replayed - started,
+            "elapsed_s": elapsed,
+            "events_per_s": sender.sent / elapsed if elapsed else 0.0,  # type: ignore[union-attr]
+            "latency_p50_ms": _percentile(latencies, 50) * 1000,
+            "latency_p99_ms": _percentile(latencies, 99) * 1000,
+            "requests": sum(self.server.requests.values()),
+            "requests_by_endpoint": dict(self.server.requests),
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def print_report(name: str, report: dict[str, Any]) -> None:
+    """Print the measurements of one run."""
+    print(
+        f"{name}: {report['inputs']} inputs -> {report['events']} events "
+        f"({report['dropped']} dropped) in {report['elapsed_s']:.2f}s, "
+        f"{report['events_per_s']:,.0f} events/s, "
+        f"latency p50 {report['latency_p50_ms']:.2f}ms p99 {report['latency_p99_ms']:.2f}ms, "
+        f"{report['requests']} requests {report['requests_by_endpoint']}, "
+        f"peak RSS {report['peak_rss_mb']:.1f}MB"
+    )
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", nargs="?", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--trace", help="Replay a trace file instead of a scenario")
+    parser.add_argument("--save-trace", help="Write the scenario's trace to this file")
+    parser.add_argument(
+        "--speed", type=float, default=0.0, help="Speed-up over real time (0: as fast as possible)"
+    )
+    parser.add_argument("--no-spool", action="store_true", help="Keep unsent events in memory")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.scenario == "all" and not args.trace:
+        # One process per scenario, so peak RSS is per scenario
+        status = 0
+        for name in SCENARIOS:
+            cmd = [sys.executable, "-m", "benchmarks.replay", name, f"--speed={args.speed}"]
+            cmd += ["--no-spool"] if args.no_spool else []
+            cmd += ["--json"] if args.json else []
+            status |= subprocess.call(cmd)
+        return status
+
+    if args.trace:
+        name, trace = Path(args.trace).name, load_trace(args.trace)
+    else:
+        name, trace = args.scenario, SCENARIOS[args.scenario]()
+    if args.save_trace:
+        save_trace(trace, args.save_trace)
+
+    with tempfile.TemporaryDirectory(prefix="aw-watcher-lid-replay-") as workdir:
+        report = Replayer(Path(workdir), speed=args.speed, spool=not args.no_spool).run(trace)
+
+    if args.json:
+        print(json.dumps({"name": name, **report}))
+    else:
+        print_report(name, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
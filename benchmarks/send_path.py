@@ -0,0 +1,329 @@
+"""Send path, spool replay and boot gap probe against the local HTTP aw-server stand-in.
+
+Everything goes through a real ActivityWatchClient over HTTP to
+benchmarks.http_server, so request counts and timings include the client
+and the HTTP round trips (plus any injected --latency):
+
+    trickle       events sent one at a time, as a watcher sends them
+    burst         a bouncing hinge's events queued at once
+    bounce        a bouncing hinge trickling in, with and without client-side
+                  heartbeat coalescing (same bucket contents, fewer requests)
+    keepalive     events trickling in over aw-client's connection per request
+                  and over the watcher's keep-alive session
+    spool-replay  a bouncing hinge's events spooled while aw-server is down,
+                  then replayed
+    boot-probe    first activity in a boot gap, one query vs per-bucket requests
+
+burst, bounce and spool-replay check that the bucket ends up as if every
+event had been sent as a heartbeat on its own.
+
+Usage:
+
+    python -m benchmarks.send_path
+    python -m benchmarks.send_path spool-replay --events 50000 --latency 0.002
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+
+from aw_core.models import Event
+
+from aw_watcher_lid.boot_detector import BootDetector
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.sender import EventSender
+from aw_watcher_lid.spool import Spool
+
+from .fake_server import FakeServer
+from .http_server import HttpAwServer
+
+BUCKET_ID = "aw-watcher-lid_bench"
+START = datetime(2025, 1, 15, 8, 0, tzinfo=timezone.utc)
+
+
+def lid_events(count: int) -> list[Event]:
+    """Alternating lid closed/open events, a minute apart."""
+    watcher = LidWatcher(testing=True)
+    return [
+        watcher._build_event(
+            START + timedelta(minutes=i), 59.0, "open" if i % 2 else "closed", None, False, "lid"
+        )
+        for i in range(count)
+    ]
+
+
+def bounce_events(count: int) -> list[Event]:
+    """Events a watcher queues for a hinge bouncing every half second."""
+    watcher = LidWatcher(testing=True)
+    watcher.sender = MagicMock()
+    for i in range(count):
+        watcher.handle_lid_event(
+            "closed" if i % 2 == 0 else "open",
+            timestamp=START + timedelta(seconds=i / 2),
+            clock=i / 2,
+        )
+    return [c.args[0] for c in watcher.sender.enqueue.call_args_list]
+
+
+def _sender(
+    server: HttpAwServer,
+    workdir: Path,
+    retry_interval: float = 0.05,
+    bucket_id: str = BUCKET_ID,
+    coalesce_interval: float = 0.0,
+    session: bool = False,
+) -> EventSender:
+    return EventSender(
+        server.client(session=session),
+        bucket_id,
+        spool=Spool(workdir / bucket_id),
+        queue_size=1_000_000,
+        retry_interval=retry_interval,
+        coalesce_interval=coalesce_interval,
+    )
+
+
+def _bucket(server: HttpAwServer, bucket_id: str = BUCKET_ID) -> list[tuple]:
+    return [(e.timestamp, e.duration, e.data) for e in server.store.events[bucket_id]]
+
+
+def _as_heartbeats(events: list[Event], pulsetime: float) -> list[tuple]:
+    """The bucket aw-server keeps for events sent one heartbeat at a time."""
+    reference = FakeServer()
+    reference.create_bucket(BUCKET_ID, "bench")
+    for event in events:
+        reference.heartbeat(BUCKET_ID, event, pulsetime=pulsetime)
+    return [(e.timestamp, e.duration, e.data) for e in reference.events[BUCKET_ID]]
+
+
+def _wait_until_sent(sender: EventSender, timeout: float = 600.0) -> None:
+    """Wait until everything is sent (or, when coalescing, held back)."""
+    deadline = time.monotonic() + timeout
+    while sender.pending > sender.held and time.monotonic() < deadline:
+        time.sleep(0.0005)
+
+
+def _report(server: HttpAwServer, events: int, elapsed: float, **extra: Any) -> dict[str, Any]:
+    by_endpoint = server.requests_by_endpoint()
+    requests = sum(by_endpoint.values())
+    return {
+        "events": events,
+        "elapsed_s": elapsed,
+        "events_per_s": events / elapsed if elapsed else 0.0,
+        "requests": requests,
+        "requests_per_event": requests / events if events else 0.0,
+        "requests_by_endpoint": dict(by_endpoint),
+        **extra,
+    }
+
+
+def trickle(server: HttpAwServer, workdir: Path, events: int) -> dict[str, Any]:
+    """Send events one at a time, waiting for each to reach the server."""
+    sender = _sender(server, workdir)
+    sender.start()
+    started = time.perf_counter()
+    for event in lid_events(events):
+        sender.enqueue(event)
+        _wait_until_sent(sender)
+    elapsed = time.perf_counter() - started
+    sender.stop()
+    return _report(server, events, elapsed)
+
+
+def burst(server: HttpAwServer, workdir: Path, events: int) -> dict[str, Any]:
+    """Queue a burst of events and wait until all are sent."""
+    queued = bounce_events(events)[:events]
+    sender = _sender(server, workdir)
+    sender.start()
+    started = time.perf_counter()
+    for event in queued:
+        sender.enqueue(event)
+    _wait_until_sent(sender)
+    elapsed = time.perf_counter() - started
+    sender.stop()
+    same = _bucket(server) == _as_heartbeats(queued, sender.pulsetime)
+    return _report(server, events, elapsed, same_bucket_contents=same)
+
+
+def bounce(server: HttpAwServer, workdir: Path, events: int) -> dict[str, Any]:
+    """Trickle a bouncing hinge's events in, without and with coalescing."""
+    results = {}
+    for coalesce_interval in (0.0, 10.0):
+        bucket_id = f"{BUCKET_ID}-{'coalesced' if coalesce_interval else 'plain'}"
+        sender = _sender(server, workdir, bucket_id=bucket_id, coalesce_interval=coalesce_interval)
+        sender.start()
+        before = server.requests_by_endpoint()["heartbeat"]
+        for event in bounce_events(events):
+            sender.enqueue(event)
+            _wait_until_sent(sender)
+        sender.stop()
+        results[bucket_id] = server.requests_by_endpoint()["heartbeat"] - before
+
+    plain, coalesced = (_bucket(server, bucket_id) for bucket_id in results)
+    heartbeats_plain, heartbeats_coalesced = results.values()
+    return {
+        "events": heartbeats_plain,
+        "heartbeats_plain": heartbeats_plain,
+        "heartbeats_coalesced": heartbeats_coalesced,
+        "requests_saved": 1 - heartbeats_coalesced / heartbeats_plain,
+        "same_bucket_contents": plain == coalesced,
+    }
+
+
+def keepalive(server: HttpAwServer, workdir: Path, events: int) -> dict[str, Any]:
+    """Trickle events in with a connection per request, then over one kept alive."""
+    clients = {}
+    for session in (False, True):
+        name = "session" if session else "per-request"
+        sender = _sender(server, workdir, bucket_id=f"{BUCKET_ID}-{name}", session=session)
+        sender.start()
+        connections = server.connections
+        started = time.perf_counter()
+        for event in lid_events(events):
+            sender.enqueue(event)
+            _wait_until_sent(sender)
+        elapsed = time.perf_counter() - started
+        sender.stop()
+        if session:
+            sender.client.disconnect()
+        clients[name] = {
+            "ms_per_event": elapsed / events * 1000,
+            "connections": server.connections - connections,
+        }
+    return {"events": events, "clients": clients}
+
+
+def spool_replay(server: HttpAwServer, workdir: Path, events: int) -> dict[str, Any]:
+    """Spool events while the server is down, then time the replay."""
+    queued = bounce_events(events)[:events]
+    server.down()
+    sender = _sender(server, workdir)
+    sender.start()
+    for event in queued:
+        sender.enqueue(event)
+    while len(sender.spool) < events:
+        time.sleep(0.001)
+    failures = sender.failures
+
+    started = time.perf_counter()
+    server.up()
+    _wait_until_sent(sender)
+    elapsed = time.perf_counter() - started
+    sender.stop()
+    same = _bucket(server) == _as_heartbeats(queued, sender.pulsetime)
+    return _report(server, events, elapsed, failures_while_down=failures, same_bucket_contents=same)
+
+
+def boot_probe(server: HttpAwServer, workdir: Path, events: int) -> dict[str, Any]:
+    """Find the first activity in a boot gap across busy window/AFK buckets."""
+    client = server.client()
+    bucket_ids = ["aw-watcher-window_bench", "aw-watcher-afk_bench", "aw-watcher-web_bench"]
+    for bucket_id in bucket_ids:
+        client.create_bucket(bucket_id, "bench")
+        client.insert_events(bucket_id, lid_events(events))
+    server.requests.clear()
+
+    watcher = LidWatcher(testing=True)
+    watcher.testing = False
+    watcher.client = client
+    detector = BootDetector(watcher)
+    start, end = START + timedelta(days=1), START + timedelta(minutes=events)
+
+    timings = {}
+    for method in (detector._query_first_activity, detector._fetch_first_activity):
+        before = len(server.requests)
+        started = time.perf_counter()
+        method(bucket_ids, start, end)
+        timings[method.__name__.strip("_")] = {
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            "requests": len(server.requests) - before,
+        }
+    return {"events": events * len(bucket_ids), "probes": timings}
+
+
+SCENARIOS: dict[str, tuple[Callable[[HttpAwServer, Path, int], dict[str, Any]], int]] = {
+    "trickle": (trickle, 500),
+    "burst": (burst, 10_000),
+    "bounce": (bounce, 200),
+    "keepalive": (keepalive, 500),
+    "spool-replay": (spool_replay, 10_000),
+    "boot-probe": (boot_probe, 20_000),
+}
+
+
+def run(name: str, events: int = 0, latency: float = 0.0, error_rate: float = 0.0) -> dict:
+    """Run one scenario against a fresh server.
+
+    Args:
+        name: Scenario name
+        events: Number of events (0: the scenario's default)
+        latency: Seconds every request takes
+        error_rate: Fraction of requests answered with HTTP 500
+
+    Returns:
+        The measurements
+    """
+    scenario, default_events = SCENARIOS[name]
+    with (
+        tempfile.TemporaryDirectory(prefix="aw-watcher-lid-bench-") as workdir,
+        HttpAwServer(latency=latency, error_rate=error_rate) as server,
+    ):
+        return scenario(server, Path(workdir), events or default_events)
+
+
+def print_report(name: str, report: dict[str, Any]) -> None:
+    """Print the measurements of one scenario."""
+    if "probes" in report:
+        probes = ", ".join(
+            f"{method} {timing['elapsed_ms']:.1f}ms in {timing['requests']} request(s)"
+            for method, timing in report["probes"].items()
+        )
+        print(f"{name}: {report['events']} events in the probed buckets, {probes}")
+        return
+    if "clients" in report:
+        clients = ", ".join(
+            f"{client} {result['ms_per_event']:.2f}ms/event over "
+            f"{result['connections']} connection(s)"
+            for client, result in report["clients"].items()
+        )
+        print(f"{name}: {report['events']} events, {clients}")
+        return
+    if "requests_saved" in report:
+        print(
+            f"{name}: {report['heartbeats_plain']} heartbeats, coalesced into "
+            f"{report['heartbeats_coalesced']} ({report['requests_saved']:.0%} of the requests "
+            f"saved), same bucket contents: {report['same_bucket_contents']}"
+        )
+        return
+    same = ""
+    if "same_bucket_contents" in report:
+        same = f", same bucket contents as heartbeats: {report['same_bucket_contents']}"
+    print(
+        f"{name}: {report['events']} events in {report['elapsed_s']:.2f}s, "
+        f"{report['events_per_s']:,.0f} events/s, {report['requests']} requests "
+        f"({report['requests_per_event']:.3f}/event) {report['requests_by_endpoint']}{same}"
+    )
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", nargs="?", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--events", type=int, default=0, help="Events per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failed requests")
+    args = parser.parse_args()
+
+    for name in SCENARIOS if args.scenario == "all" else [args.scenario]:
+        print_report(name, run(name, args.events, args.latency, args.error_rate))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
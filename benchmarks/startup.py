@@ -0,0 +1,145 @@
+"""Cold-start time of aw-watcher-lid, checked against a time budget.
+
+Starts `python -m aw_watcher_lid --testing --print-startup-timing` several
+times and reads the phase timings it prints once its listener waits for
+events. The evdev listener is pointed at a FIFO, so no lid switch, D-Bus or
+journal is needed. Also times `--help`. Exits with status 1 if the median
+import-to-ready time (everything after the interpreter started) or `--help`
+is over budget.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --budget-ms 150
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+PHASE_LINE = re.compile(r"^\s+(.+?)\s+([\d.]+)ms$")
+
+
+def start_once(
+    env: dict[str, str],
+    timeout: float = 30.0,
+    on_ready: Optional[Callable[[int], None]] = None,
+    testing: bool = True,
+    args: Sequence[str] = (),
+) -> dict[str, float]:
+    """Start the watcher once and collect its startup timing.
+
+    Args:
+        env: Environment to run the watcher in
+        timeout: Longest time to wait for the listener to be ready
+        on_ready: Called with the process ID once ready, before the watcher is stopped
+        testing: Run in testing mode (no aw-server, spool or state file)
+        args: More command line arguments
+
+    Returns:
+        Milliseconds per phase, as printed by --print-startup-timing
+    """
+    args = [*args, "--testing"] if testing else [*args]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "aw_watcher_lid", *args, "--print-startup-timing"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    phases: dict[str, float] = {}
+    deadline = time.monotonic() + timeout
+    try:
+        for line in process.stderr:  # type: ignore[union-attr]
+            match = PHASE_LINE.match(line)
+            if match:
+                phases[match.group(1)] = float(match.group(2))
+                if match.group(1) == "ready after":
+                    if on_ready:
+                        on_ready(process.pid)
+                    break
+            if time.monotonic() > deadline:
+                break
+    finally:
+        process.terminate()
+        process.communicate(timeout=timeout)
+
+    if "ready after" not in phases:
+        raise RuntimeError("aw-watcher-lid exited before its listener was ready")
+    return phases
+
+
+def time_help(env: dict[str, str]) -> float:
+    """Time `aw-watcher-lid --help` in milliseconds."""
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "aw_watcher_lid", "--help"],
+        stdout=subprocess.DEVNULL,
+        check=True,
+        env=env,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def isolated_env(workdir: Path, config: str = "") -> dict[str, str]:
+    """Environment with its own config and data directories.
+
+    Args:
+        workdir: Directory to keep them in
+        config: Watcher config (default: the evdev listener on a FIFO)
+    """
+    config_dir = workdir / "config" / "activitywatch" / "aw-watcher-lid"
+    config_dir.mkdir(parents=True)
+    if not config:
+        fifo = workdir / "lid-switch"
+        os.mkfifo(fifo)
+        config = f'listener = "evdev"\nevdev_device = "{fifo}"\n'
+    (config_dir / "aw-watcher-lid.toml").write_text(config)
+    return {
+        **os.environ,
+        "XDG_CONFIG_HOME": str(workdir / "config"),
+        "XDG_DATA_HOME": str(workdir / "data"),
+        "XDG_CACHE_HOME": str(workdir / "cache"),
+    }
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument(
+        "--budget-ms", type=float, default=200.0, help="Budget for the median import-to-ready time"
+    )
+    parser.add_argument(
+        "--help-budget-ms", type=float, default=400.0, help="Budget for the median --help time"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="aw-watcher-lid-startup-") as workdir:
+        env = isolated_env(Path(workdir))
+        # One unmeasured run to fill the page cache and write .pyc files
+        start_once(env)
+        runs = [start_once(env) for _ in range(args.runs)]
+        help_times = [time_help(env) for _ in range(args.runs)]
+
+    phases = [phase for phase in runs[0] if phase != "ready after"]
+    for phase in phases:
+        print(f"{phase:>16}: {statistics.median(run[phase] for run in runs):8.1f}ms (median)")
+    ready = statistics.median(run["ready after"] - run["interpreter"] for run in runs)
+    help_time = statistics.median(help_times)
+    print(f"{'import-to-ready':>16}: {ready:8.1f}ms (budget {args.budget_ms:.0f}ms)")
+    print(f"{'--help':>16}: {help_time:8.1f}ms (budget {args.help_budget_ms:.0f}ms)")
+
+    if ready > args.budget_ms or help_time > args.help_budget_ms:
+        print("Startup time over budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
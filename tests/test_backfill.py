@@ -0,0 +1,150 @@
+"""Tests for rebuilding history from the journal."""
+
+from datetime import datetime, timezone
+from typing import Optional
+from unittest.mock import MagicMock, patch
+
+from aw_watcher_lid.backfill import Backfiller, BatchInserter, backfill
+from aw_watcher_lid.boots import Boot
+from aw_watcher_lid.lid import LidWatcher
+from benchmarks.fake_server import FakeServer
+
+DAY = datetime(2025, 1, 15, tzinfo=timezone.utc)
+BOOTS = [
+    Boot("a", DAY.replace(hour=10), DAY.replace(hour=12)),
+    Boot("b", DAY.replace(hour=14), DAY.replace(hour=15)),
+]
+MESSAGES = {
+    "closed": ("systemd-logind.service", "Lid closed."),
+    "open": ("systemd-logind.service", "Lid opened."),
+    "suspended": ("systemd-suspend.service", "Suspending system..."),
+    "resumed": ("systemd-suspend.service", "System resumed."),
+}
+
+
+def _entry(boot_id: str, hour: int, minute: int, what: str) -> dict:
+    unit, message = MESSAGES[what]
+    usec = int(DAY.replace(hour=hour, minute=minute).timestamp() * 1_000_000)
+    return {
+        "__REALTIME_TIMESTAMP": str(usec),
+        "_BOOT_ID": boot_id,
+        "_SYSTEMD_UNIT": unit,
+        "MESSAGE": message,
+    }
+
+
+ENTRIES = [
+    _entry("a", 10, 30, "closed"),
+    _entry("a", 10, 45, "open"),
+    _entry("b", 14, 10, "suspended"),
+    _entry("b", 14, 20, "resumed"),
+]
+
+
+def _backfill(
+    server: FakeServer, batch_size: int = 500, until: Optional[datetime] = None
+) -> BatchInserter:
+    server.create_bucket("bucket", "systemafkstatus")
+    inserter = BatchInserter(server, "bucket", batch_size=batch_size)
+    Backfiller(LidWatcher(testing=True), inserter, until=until).run(BOOTS, iter(ENTRIES))
+    return inserter
+
+
+def _bucket(server: FakeServer) -> list[tuple[str, float, str]]:
+    return [
+        (
+            event.timestamp.strftime("%H:%M"),
+            event.duration.total_seconds(),
+            event.data["lid_state"] or event.data["suspend_state"] or event.data["event_source"],
+        )
+        for event in server.events["bucket"]
+    ]
+
+
+def test_rebuilds_events_and_boot_gaps() -> None:
+    """Test that lid, suspend and boot gap events are rebuilt as the watcher records them."""
+    server = FakeServer()
+    inserter = _backfill(server)
+
+    assert _bucket(server) == [
+        ("10:30", 900.0, "closed"),
+        ("10:45", 4500.0, "open"),
+        ("12:00", 7200.0, "boot"),
+        ("14:10", 600.0, "suspended"),
+        ("14:20", 2400.0, "resumed"),
+    ]
+    assert server.events["bucket"][2].data["status"] == "system-afk"
+    # The heartbeats of closed/suspended events were merged before inserting
+    assert inserter.heartbeats == 7
+    assert server.requests["insert_events"] == 1
+
+
+def test_skips_covered_ranges() -> None:
+    """Test that events overlapping what the bucket has are not inserted again."""
+    server = FakeServer()
+    server.create_bucket("bucket", "systemafkstatus")
+    recorded = _entry("b", 14, 0, "open")
+    server.events["bucket"].append(
+        LidWatcher(testing=True)._build_event(
+            datetime.fromtimestamp(int(recorded["__REALTIME_TIMESTAMP"]) / 1e6, tz=timezone.utc),
+            3600,
+            "open",
+            None,
+            False,
+            "lid",
+        )
+    )
+
+    inserter = _backfill(server)
+
+    # The boot gap ends where the recorded event starts, so it overlaps too
+    assert [e[:2] for e in _bucket(server)] == [
+        ("10:30", 900.0),
+        ("10:45", 4500.0),
+        ("14:00", 3600.0),
+    ]
+    assert inserter.skipped == 3
+
+
+def test_rerun_inserts_nothing() -> None:
+    """Test that backfilling the same history twice doesn't duplicate events."""
+    server = FakeServer()
+    _backfill(server)
+    inserter = _backfill(server)
+
+    assert inserter.inserted == 0
+    assert len(server.events["bucket"]) == 5
+
+
+def test_inserts_in_batches() -> None:
+    """Test that events are inserted batch_size at a time."""
+    server = FakeServer()
+    inserter = _backfill(server, batch_size=2)
+
+    assert inserter.inserted == 5
+    assert server.requests["insert_events"] == 3
+
+
+def test_events_end_at_until() -> None:
+    """Test that the last boot's open event ends at --until, not at its last entry."""
+    server = FakeServer()
+    _backfill(server, until=DAY.replace(hour=14, minute=30))
+
+    assert _bucket(server)[-1] == ("14:20", 600.0, "resumed")
+
+
+def test_running_boot_skipped() -> None:
+    """Test that the running boot is only rebuilt when asked to."""
+    client = MagicMock()
+    client.get_events.return_value = []
+    with (
+        patch("aw_client.ActivityWatchClient", return_value=client),
+        patch("aw_watcher_lid.boots.list_journal_boots", return_value=BOOTS),
+        patch("aw_watcher_lid.state.current_boot_id", return_value="b"),
+        patch("aw_watcher_lid.backfill.read_journal", side_effect=lambda *_: iter(ENTRIES)),
+    ):
+        result = backfill(None, None, dry_run=True)
+        assert (result["boots"], result["entries"]) == (1, 2)
+
+        result = backfill(None, None, dry_run=True, include_current_boot=True)
+        assert (result["boots"], result["entries"]) == (2, 4)
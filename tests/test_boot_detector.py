@@ -1,10 +1,16 @@
 """Tests for BootDetector."""
 
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
 from unittest.mock import MagicMock, patch
 
+from aw_core.models import Event
+
 from aw_watcher_lid.boot_detector import BootDetector
+from aw_watcher_lid.boots import Boot, BootList, parse_wtmp_boots
 from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.state import LocalState
 
 
 def test_boot_detector_init() -> None:
@@ -106,3 +112,251 @@ def test_check_for_boot_gap_long_gap(mock_last_event: MagicMock, mock_boot_time:
     assert call_args[1]["event_source"] == "boot"
     assert call_args[1]["timestamp"] == last_event
     assert call_args[1]["duration"] > 7000  # ~2 hours in seconds
+
+
+@patch("aw_watcher_lid.boot_detector.BootDetector._get_boot_time")
+@patch("aw_watcher_lid.boot_detector.BootDetector._get_last_event_time")
+def test_check_for_boot_gap_recorded_shutdown(
+    mock_last_event: MagicMock, mock_boot_time: MagicMock, tmp_path: Path
+) -> None:
+    """Test that a recorded shutdown gives the gap without asking the server."""
+    watcher = LidWatcher(testing=True)
+    watcher._send_event = MagicMock()  # Mock event sending
+    watcher.state = LocalState(tmp_path / "state.json")
+
+    now = datetime.now(timezone.utc)
+    shutdown = now - timedelta(hours=1)
+    watcher.state.update(shutdown={"time": shutdown.isoformat(), "boot_id": "previous-boot"})
+    mock_boot_time.return_value = now
+
+    detector = BootDetector(watcher)
+    detector.check_for_boot_gap()
+
+    mock_last_event.assert_not_called()
+    call_args = watcher._send_event.call_args
+    assert call_args[1]["boot_gap"] is True
+    assert call_args[1]["timestamp"] == shutdown
+    assert call_args[1]["duration"] == 3600
+
+    # The record is consumed, a watcher restart doesn't report the gap again
+    assert "shutdown" not in watcher.state.load()
+
+
+@patch("aw_watcher_lid.boot_detector.current_boot_id", return_value="next-boot")
+@patch("aw_watcher_lid.boot_detector.BootDetector._get_boot_time")
+def test_check_for_boot_gap_cancelled_shutdown(
+    mock_boot_time: MagicMock, mock_boot_id: MagicMock, tmp_path: Path
+) -> None:
+    """Test that a cancelled shutdown isn't taken as the start of the next boot gap."""
+    now = datetime.now(timezone.utc)
+    shutdown = now - timedelta(hours=3)
+    cancelled = shutdown + timedelta(minutes=1)
+
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher._send_event = MagicMock()  # type: ignore[method-assign]
+    watcher.handle_lid_event("open", timestamp=shutdown - timedelta(hours=1), clock=0.0)
+    watcher.handle_shutdown_event(timestamp=shutdown, clock=3600.0)
+    watcher.handle_shutdown_cancelled(timestamp=cancelled, clock=3660.0)
+
+    # The system went down later without a shutdown signal, the watcher starts again
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher.last_event_end = watcher._load_last_event_end()
+    watcher._send_event = MagicMock()  # type: ignore[method-assign]
+    mock_boot_time.return_value = now
+
+    BootDetector(watcher).check_for_boot_gap()
+
+    starts = [call.kwargs["timestamp"] for call in watcher._send_event.call_args_list]
+    assert starts
+    assert shutdown not in starts
+    assert min(starts) >= cancelled
+
+
+def _probing_detector(config: Optional[dict] = None) -> BootDetector:
+    """BootDetector with a mocked aw-server client."""
+    watcher = LidWatcher(testing=True)
+    watcher.testing = False
+    watcher.client = MagicMock()
+    watcher.client.get_buckets.return_value = {
+        "aw-watcher-window_host": {},
+        "aw-watcher-afk_host": {},
+        "aw-watcher-lid_host": {},
+    }
+    watcher.config.update(config or {})
+    return BootDetector(watcher)
+
+
+def test_activity_probe_single_query() -> None:
+    """Test that the activity probe asks the server once, across all buckets."""
+    detector = _probing_detector()
+    client = detector.watcher.client
+    client.query.return_value = [[{"timestamp": "2025-01-15T14:00:00Z", "duration": 5, "data": {}}]]
+    start = datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc)
+    end = datetime(2025, 1, 15, 16, 0, tzinfo=timezone.utc)
+
+    first = detector._get_first_activity_after(start, end)
+
+    assert first == datetime(2025, 1, 15, 14, 0, tzinfo=timezone.utc)
+    client.query.assert_called_once()
+    query = client.query.call_args.args[0]
+    assert '"aw-watcher-window_host"' in query
+    assert '"aw-watcher-afk_host"' in query
+    assert "aw-watcher-lid_host" not in query
+    assert client.query.call_args.args[1] == [(start, end)]
+    client.get_events.assert_not_called()
+
+
+def test_activity_probe_fallback_without_query_api() -> None:
+    """Test that servers without the query API are asked per bucket."""
+    detector = _probing_detector()
+    client = detector.watcher.client
+    client.query.side_effect = ConnectionError("404")
+    early = datetime(2025, 1, 15, 13, 0, 17, tzinfo=timezone.utc)
+    late = datetime(2025, 1, 15, 15, 0, tzinfo=timezone.utc)
+    events = {
+        "aw-watcher-window_host": [Event(timestamp=late - timedelta(minutes=i)) for i in range(100)]
+        + [Event(timestamp=early)],
+        "aw-watcher-afk_host": [],
+    }
+
+    def get_events(bucket_id: str, start: datetime, end: datetime, limit: int) -> list[Event]:
+        # Newest first, like aw-server
+        return [e for e in events[bucket_id] if start <= e.timestamp <= end][:limit]
+
+    client.get_events.side_effect = get_events
+
+    first = detector._get_first_activity_after(early - timedelta(hours=1), late)
+
+    assert first == early
+    assert all(c.kwargs["limit"] == 1 for c in client.get_events.call_args_list)
+    assert client.get_events.call_count < 30
+
+
+def test_activity_probe_exact_bucket_ids() -> None:
+    """Test that configured exact bucket IDs don't need the bucket list."""
+    detector = _probing_detector({"boot_probe_buckets": ["aw-watcher-afk_host"]})
+    client = detector.watcher.client
+    client.query.return_value = [[]]
+    now = datetime.now(timezone.utc)
+
+    assert detector._get_first_activity_after(now - timedelta(hours=1), now) is None
+    client.get_buckets.assert_not_called()
+    assert "aw-watcher-afk_host" in client.query.call_args.args[0]
+
+
+def test_check_for_boot_gap_deferred_until_server_answers(tmp_path: Path) -> None:
+    """Test that the gap comes from local state and the server check is deferred."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher.sender = MagicMock()
+    now = datetime(2025, 1, 15, 14, 0, tzinfo=timezone.utc)
+    watcher.last_event_end = now - timedelta(hours=2)
+
+    detector = BootDetector(watcher)
+    with patch.object(detector, "_get_boot_time", return_value=now):
+        detector.check_for_boot_gap()
+
+    # Nothing was asked from the server yet
+    build = watcher.sender.enqueue_deferred.call_args.args[0]
+    watcher.sender.enqueue.assert_not_called()
+
+    with patch.object(detector, "_get_first_activity_after", return_value=None):
+        (event,) = build()
+
+    assert event.data["boot_gap"] is True
+    assert event.timestamp == now - timedelta(hours=2)
+    assert event.duration == timedelta(hours=2)
+    assert watcher.state.load()["last_event"]["end"] == now.isoformat()
+
+
+def test_check_for_boot_gap_one_event_per_power_off(tmp_path: Path) -> None:
+    """Test that every reboot since the last event gives its own exact boot gap."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher.sender = MagicMock()
+    day = datetime(2025, 1, 15, tzinfo=timezone.utc)
+    watcher.last_event_end = day.replace(hour=9)
+    boots = BootList(
+        [
+            Boot("a", day.replace(hour=8), day.replace(hour=10)),
+            Boot("b", day.replace(hour=12), day.replace(hour=16)),
+        ]
+    )
+
+    detector = BootDetector(watcher)
+    with (
+        patch.object(detector, "_get_boot_time", return_value=day.replace(hour=20)),
+        patch.object(detector, "_list_boots", return_value=boots),
+    ):
+        detector.check_for_boot_gap()
+
+    # No activity check needed, the boot list has the exact times
+    watcher.sender.enqueue_deferred.assert_not_called()
+    events = [c.args[0] for c in watcher.sender.enqueue.call_args_list]
+    assert [(e.timestamp.hour, e.duration.total_seconds()) for e in events] == [
+        (10, 7200),
+        (16, 14400),
+    ]
+    assert all(e.data["boot_gap"] for e in events)
+
+
+def test_check_for_boot_gap_wtmp_without_running_boot(tmp_path: Path) -> None:
+    """Test that the running boot's wtmp record isn't taken as an earlier boot."""
+    watcher = LidWatcher(testing=True)
+    watcher.testing = False
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher.sender = MagicMock()
+    day = datetime(2025, 1, 15, tzinfo=timezone.utc)
+    watcher.last_event_end = day.replace(hour=14)
+    # /proc/uptime puts the boot a little after the wtmp record
+    boot_time = day.replace(hour=20, second=3)
+    wtmp = (
+        "reboot   system boot  6.1.0-18-amd64   2025-01-15T20:00:00+00:00   still running\n"
+        "reboot   system boot  6.1.0-18-amd64   2025-01-15T12:00:00+00:00 - "
+        "2025-01-15T16:00:00+00:00  (04:00)\n"
+    )
+
+    detector = BootDetector(watcher)
+    with (
+        patch(
+            "aw_watcher_lid.boot_detector.list_journal_boots",
+            side_effect=RuntimeError("no persistent journal"),
+        ),
+        patch("aw_watcher_lid.boot_detector.list_wtmp_boots", return_value=parse_wtmp_boots(wtmp)),
+        patch.object(detector, "_get_boot_time", return_value=boot_time),
+    ):
+        boots = detector._list_boots()
+        detector.check_for_boot_gap()
+
+    assert boots is not None
+    assert [boot.first.hour for boot in boots.boots] == [12]
+    watcher.sender.enqueue_deferred.assert_not_called()
+    (event,) = [c.args[0] for c in watcher.sender.enqueue.call_args_list]
+    assert event.timestamp == day.replace(hour=16)
+    assert event.timestamp + event.duration == boot_time
+
+
+def test_check_for_boot_gap_older_than_boot_list(tmp_path: Path) -> None:
+    """Test that only a gap starting before the boot list is checked for activity."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher.sender = MagicMock()
+    day = datetime(2025, 1, 15, tzinfo=timezone.utc)
+    watcher.last_event_end = day.replace(hour=6)
+    boots = BootList([Boot("b", day.replace(hour=12), day.replace(hour=16))])
+
+    detector = BootDetector(watcher)
+    with (
+        patch.object(detector, "_get_boot_time", return_value=day.replace(hour=20)),
+        patch.object(detector, "_list_boots", return_value=boots),
+    ):
+        detector.check_for_boot_gap()
+
+    (event,) = [c.args[0] for c in watcher.sender.enqueue.call_args_list]
+    assert event.timestamp == day.replace(hour=16)
+    build = watcher.sender.enqueue_deferred.call_args.args[0]
+    with patch.object(detector, "_get_first_activity_after", return_value=None):
+        (trimmed,) = build()
+    assert (trimmed.timestamp, trimmed.duration) == (day.replace(hour=6), timedelta(hours=6))
@@ -0,0 +1,111 @@
+"""Tests for the boot list."""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+from aw_watcher_lid.boots import Boot, BootList, parse_journal_boots, parse_wtmp_boots
+
+DAY = datetime(2025, 1, 15, tzinfo=timezone.utc)
+
+
+def _at(hour: int) -> datetime:
+    return DAY + timedelta(hours=hour)
+
+
+BOOTS = BootList(
+    [
+        Boot("c", _at(20), _at(22)),
+        Boot("a", _at(8), _at(10)),
+        Boot("b", _at(12), _at(16)),
+    ]
+)
+
+
+def test_parse_journal_boots() -> None:
+    """Test parsing journalctl --list-boots --output=json."""
+    first = int(DAY.timestamp() * 1_000_000)
+    output = json.dumps(
+        [
+            {
+                "index": 0,
+                "boot_id": "b",
+                "first_entry": first + 3600_000_000,
+                "last_entry": first + 7200_000_000,
+            },
+            {"index": -1, "boot_id": "a", "first_entry": first, "last_entry": first + 60_000_000},
+        ]
+    )
+
+    boots = parse_journal_boots(output)
+
+    assert [boot.boot_id for boot in boots] == ["a", "b"]
+    assert boots[0].last - boots[0].first == timedelta(minutes=1)
+    assert parse_journal_boots("") == []
+
+
+def test_parse_wtmp_boots() -> None:
+    """Test parsing last --time-format iso reboot."""
+    output = (
+        "reboot   system boot  6.1.0-18-amd64   2025-01-15T20:00:00+00:00   still running\n"
+        "reboot   system boot  6.1.0-18-amd64   2025-01-15T12:00:00+00:00 - "
+        "2025-01-15T16:00:00+00:00  (04:00)\n"
+        "reboot   system boot  6.1.0-18-amd64   2025-01-15T08:00:00+00:00 - crash  (04:00)\n"
+        "\n"
+        "wtmp begins 2025-01-01T00:00:00+00:00\n"
+    )
+
+    boots = parse_wtmp_boots(output)
+
+    assert [(boot.first, boot.crashed) for boot in boots] == [
+        (_at(8), True),
+        (_at(12), False),
+        (_at(20), False),
+    ]
+    assert boots[1].last == _at(16)
+    assert boots[2].last > _at(20)
+    assert [boot.running for boot in boots] == [False, False, True]
+
+
+def test_boot_at() -> None:
+    """Test finding the boot running at a time."""
+    assert BOOTS.boot_at(_at(7)) is None
+    assert BOOTS.boot_at(_at(8)).boot_id == "a"  # type: ignore[union-attr]
+    assert BOOTS.boot_at(_at(11)).boot_id == "a"  # type: ignore[union-attr]
+    assert BOOTS.boot_at(_at(23)).boot_id == "c"  # type: ignore[union-attr]
+
+
+def test_downtimes_between_boots() -> None:
+    """Test that each power-off interval is its own downtime."""
+    downtimes = list(BOOTS.downtimes(_at(9), _at(23)))
+
+    assert [(d.start, d.end, d.exact) for d in downtimes] == [
+        (_at(10), _at(12), True),
+        (_at(16), _at(20), True),
+        (_at(22), _at(23), True),
+    ]
+    assert downtimes[0].duration == 7200
+
+
+def test_downtime_before_list_is_inexact() -> None:
+    """Test that a downtime starting before the first listed boot starts at since."""
+    downtimes = list(BOOTS.downtimes(_at(6), _at(9)))
+
+    assert [(d.start, d.end, d.exact) for d in downtimes] == [(_at(6), _at(8), False)]
+
+
+def test_downtime_after_crash_skipped() -> None:
+    """Test that when a crashed boot went down is not guessed."""
+    boots = BootList(
+        [
+            Boot("a", _at(8), _at(10)),
+            Boot("b", _at(12), _at(12), crashed=True),
+            Boot("c", _at(20), _at(22)),
+        ]
+    )
+
+    downtimes = list(boots.downtimes(_at(9), _at(23)))
+
+    assert [(d.start, d.end) for d in downtimes] == [(_at(10), _at(12)), (_at(22), _at(23))]
+    # Unless the watcher saw the crashed boot running: then its end is an estimate
+    downtimes = list(boots.downtimes(_at(13), _at(21)))
+    assert [(d.start, d.end, d.exact) for d in downtimes] == [(_at(13), _at(20), False)]
@@ -0,0 +1,74 @@
+"""Tests for SessionClient against the local HTTP aw-server stand-in."""
+
+import time
+from collections.abc import Iterator
+
+import pytest
+import requests
+
+from aw_watcher_lid.client import SessionClient
+from benchmarks.http_server import HttpAwServer
+from benchmarks.send_path import BUCKET_ID, lid_events
+
+
+@pytest.fixture
+def server() -> Iterator[HttpAwServer]:
+    with HttpAwServer() as server:
+        yield server
+
+
+def _client(server: HttpAwServer, **kwargs: float) -> SessionClient:
+    return SessionClient(
+        "aw-watcher-lid", testing=True, host=server.host, port=server.port, **kwargs
+    )
+
+
+def test_requests_share_one_connection(server: HttpAwServer) -> None:
+    """Test that heartbeats reuse the kept-alive connection."""
+    client = _client(server)
+    client.create_bucket(BUCKET_ID, "systemafkstatus")
+    for event in lid_events(5):
+        client.heartbeat(BUCKET_ID, event, pulsetime=60)
+
+    assert len(client.get_events(BUCKET_ID)) == 5
+    assert server.connections == 1
+    client.disconnect()
+
+
+def test_warm_replaces_dead_connection(server: HttpAwServer) -> None:
+    """Test that warm() opens a fresh connection after the old one was cut."""
+    client = _client(server)
+    client.create_bucket(BUCKET_ID, "systemafkstatus")
+    server.down()
+    server.up()
+
+    client.warm()
+    client.heartbeat(BUCKET_ID, lid_events(1)[0], pulsetime=60)
+
+    assert server.connections == 2
+    assert server.requests_by_endpoint()["info"] == 1
+
+
+def test_errors_raise(server: HttpAwServer) -> None:
+    """Test that HTTP errors still raise, as with aw-client's own requests."""
+    client = _client(server)
+    server.fail_next(status=503)
+
+    with pytest.raises(requests.HTTPError):
+        client.create_bucket(BUCKET_ID, "systemafkstatus")
+
+
+def test_read_timeout(server: HttpAwServer) -> None:
+    """Test that a server that doesn't answer fails fast."""
+    client = _client(server, read_timeout=0.05)
+    server.latency = 1.0
+
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.get_buckets()
+    assert time.monotonic() - started < 0.5
+
+
+def test_disconnect_without_connect(server: HttpAwServer) -> None:
+    """Test that disconnecting a client whose request queue never ran works."""
+    _client(server).disconnect()
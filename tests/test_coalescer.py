@@ -0,0 +1,124 @@
+"""Tests for Coalescer and heartbeat coalescing in EventSender."""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from aw_core.models import Event
+
+from aw_watcher_lid.coalescer import Coalescer
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.sender import EventSender
+from benchmarks.fake_server import FakeServer
+
+START = datetime(2025, 1, 15, 14, 0, tzinfo=timezone.utc)
+
+
+def _watcher_events(seed: int, count: int = 200) -> list[Event]:
+    """Events a watcher queues for a bouncing hinge and suspend/resume loops."""
+    rng = random.Random(seed)
+    watcher = LidWatcher(testing=True)
+    watcher.sender = MagicMock()
+    offset = 0.0
+    for _ in range(count):
+        # Mostly bounces, sometimes long enough to leave the pulsetime window
+        offset += rng.choice([0.2, 0.5, 2.0, 30.0, 4000.0])
+        kwargs = {"timestamp": START + timedelta(seconds=offset), "clock": offset}
+        if rng.random() < 0.8:
+            watcher.handle_lid_event(rng.choice(["open", "closed"]), **kwargs)  # type: ignore[arg-type]
+        else:
+            watcher.handle_suspend_event(rng.choice(["suspended", "resumed"]), **kwargs)  # type: ignore[arg-type]
+    return [c.args[0] for c in watcher.sender.enqueue.call_args_list]
+
+
+def _trickle(sender: EventSender, events: list[Event]) -> None:
+    """Deliver events one at a time, as the worker does while they trickle in."""
+    for event in events:
+        sender.enqueue(event)
+        sender._spool_queued()
+        sender._deliver_spool()
+    sender._closing = True
+    sender._deliver_spool()
+
+
+def _bucket(server: FakeServer) -> list[tuple[datetime, float, dict]]:
+    return [
+        (event.timestamp, event.duration.total_seconds(), event.data)
+        for event in server.events["bucket"]
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_same_bucket_contents_as_server_merge(seed: int) -> None:
+    """Test that coalesced heartbeats leave the bucket exactly as aw-server's merge would."""
+    events = _watcher_events(seed)
+    plain, coalescing = FakeServer(), FakeServer()
+    plain_sender = EventSender(plain, "bucket")
+    coalescing_sender = EventSender(coalescing, "bucket", coalesce_interval=3600)
+
+    _trickle(plain_sender, events)
+    _trickle(coalescing_sender, events)
+
+    assert _bucket(coalescing) == _bucket(plain)
+    assert coalescing.requests["heartbeat"] < plain.requests["heartbeat"] == len(events)
+    assert coalescing_sender.coalescer.saved_ratio == pytest.approx(  # type: ignore[union-attr]
+        1 - coalescing.requests["heartbeat"] / len(events)
+    )
+    assert len(coalescing_sender.spool) == 0
+
+
+def test_state_change_flushes() -> None:
+    """Test that a heartbeat with other data hands back the held one."""
+    coalescer = Coalescer(pulsetime=60, interval=3600)
+    closed = {"lid_state": "closed"}
+
+    assert coalescer.add(1, Event(timestamp=START, duration=0, data=closed)) is None
+    assert coalescer.add(2, Event(timestamp=START, duration=5, data=closed)) is None
+    held = coalescer.add(3, Event(timestamp=START, duration=0, data={"lid_state": "open"}))
+
+    assert held is not None
+    first_seq, last_seq, event = held
+    assert (first_seq, last_seq) == (1, 2)
+    assert event.duration == timedelta(seconds=5)
+    assert coalescer.held_through == 3
+    assert coalescer.saved_ratio == pytest.approx(1 / 3)
+
+
+def test_held_heartbeat_sent_after_interval() -> None:
+    """Test that the worker sends a held heartbeat once the interval is over."""
+    server = FakeServer()
+    sender = EventSender(server, "bucket", coalesce_interval=0.1)
+    sender.start()
+
+    sender.enqueue(_watcher_events(seed=0, count=1)[0])
+    time.sleep(0.05)
+    assert server.requests["heartbeat"] == 0
+
+    deadline = time.monotonic() + 5
+    while not server.requests["heartbeat"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.requests["heartbeat"] == 1
+    assert sender.stop(timeout=5)
+
+
+def test_failed_send_keeps_held_events() -> None:
+    """Test that events held back are sent later if sending them fails."""
+    events = _watcher_events(seed=1, count=20)
+    buckets = []
+    for coalesce_interval in (0, 3600):
+        server = FakeServer()
+        client = MagicMock(wraps=server)
+        sender = EventSender(client, "bucket", coalesce_interval=coalesce_interval)
+
+        client.heartbeat.side_effect = ConnectionError("aw-server is down")
+        _trickle(sender, events)
+        assert len(sender.spool) == len(events)
+
+        client.heartbeat.side_effect = server.heartbeat
+        _trickle(sender, [])
+        assert len(sender.spool) == 0
+        buckets.append(_bucket(server))
+
+    assert buckets[0] == buckets[1]
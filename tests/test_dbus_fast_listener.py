@@ -0,0 +1,126 @@
+"""Tests for DbusFastListener."""
+
+import os
+import threading
+import time
+from collections.abc import Iterator
+from typing import Callable
+
+import pytest
+
+pytest.importorskip("dbus_fast")
+
+from dbus_fast import Message, MessageType, Variant  # noqa: E402
+
+from aw_watcher_lid.dbus_fast_listener import DbusFastListener  # noqa: E402
+from aw_watcher_lid.lid import LidWatcher  # noqa: E402
+
+
+def _signal(interface: str, member: str, signature: str, body: list) -> Message:
+    return Message(
+        message_type=MessageType.SIGNAL,
+        path="/org/freedesktop/login1",
+        interface=interface,
+        member=member,
+        signature=signature,
+        body=body,
+    )
+
+
+def test_properties_changed_message() -> None:
+    """Test that PropertiesChanged variants are unpacked into a lid event."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusFastListener(watcher)
+
+    listener._on_message(
+        _signal(
+            "org.freedesktop.DBus.Properties",
+            "PropertiesChanged",
+            "sa{sv}as",
+            ["org.freedesktop.login1.Manager", {"LidClosed": Variant("b", True)}, []],
+        )
+    )
+
+    assert watcher.current_lid_state == "closed"
+
+
+def test_prepare_for_sleep_message() -> None:
+    """Test that PrepareForSleep is routed to the suspend handling."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusFastListener(watcher)
+
+    listener._on_message(_signal("org.freedesktop.login1.Manager", "PrepareForSleep", "b", [True]))
+
+    assert watcher.current_suspend_state == "suspended"
+
+
+def test_other_messages_ignored() -> None:
+    """Test that signals from other objects don't create events."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusFastListener(watcher)
+
+    message = _signal("org.freedesktop.login1.Manager", "PrepareForSleep", "b", [True])
+    message.path = "/org/freedesktop/login1/session/self"
+    listener._on_message(message)
+
+    assert watcher.current_suspend_state is None
+
+
+@pytest.fixture
+def fake_logind() -> Iterator[object]:
+    """A fake logind on a private bus, used as the system bus."""
+    fake_logind_module = pytest.importorskip("benchmarks.fake_logind")
+    try:
+        private_bus = fake_logind_module.PrivateBus()
+    except FileNotFoundError:
+        pytest.skip("dbus-daemon not installed")
+
+    with private_bus as bus, fake_logind_module.FakeLogind(bus.address) as logind:
+        old_address = os.environ.get("DBUS_SYSTEM_BUS_ADDRESS")
+        os.environ["DBUS_SYSTEM_BUS_ADDRESS"] = bus.address
+        try:
+            yield logind
+        finally:
+            if old_address is None:
+                del os.environ["DBUS_SYSTEM_BUS_ADDRESS"]
+            else:
+                os.environ["DBUS_SYSTEM_BUS_ADDRESS"] = old_address
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_listener_against_fake_logind(fake_logind: object) -> None:
+    """Test signals, property reads and inhibitors over a real D-Bus connection."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusFastListener(watcher)
+    ready = threading.Event()
+    watcher.on_ready = ready.set
+    thread = threading.Thread(target=listener.start)
+    thread.start()
+    try:
+        assert ready.wait(10)
+        assert listener.lid_mode == "signal"
+        assert watcher.current_lid_state == "open"
+        assert set(listener._inhibitors) == {"sleep", "shutdown"}
+
+        fake_logind.set_lid_closed(True)  # type: ignore[attr-defined]
+        assert _wait_for(lambda: watcher.current_lid_state == "closed")
+
+        # The sleep inhibitor is released once the event is committed, and taken again on resume
+        fake_logind.prepare_for_sleep(True)  # type: ignore[attr-defined]
+        assert _wait_for(lambda: "sleep" not in listener._inhibitors)
+        assert watcher.current_suspend_state == "suspended"
+        fake_logind.prepare_for_sleep(False)  # type: ignore[attr-defined]
+        assert _wait_for(lambda: "sleep" in listener._inhibitors)
+    finally:
+        listener.stop()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert listener._inhibitors == {}
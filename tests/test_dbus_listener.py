@@ -0,0 +1,320 @@
+"""Tests for DbusListener."""
+
+import gc
+import os
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from aw_watcher_lid.dbus_listener import DbusListener, lid_closed_emits_changed
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.sender import EventSender
+from aw_watcher_lid.spool import Spool
+from aw_watcher_lid.state import LocalState
+
+INTROSPECTION_TEMPLATE = """
+<node>
+  <interface name="org.freedesktop.login1.Manager">
+    {interface_annotation}
+    <property name="LidClosed" type="b" access="read">
+      {property_annotation}
+    </property>
+  </interface>
+</node>
+"""
+
+
+def _introspection(interface_annotation: str = "", property_annotation: str = "") -> str:
+    return INTROSPECTION_TEMPLATE.format(
+        interface_annotation=interface_annotation, property_annotation=property_annotation
+    )
+
+
+def _emits(value: str) -> str:
+    return f'<annotation name="org.freedesktop.DBus.Property.EmitsChangedSignal" value="{value}"/>'
+
+
+@pytest.fixture
+def fake_dbus() -> Iterator[MagicMock]:
+    """Make the D-Bus libraries importable without dbus-python/PyGObject."""
+    dbus = MagicMock()
+    gi = MagicMock()
+    modules = {
+        "dbus": dbus,
+        "dbus.mainloop": dbus.mainloop,
+        "dbus.mainloop.glib": dbus.mainloop.glib,
+        "gi": gi,
+        "gi.repository": gi.repository,
+    }
+    with patch.dict(sys.modules, modules):
+        yield dbus
+
+
+def test_lid_closed_emits_changed_default() -> None:
+    """Test that a missing annotation means the signal is emitted."""
+    assert lid_closed_emits_changed(_introspection()) == "true"
+
+
+def test_lid_closed_emits_changed_property_false() -> None:
+    """Test that sd-bus style "false" annotations are detected."""
+    assert lid_closed_emits_changed(_introspection(property_annotation=_emits("false"))) == "false"
+
+
+def test_lid_closed_emits_changed_property_overrides_interface() -> None:
+    """Test that a property annotation wins over the interface annotation."""
+    xml = _introspection(
+        interface_annotation=_emits("false"), property_annotation=_emits("invalidates")
+    )
+    assert lid_closed_emits_changed(xml) == "invalidates"
+
+
+def test_lid_closed_emits_changed_missing_property() -> None:
+    """Test that a logind without LidClosed is reported as such."""
+    xml = '<node><interface name="org.freedesktop.login1.Manager"/></node>'
+    assert lid_closed_emits_changed(xml) is None
+
+
+@pytest.mark.parametrize(
+    ("annotation", "expected"),
+    [("", "signal"), (_emits("invalidates"), "signal"), (_emits("false"), "poll")],
+)
+def test_detect_lid_mode(fake_dbus: MagicMock, annotation: str, expected: str) -> None:
+    """Test that the polling fallback is only chosen when the signal won't arrive."""
+    listener = DbusListener(LidWatcher(testing=True))
+    listener.bus = MagicMock()
+    listener.bus.call_blocking.return_value = _introspection(property_annotation=annotation)
+
+    assert listener._detect_lid_mode() == expected
+
+
+def test_properties_changed_lid_closed(fake_dbus: MagicMock) -> None:
+    """Test that a LidClosed change is turned into a lid event."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusListener(watcher)
+
+    listener._on_properties_changed("org.freedesktop.login1.Manager", {"LidClosed": True}, [])
+    assert watcher.current_lid_state == "closed"
+
+    # Repeated value is not a new event
+    start = watcher.current_event_start
+    listener._on_properties_changed("org.freedesktop.login1.Manager", {"LidClosed": True}, [])
+    assert watcher.current_event_start == start
+
+    listener._on_properties_changed("org.freedesktop.login1.Manager", {"LidClosed": False}, [])
+    assert watcher.current_lid_state == "open"
+
+
+def test_properties_changed_other_interface(fake_dbus: MagicMock) -> None:
+    """Test that changes on other interfaces are ignored."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusListener(watcher)
+
+    listener._on_properties_changed("org.example.Other", {"LidClosed": True}, [])
+    assert watcher.current_lid_state is None
+
+
+def _inhibiting_bus() -> tuple[MagicMock, list[int]]:
+    """Fake system bus handing out real pipe fds as inhibitor locks."""
+    handed_out: list[int] = []
+
+    def call_blocking(*args: object) -> MagicMock:
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        handed_out.append(read_fd)
+        fd = MagicMock()
+        fd.take.return_value = read_fd
+        return fd
+
+    bus = MagicMock()
+    bus.call_blocking.side_effect = call_blocking
+    return bus, handed_out
+
+
+def _is_open(fd: int) -> bool:
+    try:
+        os.fstat(fd)
+    except OSError:
+        return False
+    return True
+
+
+def test_sleep_inhibitor_released_after_commit(fake_dbus: MagicMock) -> None:
+    """Test that the delay inhibitor is released once the suspend event is committed."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusListener(watcher)
+    listener.bus, handed_out = _inhibiting_bus()
+
+    listener._take_inhibitor("sleep")
+    assert _is_open(handed_out[0])
+
+    listener._on_prepare_for_sleep(True)
+    assert watcher.current_suspend_state == "suspended"
+    assert not _is_open(handed_out[0])
+    assert len(listener.inhibitor_hold_times) == 1
+
+    # Taken again on resume
+    with patch.object(listener, "_check_lid_state"):
+        listener._on_prepare_for_sleep(False)
+    assert len(handed_out) == 2
+    assert listener._inhibitors == {"sleep": handed_out[1]}
+    listener.stop()
+
+
+def test_sleep_inhibitor_waits_for_spool(fake_dbus: MagicMock, tmp_path: Path) -> None:
+    """Test that the inhibitor is held until the sender has spooled the event."""
+    watcher = LidWatcher(testing=True)
+    watcher.sender = EventSender(MagicMock(), "bucket", spool=Spool(tmp_path))
+    listener = DbusListener(watcher)
+    listener.bus, handed_out = _inhibiting_bus()
+    listener._take_inhibitor("sleep")
+
+    listener._on_prepare_for_sleep(True)
+    assert _is_open(handed_out[0])
+
+    watcher.sender.start()
+    watcher.sender.stop(timeout=5)
+    assert not _is_open(handed_out[0])
+
+
+def test_shutdown_inhibitor_released_after_commit(fake_dbus: MagicMock, tmp_path: Path) -> None:
+    """Test that a shutdown is recorded before the shutdown inhibitor is released."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    listener = DbusListener(watcher)
+    listener.bus, handed_out = _inhibiting_bus()
+    listener._take_inhibitor("shutdown")
+
+    listener._on_prepare_for_shutdown(True)
+
+    assert "shutdown" in watcher.state.load()
+    assert not _is_open(handed_out[0])
+    assert listener._inhibitors == {}
+
+
+def test_shutdown_cancelled(fake_dbus: MagicMock, tmp_path: Path) -> None:
+    """Test that a cancelled shutdown drops the shutdown record and retakes the inhibitor."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    listener = DbusListener(watcher)
+    listener.bus, handed_out = _inhibiting_bus()
+    listener._take_inhibitor("shutdown")
+    watcher.handle_lid_event("open")
+
+    listener._on_prepare_for_shutdown(True)
+    with patch.object(listener, "_check_lid_state"):
+        listener._on_prepare_for_shutdown(False)
+
+    assert "shutdown" not in watcher.state.load()
+    assert watcher.current_lid_state == "open"
+    assert _is_open(handed_out[-1])
+
+
+def test_zero_wakeup_idle_disables_lid_polling(fake_dbus: MagicMock) -> None:
+    """Test that no poll timer is set up in zero wake-up mode, even if logind won't signal."""
+    watcher = LidWatcher(testing=True)
+    watcher.config = {**watcher.config, "zero_wakeup_idle": True}
+    listener = DbusListener(watcher)
+    listener.use_inhibitors = False
+
+    with patch.object(listener, "_detect_lid_mode", return_value="poll"):
+        listener.start()
+
+    assert listener.lid_mode == "poll"
+    listener.GLib.timeout_add.assert_not_called()
+    listener.loop.run.assert_called_once()  # type: ignore[union-attr]
+
+
+class _LidClosedBus:
+    """System bus answering every call with the lid state, keeping nothing per call."""
+
+    def __init__(self) -> None:
+        self.lid_closed = False
+        self.calls = 0
+
+    def call_blocking(
+        self, bus_name: str, path: str, interface: str, method: str, signature: str, args: tuple
+    ) -> bool:
+        self.calls += 1
+        return self.lid_closed
+
+
+def _rss_kib() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def test_lid_check_reuses_bound_call(fake_dbus: MagicMock) -> None:
+    """Test that the LidClosed read is built once and rebuilt when logind's owner changes."""
+    listener = DbusListener(LidWatcher(testing=True))
+    listener.bus = _LidClosedBus()
+    listener._check_lid_state()
+    reader = listener._lid_closed_reader()
+    listener._check_lid_state()
+    assert listener._lid_closed_reader() is reader
+    assert reader.args[:5] == (
+        "org.freedesktop.login1",
+        "/org/freedesktop/login1",
+        "org.freedesktop.DBus.Properties",
+        "Get",
+        "ss",
+    )
+
+    listener._on_logind_owner_changed(":1.42")
+    assert listener._lid_closed_reader().args[0] == ":1.42"
+
+    listener._on_disconnected(listener.bus)
+    listener._check_lid_state()
+    assert listener.bus is None
+
+
+def test_lid_check_soak(fake_dbus: MagicMock) -> None:
+    """Test that a million lid checks leave memory and the object count flat."""
+    watcher = LidWatcher(testing=True)
+    listener = DbusListener(watcher)
+    bus = listener.bus = _LidClosedBus()
+
+    def checks(count: int) -> None:
+        for i in range(count):
+            if i % 100_000 == 0:
+                bus.lid_closed = not bus.lid_closed
+            listener._check_lid_state()
+
+    # Warm up: the bound call, the first events
+    checks(100_000)
+    gc.collect()
+    objects, blocks, rss = len(gc.get_objects()), sys.getallocatedblocks(), _rss_kib()
+
+    checks(1_000_000)
+    gc.collect()
+
+    assert bus.calls == 1_100_000
+    assert watcher.current_lid_state == "closed"
+    assert len(gc.get_objects()) - objects < 50
+    assert sys.getallocatedblocks() - blocks < 200
+    assert _rss_kib() - rss < 1024
+
+
+def test_reload_reschedules_lid_polling(fake_dbus: MagicMock) -> None:
+    """Test that a new lid_poll_interval replaces the polling timer on the main loop."""
+    listener = DbusListener(LidWatcher(testing=True))
+    listener.lid_poll_interval = 5.0
+    listener.lid_mode = "poll"
+    glib = listener.GLib
+    glib.timeout_add.return_value = 7
+    listener._restart_lid_poll()
+    glib.timeout_add.assert_called_once_with(5000, listener._periodic_lid_check)
+
+    listener.apply_config({"lid_poll_interval": 1.0})
+    (restart,) = glib.idle_add.call_args.args
+    assert restart() is False
+    glib.source_remove.assert_called_once_with(7)
+    assert glib.timeout_add.call_args.args == (1000, listener._periodic_lid_check)
+
+    # zero_wakeup_idle turns polling off
+    listener.apply_config({"lid_poll_interval": 1.0, "zero_wakeup_idle": True})
+    glib.idle_add.call_args.args[0]()
+    assert listener._poll_source is None
+    assert glib.timeout_add.call_count == 2
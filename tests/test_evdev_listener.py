@@ -0,0 +1,107 @@
+"""Tests for EvdevListener."""
+
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from aw_watcher_lid.evdev_listener import (
+    EV_SW,
+    EV_SYN,
+    INPUT_EVENT,
+    SW_LID,
+    EvdevListener,
+    find_lid_switch,
+)
+from aw_watcher_lid.lid import LidWatcher
+
+
+def _lid_event(sec: int, usec: int, closed: bool) -> bytes:
+    return INPUT_EVENT.pack(sec, usec, EV_SW, SW_LID, int(closed)) + INPUT_EVENT.pack(
+        sec, usec, EV_SYN, 0, 0
+    )
+
+
+def test_find_lid_switch(tmp_path: Path) -> None:
+    """Test that the lid switch is found by its device name."""
+    for name, device in (("event0", "AT Translated Set 2 keyboard"), ("event3", "Lid Switch")):
+        (tmp_path / name / "device").mkdir(parents=True)
+        (tmp_path / name / "device" / "name").write_text(device + "\n")
+
+    assert find_lid_switch(str(tmp_path), "/dev/input") == "/dev/input/event3"
+
+
+def test_find_lid_switch_missing(tmp_path: Path) -> None:
+    """Test that a missing lid switch is reported."""
+    with pytest.raises(FileNotFoundError):
+        find_lid_switch(str(tmp_path))
+
+
+def test_lid_events_from_fake_device(tmp_path: Path) -> None:
+    """Test reading lid events with kernel timestamps from a FIFO stand-in."""
+    fifo = tmp_path / "event0"
+    os.mkfifo(fifo)
+
+    watcher = LidWatcher(testing=True)
+    seen: list[tuple[str, datetime | None]] = []
+    done = threading.Event()
+    original = watcher.handle_lid_event
+
+    def record(
+        lid_state: str, timestamp: datetime | None = None, clock: float | None = None
+    ) -> None:
+        seen.append((lid_state, timestamp))
+        original(lid_state, timestamp=timestamp, clock=clock)
+        if len(seen) == 2:
+            done.set()
+
+    watcher.handle_lid_event = record  # type: ignore[method-assign]
+
+    listener = EvdevListener(watcher, device_path=str(fifo))
+    thread = threading.Thread(target=listener.start, daemon=True)
+    thread.start()
+
+    with open(fifo, "wb") as device:
+        device.write(_lid_event(1_700_000_000, 250_000, closed=True))
+        device.write(_lid_event(1_700_000_060, 0, closed=False))
+        # Repeated state is not a new event
+        device.write(_lid_event(1_700_000_061, 0, closed=False))
+        device.flush()
+        assert done.wait(timeout=5)
+
+        listener.stop()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert seen == [
+        ("closed", datetime(2023, 11, 14, 22, 13, 20, 250_000, tzinfo=timezone.utc)),
+        ("open", datetime(2023, 11, 14, 22, 14, 20, tzinfo=timezone.utc)),
+    ]
+    assert watcher.current_event_start == seen[1][1]
+    assert listener.fd is None and listener._wakeup.closed
+
+
+def test_missing_device_closes_wakeup_pipe(tmp_path: Path) -> None:
+    """Test that a listener that can't open its device leaves no descriptors open."""
+    open_fds = len(os.listdir("/proc/self/fd"))
+    listener = EvdevListener(LidWatcher(testing=True), device_path=str(tmp_path / "missing"))
+
+    with pytest.raises(FileNotFoundError):
+        listener.start()
+    listener.stop()
+
+    assert len(os.listdir("/proc/self/fd")) == open_fds
+
+
+def test_boot_clock_timestamps() -> None:
+    """Test that boot clock event timestamps are passed on as such."""
+    watcher = LidWatcher(testing=True)
+    listener = EvdevListener(watcher, device_path="/dev/null")
+    listener._boottime_stamps = True
+
+    listener._report_event("closed", 1234.5)
+
+    assert watcher.current_lid_state == "closed"
+    assert watcher.current_event_clock == 1234.5
@@ -0,0 +1,181 @@
+"""Tests for FusionListener."""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+from unittest.mock import MagicMock, patch
+
+from aw_watcher_lid.clock import wall_time
+from aw_watcher_lid.evdev_listener import EV_SW, EV_SYN, INPUT_EVENT, SW_LID
+from aw_watcher_lid.fusion import FusionListener
+from aw_watcher_lid.lid import LidWatcher
+
+
+def _fusion() -> tuple[LidWatcher, FusionListener, list[tuple[str, float]]]:
+    """A fusion listener whose watcher records the changes it gets."""
+    watcher = LidWatcher(testing=True)
+    fusion = FusionListener(watcher, ["evdev", "dbus", "journal"], window=5.0)
+    changes: list[tuple[str, float]] = []
+    handle_lid, handle_suspend = watcher.handle_lid_event, watcher.handle_suspend_event
+
+    def lid(lid_state: str, **kwargs) -> None:  # type: ignore[no-untyped-def]
+        changes.append((lid_state, kwargs["clock"]))
+        handle_lid(lid_state, **kwargs)
+
+    def suspend(suspend_state: str, **kwargs) -> None:  # type: ignore[no-untyped-def]
+        changes.append((suspend_state, kwargs["clock"]))
+        handle_suspend(suspend_state, **kwargs)
+
+    watcher.handle_lid_event = lid  # type: ignore[assignment]
+    watcher.handle_suspend_event = suspend  # type: ignore[assignment]
+    return watcher, fusion, changes
+
+
+def test_first_source_wins() -> None:
+    """Test that a change reported by two sources is passed on once, from the first."""
+    watcher, fusion, changes = _fusion()
+    fusion.source("evdev").handle_lid_event("closed", clock=100.0)
+    fusion.source("journal").handle_lid_event("closed", timestamp=wall_time(100.2))
+    fusion.dispatch_pending()
+
+    assert changes == [("closed", 100.0)]
+    stats = watcher.metrics.snapshot()
+    assert stats["fusion_events_total"] == {"source=evdev": 1}
+    assert stats["fusion_dropped_total"] == {"reason=duplicate,source=journal": 1}
+    assert stats["fusion_lag_seconds"]["source=journal"]["count"] == 1
+
+
+def test_lagging_source_replays_flapping_lid() -> None:
+    """Test that a slow source's reports of quick changes are all recognised as duplicates."""
+    _watcher, fusion, changes = _fusion()
+    evdev, journal = fusion.source("evdev"), fusion.source("journal")
+    for clock, state in ((100.0, "closed"), (101.0, "open"), (102.0, "closed")):
+        evdev.handle_lid_event(state, clock=clock)
+    fusion.dispatch_pending()
+    for clock, state in ((100.1, "closed"), (101.1, "open"), (102.1, "closed")):
+        journal.handle_lid_event(state, clock=clock)
+    fusion.dispatch_pending()
+
+    assert changes == [("closed", 100.0), ("open", 101.0), ("closed", 102.0)]
+
+
+def test_report_older_than_last_change_dropped() -> None:
+    """Test that a report that can't be applied in order any more is dropped."""
+    watcher, fusion, changes = _fusion()
+    fusion.source("evdev").handle_lid_event("closed", clock=100.0)
+    fusion.source("dbus").handle_suspend_event("suspended", clock=100.5)
+    fusion.source("journal").handle_lid_event("open", clock=99.0)
+    fusion.dispatch_pending()
+
+    assert changes == [("closed", 100.0), ("suspended", 100.5)]
+    assert watcher.metrics.snapshot()["fusion_dropped_total"] == {"reason=late,source=journal": 1}
+
+
+def test_state_check_after_resume_is_a_change() -> None:
+    """Test that the lid state read after a resume is passed on, though reported before."""
+    _watcher, fusion, changes = _fusion()
+    fusion.source("evdev").handle_lid_event("open", clock=200.0)
+    fusion.source("dbus").handle_suspend_event("resumed", clock=200.5)
+    fusion.source("dbus").handle_lid_event("open", clock=200.6)
+    fusion.dispatch_pending()
+
+    assert changes == [("open", 200.0), ("resumed", 200.5), ("open", 200.6)]
+
+
+def test_dropped_duplicate_commits() -> None:
+    """Test that the commit callback of a dropped duplicate still runs (releasing inhibitors)."""
+    _watcher, fusion, changes = _fusion()
+    committed = []
+    fusion.source("journal").handle_suspend_event("suspended", clock=100.0)
+    fusion.source("dbus").handle_suspend_event(
+        "suspended", on_committed=lambda: committed.append(True), clock=100.01
+    )
+    fusion.dispatch_pending()
+
+    assert changes == [("suspended", 100.0)]
+    assert committed == [True]
+
+
+def test_shutdown_cancelled_after_shutdown() -> None:
+    """Test that a cancelled shutdown is passed on after the shutdown, and only once."""
+    watcher, fusion, _changes = _fusion()
+    watcher.handle_shutdown_event = MagicMock()  # type: ignore[method-assign]
+    watcher.handle_shutdown_cancelled = MagicMock()  # type: ignore[method-assign]
+    dbus, journal = fusion.source("dbus"), fusion.source("journal")
+    dbus.handle_shutdown_event(clock=100.0)
+    dbus.handle_shutdown_cancelled(clock=110.0)
+    journal.handle_shutdown_cancelled(clock=110.1)
+    fusion.dispatch_pending()
+
+    watcher.handle_shutdown_event.assert_called_once()
+    watcher.handle_shutdown_cancelled.assert_called_once()
+    assert watcher.handle_shutdown_cancelled.call_args.kwargs["clock"] == 110.0
+
+
+def _journal_entry(message: str, when: datetime) -> str:
+    return json.dumps(
+        {
+            "__CURSOR": f"s={when.timestamp()}",
+            "__REALTIME_TIMESTAMP": str(int(when.timestamp() * 1_000_000)),
+            "_SYSTEMD_UNIT": "systemd-logind.service",
+            "MESSAGE": message,
+        }
+    )
+
+
+def _lid_event(when: datetime, closed: bool) -> bytes:
+    sec, usec = divmod(int(when.timestamp() * 1_000_000), 1_000_000)
+    return INPUT_EVENT.pack(sec, usec, EV_SW, SW_LID, int(closed)) + INPUT_EVENT.pack(
+        sec, usec, EV_SYN, 0, 0
+    )
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_evdev_and_journal_together(tmp_path: Path) -> None:
+    """Test running the evdev and journal listeners at once on one watcher."""
+    fifo = tmp_path / "event0"
+    os.mkfifo(fifo)
+    journal_r, journal_w = os.pipe()
+    process = MagicMock()
+    process.stdout = os.fdopen(journal_r, "r")
+
+    watcher, _fusion_listener, changes = _fusion()
+    watcher.config["evdev_device"] = str(fifo)
+    fusion = FusionListener(watcher, ["evdev", "journal"])
+    ready = threading.Event()
+    watcher.on_ready = ready.set
+
+    with (
+        patch.dict("sys.modules", {"systemd": None}),
+        patch("subprocess.Popen", return_value=process),
+    ):
+        thread = threading.Thread(target=fusion.start, daemon=True)
+        thread.start()
+        assert ready.wait(timeout=5)
+
+        closed_at = datetime.now(timezone.utc).replace(microsecond=0)
+        with open(fifo, "wb") as device, os.fdopen(journal_w, "w") as journal:
+            device.write(_lid_event(closed_at, closed=True))
+            device.flush()
+            _wait_for(lambda: len(changes) == 1)
+            journal.write(_journal_entry("Lid closed.", closed_at) + "\n")
+            journal.flush()
+            _wait_for(lambda: bool(watcher.metrics.snapshot()["fusion_dropped_total"]))
+
+        fusion.stop()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert [state for state, _clock in changes] == ["closed"]
+    assert watcher.current_event_start == closed_at
+    assert watcher.metrics.snapshot()["fusion_events_total"] == {"source=evdev": 1}
@@ -0,0 +1,125 @@
+"""Tests against the local HTTP aw-server stand-in."""
+
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+import requests
+
+from aw_watcher_lid.boot_detector import BootDetector
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.sender import EventSender
+from aw_watcher_lid.spool import Spool
+from benchmarks.http_server import HttpAwServer
+from benchmarks.send_path import BUCKET_ID, lid_events, run
+
+
+@pytest.fixture
+def server() -> Iterator[HttpAwServer]:
+    with HttpAwServer() as server:
+        yield server
+
+
+def _wait_until_sent(sender: EventSender, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while sender.pending and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert sender.pending == 0
+
+
+def test_client_round_trip(server: HttpAwServer) -> None:
+    """Test that ActivityWatchClient works against the stand-in."""
+    client = server.client()
+    first, second, third = lid_events(3)
+    client.create_bucket(BUCKET_ID, "systemafkstatus")
+    client.heartbeat(BUCKET_ID, first, pulsetime=60)
+    client.insert_events(BUCKET_ID, [second, third])
+
+    assert BUCKET_ID in client.get_buckets()
+    events = client.get_events(BUCKET_ID)
+    assert [event.timestamp for event in events] == [e.timestamp for e in (third, second, first)]
+    assert client.get_events(BUCKET_ID, limit=1)[0].timestamp == third.timestamp
+
+    query = f'events = query_bucket("{BUCKET_ID}");\nRETURN = sort_by_timestamp(events);'
+    (result,) = client.query(query, [(second.timestamp, third.timestamp)])
+    assert len(result) == 2
+
+    assert server.requests_by_endpoint()["heartbeat"] == 1
+
+
+def test_injected_errors_and_downtime(server: HttpAwServer) -> None:
+    """Test that errors and downtime reach the client like a real outage."""
+    client = server.client()
+
+    server.fail_next(status=503)
+    with pytest.raises(requests.HTTPError):
+        client.get_buckets()
+
+    server.down()
+    with pytest.raises(requests.ConnectionError):
+        client.get_buckets()
+    server.up()
+
+    assert client.get_buckets() == {}
+    assert [request.status for request in server.requests] == [503, 200]
+
+
+def test_requests_per_event(server: HttpAwServer, tmp_path: Path) -> None:
+    """Test the request count of the send path (trickle and backlog)."""
+    sender = EventSender(
+        server.client(), BUCKET_ID, spool=Spool(tmp_path / "spool"), retry_interval=0.05
+    )
+    sender.start()
+    events = lid_events(1005)
+
+    # Events trickling in: one heartbeat each, plus creating the bucket once
+    for event in events[:5]:
+        sender.enqueue(event)
+        _wait_until_sent(sender)
+    assert sum(server.requests_by_endpoint().values()) == 6
+
+    # A backlog built up while aw-server was down goes out in batches
+    server.down()
+    for event in events[5:]:
+        sender.enqueue(event)
+    time.sleep(0.2)
+    server.up()
+    _wait_until_sent(sender)
+    sender.stop()
+
+    assert server.requests_by_endpoint()["insert_events"] == 2
+    assert len(server.store.events[BUCKET_ID]) == 1005
+
+
+def test_boot_probe_single_query(server: HttpAwServer) -> None:
+    """Test that the boot gap activity probe costs one request with the query API."""
+    client = server.client()
+    start = datetime(2025, 1, 15, 8, 0, tzinfo=timezone.utc)
+    for bucket_id in ("aw-watcher-window_host", "aw-watcher-afk_host"):
+        client.create_bucket(bucket_id, "test")
+        client.insert_events(bucket_id, lid_events(100))
+    server.requests.clear()
+
+    watcher = LidWatcher(testing=True)
+    watcher.testing = False
+    watcher.client = client
+    watcher.config["boot_probe_buckets"] = ["aw-watcher-window_host", "aw-watcher-afk_host"]
+    detector = BootDetector(watcher)
+
+    gap_start = start + timedelta(minutes=30, seconds=10)
+    first = detector._get_first_activity_after(gap_start, start + timedelta(hours=3))
+
+    # The event from 08:30 to 08:30:59 overlaps the gap
+    assert first == start + timedelta(minutes=30)
+    assert server.requests_by_endpoint() == {"query": 1}
+
+
+@pytest.mark.parametrize("scenario", ["burst", "spool-replay"])
+def test_backlog_same_bucket_contents(scenario: str) -> None:
+    """Test that a backlog sent in batches leaves the bucket as heartbeats would."""
+    report = run(scenario, events=300)
+
+    assert report["same_bucket_contents"]
+    assert report["requests_by_endpoint"]["insert_events"] >= 1
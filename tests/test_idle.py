@@ -0,0 +1,83 @@
+"""Tests that an idle watcher doesn't wake up."""
+
+import os
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+from aw_watcher_lid.evdev_listener import EV_SW, INPUT_EVENT, SW_LID
+from benchmarks.http_server import HttpAwServer
+from benchmarks.startup import isolated_env, start_once
+
+pytestmark = pytest.mark.skipif(
+    not Path("/proc/self/task").is_dir(), reason="needs /proc to count context switches"
+)
+
+# How long the watcher must stay asleep
+IDLE_WINDOW = 2.0
+
+
+def context_switches(pid: int) -> int:
+    """Count the context switches of all threads of a process so far."""
+    total = 0
+    for status in Path(f"/proc/{pid}/task").glob("*/status"):
+        try:
+            lines = status.read_text().splitlines()
+        except OSError:
+            # Thread exited
+            continue
+        for line in lines:
+            if line.startswith(("voluntary_ctxt_switches:", "nonvoluntary_ctxt_switches:")):
+                total += int(line.split()[1])
+    return total
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_idle_watcher_does_not_wake_up(tmp_path: Path) -> None:
+    """Test that the running watcher (listener, sender, exporters) blocks until an event."""
+    fifo = tmp_path / "lid-switch"
+    env = isolated_env(
+        tmp_path,
+        f'listener = "evdev"\nevdev_device = "{fifo}"\nzero_wakeup_idle = true\n'
+        f"metrics_port = {free_port()}\nstats_file_interval = 1.0\n",
+    )
+
+    with HttpAwServer() as server:
+        client_config = tmp_path / "config" / "activitywatch" / "aw-client"
+        client_config.mkdir(parents=True)
+        (client_config / "aw-client.toml").write_text(
+            f'[server]\nhostname = "127.0.0.1"\nport = "{server.port}"\n'
+        )
+        os.mkfifo(fifo)
+
+        wakeups: list[int] = []
+        writers: list[int] = []
+
+        def count_wakeups(pid: int) -> None:
+            # A lid event, so the sender has been busy before going idle. The
+            # FIFO stays open until the watcher exited: EOF would stop it
+            writers.append(os.open(fifo, os.O_WRONLY))
+            now = time.time()
+            os.write(writers[0], INPUT_EVENT.pack(int(now), int(now % 1 * 1e6), EV_SW, SW_LID, 1))
+            # Let startup and the event delivery finish
+            time.sleep(1.0)
+            before = context_switches(pid)
+            time.sleep(IDLE_WINDOW)
+            wakeups.append(context_switches(pid) - before)
+
+        try:
+            start_once(env, on_ready=count_wakeups, testing=False)
+        finally:
+            for writer in writers:
+                os.close(writer)
+
+    assert wakeups == [0]
+    assert (tmp_path / "data" / "activitywatch" / "aw-watcher-lid" / "stats.json").exists()
+    assert server.requests_by_endpoint()["heartbeat"] >= 1
@@ -0,0 +1,66 @@
+"""Tests for JournalClassifier."""
+
+import uuid
+
+import pytest
+
+from aw_watcher_lid.journal_classifier import (
+    LID_CLOSED,
+    RESUMED,
+    SUSPENDED,
+    JournalClassifier,
+)
+
+
+def _entry(message: str, identifier: str = "systemd-logind", **fields: object) -> dict:
+    return {"SYSLOG_IDENTIFIER": identifier, "MESSAGE": message, **fields}
+
+
+@pytest.mark.parametrize(
+    ("entry", "expected"),
+    [
+        (_entry("Lid closed."), LID_CLOSED),
+        (_entry("Entering sleep state 'suspend'...", "systemd-sleep"), SUSPENDED),
+        (_entry("System returned from sleep state.", "systemd-sleep"), RESUMED),
+        # Mentioning suspend is not a suspend
+        (_entry("The system will suspend now!"), None),
+        (_entry("Suspend key pressed."), None),
+        # Only whole messages from logind/sleep count
+        (_entry("Lid closed while docked, ignoring."), None),
+        (_entry("Lid closed.", "gnome-shell"), None),
+        (_entry("PM: suspend entry (deep)", "kernel"), None),
+        # Mentions both, is neither
+        (_entry("Failed to suspend, system resumed", "systemd-sleep"), None),
+    ],
+)
+def test_classify_message(entry: dict, expected: str) -> None:
+    """Test that only real lid/suspend messages are classified as events."""
+    assert JournalClassifier().classify(entry) == expected
+
+
+def test_classify_message_id() -> None:
+    """Test that catalog message IDs are recognized, also as UUIDs (sd-journal reader)."""
+    classifier = JournalClassifier()
+    sleep_start = "6bbd95ee977941e497c48be27c254128"
+
+    entry = _entry("Performing sleep operation 'suspend'...", "systemd-sleep")
+    assert classifier.classify({**entry, "MESSAGE_ID": sleep_start}) == SUSPENDED
+    assert classifier.classify({"MESSAGE_ID": uuid.UUID(sleep_start), "MESSAGE": ""}) == SUSPENDED
+
+
+def test_configured_rules() -> None:
+    """Test that configured rules replace the defaults."""
+    classifier = JournalClassifier(
+        {"identifiers": ["acpid"], "patterns": {"lid_closed": r"button/lid LID close"}}
+    )
+
+    assert classifier.classify(_entry("button/lid LID close", "acpid")) == LID_CLOSED
+    assert classifier.classify(_entry("Lid closed.")) is None
+
+
+def test_invalid_rules() -> None:
+    """Test that invalid rules are rejected."""
+    with pytest.raises(ValueError):
+        JournalClassifier({"patterns": {"lid_exploded": "x"}})
+    with pytest.raises(ValueError):
+        JournalClassifier({"patterns": {"lid_closed": "("}})
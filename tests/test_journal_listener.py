@@ -0,0 +1,100 @@
+"""Tests for JournalListener."""
+
+import io
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from aw_watcher_lid.journal_listener import JournalListener
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.state import LocalState
+
+
+def _entry(cursor: str, message: str, usec: int, unit: str = "systemd-logind.service") -> str:
+    return json.dumps(
+        {
+            "__CURSOR": cursor,
+            "__REALTIME_TIMESTAMP": str(usec),
+            "_SYSTEMD_UNIT": unit,
+            "MESSAGE": message,
+        }
+    )
+
+
+def test_stream_entries_handled_with_source_time(tmp_path: Path) -> None:
+    """Test that streamed entries are handled with their journal timestamps."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    listener = JournalListener(watcher)
+    listener.running = True
+
+    stream = io.StringIO(
+        "\n".join(
+            [
+                _entry("s=1", "Lid closed.", 1_736_949_600_000_000),
+                "not json",
+                _entry("s=2", "Lid opened.", 1_736_949_660_000_000),
+            ]
+        )
+        + "\n"
+    )
+    listener._read_stream(stream)
+
+    assert watcher.current_lid_state == "open"
+    assert watcher.current_event_start == datetime(2025, 1, 15, 14, 1, tzinfo=timezone.utc)
+    assert watcher.state.load()["journal_cursor"] == "s=2"
+
+
+def test_entry_without_timestamp_handled_now() -> None:
+    """Test that an entry without __REALTIME_TIMESTAMP is handled with the current time."""
+    watcher = LidWatcher(testing=True)
+    listener = JournalListener(watcher)
+    listener.running = True
+    before = datetime.now(timezone.utc)
+
+    listener._handle_entry({"_SYSTEMD_UNIT": "systemd-logind.service", "MESSAGE": "Lid closed."})
+
+    assert watcher.current_lid_state == "closed"
+    assert watcher.current_event_start is not None
+    assert watcher.current_event_start >= before
+
+
+def test_journalctl_resumes_after_cursor(tmp_path: Path) -> None:
+    """Test that a restart continues after the saved cursor."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher.state.update(journal_cursor="s=42")
+    listener = JournalListener(watcher)
+
+    process = MagicMock()
+    process.stdout = io.StringIO(_entry("s=43", "Lid closed.", 1_736_949_600_000_000) + "\n")
+    with (
+        patch.dict("sys.modules", {"systemd": None}),
+        patch("subprocess.Popen", return_value=process) as popen,
+    ):
+        listener.start()
+
+    cmd = popen.call_args.args[0]
+    assert cmd[cmd.index("--after-cursor") + 1] == "s=42"
+    assert "--follow" in cmd
+    assert watcher.current_lid_state == "closed"
+    assert watcher.state.load()["journal_cursor"] == "s=43"
+
+
+def test_journalctl_starts_at_tail_without_cursor() -> None:
+    """Test that the first run doesn't replay old journal entries."""
+    listener = JournalListener(LidWatcher(testing=True))
+
+    process = MagicMock()
+    process.stdout = io.StringIO("")
+    with (
+        patch.dict("sys.modules", {"systemd": None}),
+        patch("subprocess.Popen", return_value=process) as popen,
+    ):
+        listener.start()
+
+    cmd = popen.call_args.args[0]
+    assert "--lines=0" in cmd
+    assert "--after-cursor" not in cmd
+    assert listener._wakeup.closed
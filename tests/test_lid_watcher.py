@@ -1,6 +1,11 @@
 """Tests for LidWatcher."""
 
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import MagicMock
+
 from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.state import LocalState
 
 
 def test_lid_watcher_init() -> None:
@@ -63,9 +68,91 @@ def test_handle_resume() -> None:
     assert watcher.current_suspend_state == "resumed"
 
 
+def test_resume_warms_connection() -> None:
+    """Test that a resume has the sender renew its connection to aw-server."""
+    watcher = LidWatcher(testing=True)
+    watcher.sender = MagicMock()
+
+    watcher.handle_suspend_event("suspended")
+    watcher.sender.warm.assert_not_called()
+    watcher.handle_suspend_event("resumed")
+
+    watcher.sender.warm.assert_called_once()
+
+
 def test_stop_idempotent() -> None:
     """Test that calling stop() twice does not raise."""
     watcher = LidWatcher(testing=True)
     watcher.handle_lid_event("closed")
     watcher.stop()
     watcher.stop()  # should not raise
+
+
+def test_handle_shutdown(tmp_path: Path) -> None:
+    """Test that a shutdown closes the open event and records a marker."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher._send_event = MagicMock()  # type: ignore[method-assign]
+    committed = MagicMock()
+
+    watcher.handle_lid_event("open")
+    watcher.handle_shutdown_event(on_committed=committed)
+
+    assert watcher.current_event_start is None
+    assert watcher._send_event.call_args_list[0].kwargs["lid_state"] == "open"
+    marker = watcher._send_event.call_args_list[1].kwargs
+    assert marker["event_source"] == "shutdown"
+    assert marker["on_committed"] is committed
+    assert watcher.state.load()["shutdown"]["time"] == marker["timestamp"].isoformat()
+
+
+def test_handle_shutdown_cancelled(tmp_path: Path) -> None:
+    """Test that a cancelled shutdown drops the record and restores the lid state."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+    watcher._send_event = MagicMock()  # type: ignore[method-assign]
+
+    watcher.handle_lid_event("closed")
+    watcher.handle_shutdown_event()
+    watcher._send_event.reset_mock()
+    watcher.handle_shutdown_cancelled()
+
+    state = watcher.state.load()
+    assert "shutdown" not in state
+    assert state["last_event"]["lid_state"] == "closed"
+    assert watcher.current_lid_state == "closed"
+    # The closed lid is reported again after the "shutdown" marker
+    marker = watcher._send_event.call_args.kwargs
+    assert marker["lid_state"] == "closed"
+    assert marker["timestamp"] == watcher.current_event_start
+
+
+def test_local_state_tracks_last_event(tmp_path: Path) -> None:
+    """Test that the local state file follows the lid state and last event end."""
+    watcher = LidWatcher(testing=True)
+    watcher.state = LocalState(tmp_path / "state.json")
+
+    watcher.handle_lid_event("open")
+    opened = watcher.current_event_start
+    watcher.handle_lid_event("closed")
+
+    last_event = LocalState(tmp_path / "state.json").load()["last_event"]
+    assert last_event["lid_state"] == "closed"
+    assert last_event["boot_id"] == watcher.boot_id
+    assert last_event["end"] == watcher.current_event_start.isoformat()
+    assert watcher.current_event_start > opened
+
+
+def test_duration_from_boot_clock() -> None:
+    """Test that a wall-clock step between two events doesn't change the duration."""
+    watcher = LidWatcher(testing=True)
+    watcher._send_event = MagicMock()  # type: ignore[method-assign]
+    opened = datetime(2025, 1, 15, 14, 0, tzinfo=timezone.utc)
+
+    watcher.handle_lid_event("open", timestamp=opened, clock=100.0)
+    # NTP stepped the clock back an hour meanwhile
+    watcher.handle_lid_event("closed", timestamp=opened - timedelta(minutes=59), clock=160.0)
+
+    closed_open_event = watcher._send_event.call_args_list[0].kwargs
+    assert closed_open_event["timestamp"] == opened
+    assert closed_open_event["duration"] == 60.0
@@ -0,0 +1,42 @@
+"""Tests for the command line entry point."""
+
+import subprocess
+import sys
+
+import pytest
+
+
+def _modules_after(code: str) -> set[str]:
+    """Run code in a fresh interpreter and return the modules it imported."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_help_skips_heavy_imports() -> None:
+    """Test that --help doesn't load the watcher at all."""
+    modules = _modules_after(
+        "import sys\n"
+        "sys.argv = ['aw-watcher-lid', '--help']\n"
+        "from aw_watcher_lid.__main__ import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass"
+    )
+
+    assert "aw_watcher_lid.lid" not in modules
+    assert "aw_core" not in modules
+
+
+@pytest.mark.parametrize("module", ["aw_client", "requests", "http.server", "dbus", "gi"])
+def test_watcher_import_is_lazy(module: str) -> None:
+    """Test that modules only some paths need are not loaded with LidWatcher."""
+    modules = _modules_after("from aw_watcher_lid.lid import LidWatcher")
+
+    assert "aw_watcher_lid.lid" in modules
+    assert module not in modules
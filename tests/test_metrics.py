@@ -0,0 +1,69 @@
+"""Tests for the metrics registry and its exporters."""
+
+import json
+import urllib.request
+from pathlib import Path
+
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.metrics import Metrics, MetricsServer, StatsFile
+
+
+def test_prometheus_text() -> None:
+    """Test the Prometheus text format of counters, histograms and gauges."""
+    metrics = Metrics()
+    metrics.inc("events_total", source="lid")
+    metrics.inc("events_total", source="lid")
+    metrics.inc("events_total", source="suspend")
+    metrics.observe("send_duration_seconds", 0.003, request="heartbeat")
+    metrics.observe("send_duration_seconds", 0.2, request="heartbeat")
+    metrics.register_callback("gauge", "pending_events", "Events waiting", lambda: 7)
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE aw_watcher_lid_events_total counter" in text
+    assert 'aw_watcher_lid_events_total{source="lid"} 2' in text
+    assert 'aw_watcher_lid_events_total{source="suspend"} 1' in text
+    assert 'aw_watcher_lid_send_duration_seconds_bucket{request="heartbeat",le="0.001"} 0' in text
+    assert 'aw_watcher_lid_send_duration_seconds_bucket{request="heartbeat",le="0.005"} 1' in text
+    assert 'aw_watcher_lid_send_duration_seconds_bucket{request="heartbeat",le="+Inf"} 2' in text
+    assert 'aw_watcher_lid_send_duration_seconds_count{request="heartbeat"} 2' in text
+    assert "aw_watcher_lid_pending_events 7" in text
+
+
+def test_metrics_endpoint_and_stats_file(tmp_path: Path) -> None:
+    """Test that both exporters publish the current values."""
+    metrics = Metrics()
+    metrics.inc("listener_wakeups_total", listener="evdev")
+
+    server = MetricsServer(metrics, port=0)
+    server.start()
+    # Not counted in /proc/self/fd: threads left over by other tests open and close theirs
+    sock, wakeup = server._httpd.socket, server._wakeup  # type: ignore[union-attr]
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        server.stop()
+    assert 'aw_watcher_lid_listener_wakeups_total{listener="evdev"} 1' in text
+    # Socket and wake-up pipe closed
+    assert sock.fileno() == -1
+    assert wakeup is not None and wakeup.closed
+
+    stats_file = StatsFile(metrics, tmp_path / "stats.json", interval=60)
+    stats_file.start()
+    metrics.inc("listener_wakeups_total", listener="evdev")
+    stats_file.stop()
+    stats = json.loads((tmp_path / "stats.json").read_text())
+    assert stats["listener_wakeups_total"] == {"listener=evdev": 2}
+
+
+def test_watcher_counts_events_per_source() -> None:
+    """Test that the watcher counts queued events by source."""
+    watcher = LidWatcher(testing=True)
+
+    watcher.handle_lid_event("closed")
+    watcher.handle_lid_event("open")
+    watcher.handle_suspend_event("suspended")
+
+    stats = watcher.metrics.snapshot()
+    assert stats["events_total"] == {"source=lid": 3, "source=suspend": 1}
@@ -0,0 +1,129 @@
+"""Tests for the on-demand profiler."""
+
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from aw_watcher_lid.profiling import Profiler
+from benchmarks.startup import isolated_env, start_once
+
+
+def _work() -> int:
+    return sum(range(10_000))
+
+
+def _busy(stop: threading.Event) -> None:
+    while not stop.is_set():
+        _work()
+        time.sleep(0.001)
+
+
+def _hoard() -> list[bytearray]:
+    return [bytearray(1000) for _ in range(2000)]
+
+
+def test_cpu_profile_toggle(tmp_path: Path) -> None:
+    """Test that the first toggle starts cProfile and the second writes the profile."""
+    profiler = Profiler(tmp_path)
+
+    assert profiler.toggle_cpu() is None
+    _work()
+    path = profiler.toggle_cpu()
+
+    assert path is not None and path.parent == tmp_path
+    functions = {function for _file, _line, function in pstats.Stats(str(path)).stats}  # type: ignore[attr-defined]
+    assert "_work" in functions
+    assert "_work" in path.with_suffix(".txt").read_text()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="cProfile sees other threads from 3.12")
+def test_cpu_profile_covers_threads(tmp_path: Path) -> None:
+    """Test that threads other than the one toggling are profiled (e.g. the sender)."""
+    profiler = Profiler(tmp_path)
+    stop = threading.Event()
+    thread = threading.Thread(target=_busy, args=(stop,))
+    thread.start()
+
+    profiler.toggle_cpu()
+    time.sleep(0.2)
+    path = profiler.toggle_cpu()
+    stop.set()
+    thread.join()
+
+    # What the thread's loop calls (the loop itself was entered before profiling)
+    assert "_work" in path.with_suffix(".txt").read_text()  # type: ignore[union-attr]
+
+
+def test_sigusr1_writes_profile_off_main_thread(tmp_path: Path) -> None:
+    """Test that stopping cProfile from the signal handler doesn't block the main thread."""
+    profiler = Profiler(tmp_path)
+    writers = []
+    write_cpu = profiler._write_cpu
+
+    def record(profile: object) -> Path:
+        writers.append(threading.current_thread())
+        return write_cpu(profile)
+
+    profiler._write_cpu = record  # type: ignore[method-assign]
+
+    profiler._on_sigusr1(signal.SIGUSR1, None)
+    _work()
+    # As if the signal arrived while the main thread was inside stop()
+    with profiler._lock:
+        profiler._on_sigusr1(signal.SIGUSR1, None)
+
+    deadline = time.monotonic() + 5
+    while not list(tmp_path.glob("cpu-*.txt")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(tmp_path.glob("cpu-*.pstats"))
+    assert writers and writers[0] is not threading.main_thread()
+
+
+def test_memory_diff(tmp_path: Path) -> None:
+    """Test that the second snapshot lists what grew since the first."""
+    profiler = Profiler(tmp_path)
+    try:
+        first = profiler.snapshot_memory()
+        hoard = _hoard()
+        second = profiler.snapshot_memory()
+    finally:
+        profiler.stop()
+
+    assert first != second
+    assert "changes since the previous snapshot" in second.read_text()
+    top = second.read_text().splitlines()[2]
+    assert "test_profiling.py" in top
+    assert len(hoard) == 2000
+
+
+def test_signals_on_running_watcher(tmp_path: Path) -> None:
+    """Test SIGUSR1/SIGUSR2 against the running watcher, which still stops on SIGTERM."""
+    profile_dir = tmp_path / "profiles"
+
+    def wait_for(pattern: str, count: int) -> None:
+        deadline = time.monotonic() + 10
+        while len(list(profile_dir.glob(pattern))) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    def profile(pid: int) -> None:
+        os.kill(pid, signal.SIGUSR1)
+        time.sleep(0.2)
+        os.kill(pid, signal.SIGUSR1)
+        wait_for("cpu-*.pstats", 1)
+        os.kill(pid, signal.SIGUSR2)
+        wait_for("memory-*.txt", 1)
+        time.sleep(0.01)
+        os.kill(pid, signal.SIGUSR2)
+        wait_for("memory-*.txt", 2)
+
+    start_once(isolated_env(tmp_path), on_ready=profile, args=["--profile-dir", str(profile_dir)])
+
+    assert len(list(profile_dir.glob("cpu-*.pstats"))) == 1
+    assert len(list(profile_dir.glob("cpu-*.txt"))) == 1
+    assert len(list(profile_dir.glob("memory-*.txt"))) == 2
@@ -0,0 +1,160 @@
+"""Tests for reloading the config while the watcher runs."""
+
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Callable
+from unittest.mock import MagicMock
+
+import pytest
+import tomlkit
+
+from aw_watcher_lid.config import DEFAULT_CONFIG, config_path, validate_config
+from aw_watcher_lid.lid import LidWatcher
+from aw_watcher_lid.reload import ConfigReloader
+from aw_watcher_lid.sender import EventSender
+from benchmarks.startup import isolated_env, start_once
+
+
+@pytest.fixture
+def config_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """An empty config file in a private config directory."""
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    path = config_path()
+    path.write_text("")
+    return path
+
+
+def _watcher() -> LidWatcher:
+    """A testing watcher with a (not started) sender, in the middle of an event."""
+    watcher = LidWatcher(testing=True)
+    watcher.sender = EventSender(MagicMock(), "bucket", coalesce_interval=10.0)
+    watcher.handle_lid_event("open")
+    return watcher
+
+
+def _write(path: Path, config: str) -> None:
+    """Replace the config file like editors do: write a new file, rename it over the old one."""
+    new = path.with_suffix(".tmp")
+    new.write_text(config)
+    os.replace(new, path)
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reload_applies_settings_live(config_file: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test that a reload changes sender settings, keeping the current event."""
+    watcher = _watcher()
+    event_start, event_clock = watcher.current_event_start, watcher.current_event_clock
+    reloader = ConfigReloader(watcher, config_file)
+
+    config_file.write_text(
+        "boot_gap_threshold = 600.0\n"
+        "sender_retry_interval = 1.0\n"
+        "sender_queue_size = 10\n"
+        'sender_overflow = "drop_newest"\n'
+        "sender_coalesce_interval = 0.0\n"
+    )
+    assert reloader.reload()
+
+    # Only used by the boot gap check at startup
+    assert "Restart to apply: boot_gap_threshold" in caplog.text
+    sender = watcher.sender
+    assert sender is not None
+    assert (sender.retry_interval, sender.queue_size, sender.overflow) == (1.0, 10, "drop_newest")
+    assert sender.coalescer is not None and sender.coalescer.interval == 0.0
+    assert watcher.current_event_start == event_start
+    assert watcher.current_event_clock == event_clock
+    assert watcher.current_lid_state == "open"
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        'sender_overflow = "explode"\n',
+        "lid_poll_interval = -5\n",
+        'sender_retry_interval = "soon"\n',
+        "[journal_rules.patterns]\nlid_closed = '('\n",
+        "sender_retry_interval = \n",
+    ],
+)
+def test_invalid_config_keeps_current(config_file: Path, config: str) -> None:
+    """Test that an invalid config is rejected and the running one kept."""
+    watcher = _watcher()
+    before = dict(watcher.config)
+    reloader = ConfigReloader(watcher, config_file)
+
+    config_file.write_text(config)
+    assert not reloader.reload()
+
+    assert dict(watcher.config) == before
+    assert watcher.sender is not None and watcher.sender.overflow == "drop_oldest"
+    assert watcher.metrics.snapshot()["config_reloads_total"] == {"result=invalid": 1}
+
+
+def test_invalid_config_rejected_at_startup(config_file: Path) -> None:
+    """Test that the watcher doesn't start with a config a reload would reject."""
+    config_file.write_text('sender_overflow = "explode"\njournal_rules = 3\n')
+
+    with pytest.raises(ValueError, match="journal_rules must be a table, not 3"):
+        LidWatcher(testing=True)
+
+    config_file.write_text("[journal_rules]\nidentifiers = ['systemd-logind']\n")
+    rules = LidWatcher(testing=True).config["journal_rules"]
+    assert rules["identifiers"] == ["systemd-logind"]
+
+
+def test_validate_plain_config() -> None:
+    """Test that a config of plain Python values is checked like a loaded one."""
+    config = tomlkit.parse(DEFAULT_CONFIG).unwrap()
+    validate_config(config)
+
+    config.update(listener=3, sender_queue_size=2.5, use_inhibitors="yes")
+    with pytest.raises(ValueError) as error:
+        validate_config(config)
+    assert str(error.value) == (
+        "listener must be a string, not 3; "
+        "use_inhibitors must be a boolean, not 'yes'; "
+        "sender_queue_size must be a whole number, not 2.5; "
+        "Unknown listener: 3"
+    )
+
+
+def test_file_change_and_request_trigger_reload(config_file: Path) -> None:
+    """Test that writing the config file, or a SIGHUP request, reloads it."""
+    watcher = _watcher()
+    reloader = ConfigReloader(watcher, config_file)
+    reloader.start()
+    try:
+        _write(config_file, "sender_retry_interval = 2.0\n")
+        _wait_for(lambda: watcher.sender.retry_interval == 2.0)  # type: ignore[union-attr]
+
+        # Other files in the directory are ignored
+        (config_file.parent / "other.toml").write_text("")
+
+        reloader.request()
+        _wait_for(lambda: reloader.reloads == 2)
+    finally:
+        reloader.stop()
+
+    assert reloader._thread is not None and not reloader._thread.is_alive()
+    assert reloader._wakeup.closed
+    assert watcher.metrics.snapshot()["config_reloads_total"] == {"result=applied": 2}
+
+
+def test_sighup_on_running_watcher(tmp_path: Path) -> None:
+    """Test that SIGHUP reloads instead of ending the watcher (the default action)."""
+
+    def reload(pid: int) -> None:
+        os.kill(pid, signal.SIGHUP)
+        time.sleep(0.3)
+        status = Path(f"/proc/{pid}/status").read_text()
+        assert "zombie" not in status
+
+    start_once(isolated_env(tmp_path), on_ready=reload)
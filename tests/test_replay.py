@@ -0,0 +1,35 @@
+"""Tests for the trace replay harness."""
+
+from pathlib import Path
+
+from benchmarks.replay import Replayer, flapping_lid, journal_day, suspend_cycles
+
+
+def test_replay_suspend_cycles(tmp_path: Path) -> None:
+    """Test that D-Bus signals are replayed into events on the fake server."""
+    report = Replayer(tmp_path).run(suspend_cycles(cycles=5))
+
+    assert report["inputs"] == 20
+    # Markers for lid closed/suspended, plus every state when it ends
+    assert report["events"] == 30
+    assert report["dropped"] == 0
+    assert report["requests"] >= 1
+
+
+def test_replay_flapping_lid(tmp_path: Path) -> None:
+    """Test that evdev input events are parsed and delivered."""
+    replayer = Replayer(tmp_path / "run")
+    report = replayer.run(flapping_lid(toggles=20))
+
+    assert report["events"] == 30
+    events = replayer.server.events["aw-watcher-lid_replay"]
+    assert {event.data["lid_state"] for event in events} == {"open", "closed"}
+    assert report["latency_p99_ms"] >= report["latency_p50_ms"] > 0
+
+
+def test_replay_journal(tmp_path: Path) -> None:
+    """Test that journal lines are classified and delivered."""
+    report = Replayer(tmp_path).run(journal_day(entries=2000, event_ratio=0.05))
+
+    assert report["inputs"] == 2000
+    assert 0 < report["events"] < 2000
@@ -0,0 +1,237 @@
+"""Tests for EventSender."""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from aw_core.models import Event
+from aw_transform import heartbeat_merge
+
+from aw_watcher_lid.sender import EventSender
+
+
+def _event(minute: int, lid_state: str = "open") -> Event:
+    return Event(
+        timestamp=datetime(2025, 1, 15, 14, minute, tzinfo=timezone.utc),
+        duration=30,
+        data={
+            "status": "system-afk" if lid_state == "closed" else "not-afk",
+            "lid_state": lid_state,
+            "suspend_state": None,
+            "boot_gap": False,
+            "event_source": "lid",
+        },
+    )
+
+
+def _store_heartbeat(bucket: list[Event], event: Event, pulsetime: float = 3600) -> None:
+    """Store a heartbeat like aw-server: merge it into the latest event or add it."""
+    if not bucket or heartbeat_merge(bucket[-1], event, pulsetime) is None:
+        bucket.append(Event(**event.to_json_dict()))
+
+
+def test_events_delivered_in_order() -> None:
+    """Test that queued events are sent as heartbeats in order."""
+    client = MagicMock()
+    sender = EventSender(client, "bucket")
+    sender.start()
+
+    for i in range(5):
+        sender.enqueue(i)  # type: ignore[arg-type]
+
+    assert sender.stop(timeout=5)
+    assert [c.kwargs["event"] for c in client.heartbeat.call_args_list] == [0, 1, 2, 3, 4]
+    assert sender.sent == 5
+
+
+def test_enqueue_does_not_block_on_slow_server() -> None:
+    """Test that enqueueing stays fast while a delivery hangs."""
+    release = threading.Event()
+    client = MagicMock()
+    client.heartbeat.side_effect = lambda *args, **kwargs: release.wait()
+    sender = EventSender(client, "bucket")
+    sender.start()
+
+    started = time.perf_counter()
+    for i in range(100):
+        sender.enqueue(_event(i % 60, "closed" if i % 2 else "open"))
+    elapsed = time.perf_counter() - started
+
+    release.set()
+    assert sender.stop(timeout=5)
+    assert elapsed < 0.1
+    inserted = sum(len(c.args[1]) for c in client.insert_events.call_args_list)
+    assert client.heartbeat.call_count + inserted == 100
+
+
+@pytest.mark.parametrize(
+    ("overflow", "expected"), [("drop_oldest", [2, 3]), ("drop_newest", [0, 1])]
+)
+def test_overflow_policy(overflow: str, expected: list[int]) -> None:
+    """Test which events are kept when the queue overflows."""
+    client = MagicMock()
+    sender = EventSender(client, "bucket", queue_size=2, overflow=overflow)
+
+    for i in range(4):
+        sender.enqueue(i)  # type: ignore[arg-type]
+
+    assert [event for event, _callback in sender._queue] == expected
+    assert sender.dropped == 2
+
+
+def test_unknown_overflow_policy() -> None:
+    """Test that invalid overflow policies are rejected."""
+    with pytest.raises(ValueError):
+        EventSender(MagicMock(), "bucket", overflow="explode")
+
+
+def test_failed_delivery_is_retried() -> None:
+    """Test that a failed heartbeat is retried and not lost."""
+    client = MagicMock()
+    client.heartbeat.side_effect = [ConnectionError("down"), None]
+    client.get_events.return_value = []
+    sender = EventSender(client, "bucket", retry_interval=0.01)
+    sender.start()
+
+    sender.enqueue(_event(0))
+
+    assert sender.stop(timeout=5)
+    assert client.heartbeat.call_count == 2
+    assert sender.failures == 1
+    stats = sender.metrics.snapshot()
+    assert stats["send_failures_total"] == {"": 1}
+    assert stats["send_retries_total"] == {"": 1}
+    assert stats["send_duration_seconds"]["request=heartbeat"]["count"] == 2
+    assert stats["pending_events"] == 0
+
+
+def test_failed_delivery_not_duplicated() -> None:
+    """Test that an event the server got despite an error isn't sent again."""
+    event = _event(0)
+    client = MagicMock()
+    client.heartbeat.side_effect = [TimeoutError("read timeout"), None]
+    client.get_events.return_value = [event]
+    sender = EventSender(client, "bucket", retry_interval=0.01)
+    sender.start()
+
+    sender.enqueue(event)
+
+    assert sender.stop(timeout=5)
+    assert client.heartbeat.call_count == 1
+    client.get_events.assert_called_once()
+
+
+def test_backlog_sent_in_batches() -> None:
+    """Test that a backlog is replayed with a few insert requests."""
+    client = MagicMock()
+    client.create_bucket.side_effect = [ConnectionError("down"), None]
+    sender = EventSender(client, "bucket", retry_interval=0.05, batch_size=20)
+    sender.start()
+
+    for minute in range(50):
+        sender.enqueue(_event(minute, "closed" if minute % 2 else "open"))
+
+    assert sender.stop(timeout=5)
+    # The first event of each batch is a heartbeat, to merge with the bucket's latest event
+    sizes = [len(c.args[1]) for c in client.insert_events.call_args_list]
+    assert sizes == [19, 19]
+    assert client.heartbeat.call_count == 12
+
+
+@pytest.mark.parametrize(("batch_size", "inserts"), [(500, 1), (16, 2)])
+def test_backlog_merged_like_heartbeats(batch_size: int, inserts: int) -> None:
+    """Test that a replayed backlog leaves the bucket as sending it as heartbeats would."""
+    events = []
+    for i in range(12):
+        start = datetime(2025, 1, 15, 14, 0, tzinfo=timezone.utc) + timedelta(minutes=10 * i)
+        closed, opened = _event(0, "closed").data, _event(0, "open").data
+        events += [
+            Event(timestamp=start, duration=0, data=closed),
+            Event(timestamp=start, duration=60, data=closed),
+            Event(timestamp=start + timedelta(seconds=60), duration=30, data=opened),
+        ]
+
+    heartbeats: list[Event] = []
+    for event in events:
+        _store_heartbeat(heartbeats, event)
+
+    client = MagicMock()
+    sender = EventSender(client, "bucket", batch_size=batch_size)
+    for event in events:
+        sender.spool.append(event)
+    assert sender._deliver_spool()
+
+    # Apply the requests to a bucket: heartbeats merge, inserted events are kept as they are
+    bucket: list[Event] = []
+    for name, args, kwargs in client.method_calls:
+        if name == "heartbeat":
+            _store_heartbeat(bucket, kwargs["event"], kwargs["pulsetime"])
+        elif name == "insert_events":
+            bucket += [Event(**event.to_json_dict()) for event in args[1]]
+
+    assert len(bucket) == 24
+    assert bucket == heartbeats
+    assert client.insert_events.call_count == inserts
+    assert sender.sent == 36
+
+
+def test_stop_respects_deadline() -> None:
+    """Test that stop() gives up flushing when aw-server stays down."""
+    client = MagicMock()
+    client.heartbeat.side_effect = ConnectionError("down")
+    sender = EventSender(client, "bucket", retry_interval=60)
+    sender.start()
+    sender.enqueue(_event(0))
+
+    started = time.monotonic()
+    assert not sender.stop(timeout=0.2)
+    assert time.monotonic() - started < 2
+    assert sender.pending == 1
+
+
+def test_deferred_events_built_once_server_answers() -> None:
+    """Test that deferred events wait for aw-server and are then sent."""
+    client = MagicMock()
+    client.create_bucket.side_effect = [ConnectionError("starting"), None]
+    build = MagicMock(return_value=[_event(0)])
+    sender = EventSender(client, "bucket", retry_interval=0.05)
+
+    sender.enqueue_deferred(build)
+    assert sender.pending == 1
+    sender.start()
+
+    assert sender.stop(timeout=5)
+    build.assert_called_once()
+    assert client.create_bucket.call_count == 2
+    assert client.heartbeat.call_args.kwargs["event"] == _event(0)
+
+
+def test_retry_backoff() -> None:
+    """Test that the wait between retries doubles, with jitter, up to the maximum."""
+    sender = EventSender(MagicMock(), "bucket", retry_interval=1.0, retry_max_interval=8.0)
+
+    for retries, delay in [(0, 1.0), (1, 2.0), (2, 4.0), (3, 8.0), (10, 8.0)]:
+        sender._retries = retries
+        assert delay / 2 <= sender._retry_delay() <= delay
+
+
+def test_warm_retries_right_away() -> None:
+    """Test that warming the connection up doesn't wait for the retry backoff."""
+    client = MagicMock()
+    client.heartbeat.side_effect = [ConnectionError("asleep"), None]
+    sender = EventSender(client, "bucket", retry_interval=60)
+    sender.start()
+    sender.enqueue(_event(0))
+    deadline = time.monotonic() + 5
+    while not sender.failures and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+    started = time.monotonic()
+    sender.warm()
+
+    assert sender.stop(timeout=5)
+    assert time.monotonic() - started < 2
+    client.warm.assert_called_once()
+    assert client.heartbeat.call_count == 2
@@ -0,0 +1,90 @@
+"""Tests for the event spool."""
+
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from aw_core.models import Event
+
+from aw_watcher_lid.spool import RECORD, Spool, decode_record, encode_record
+
+
+def _event(minute: int, suspend_state: str | None = None) -> Event:
+    return Event(
+        timestamp=datetime(2025, 1, 15, 14, minute, 30, 123456, tzinfo=timezone.utc),
+        duration=12.5,
+        data={
+            "status": "system-afk" if suspend_state == "suspended" else "not-afk",
+            "lid_state": None if suspend_state else "open",
+            "suspend_state": suspend_state,
+            "boot_gap": False,
+            "event_source": "suspend" if suspend_state else "lid",
+        },
+    )
+
+
+def test_record_roundtrip() -> None:
+    """Test that events survive encoding unchanged."""
+    for event in (_event(1), _event(2, "suspended"), _event(3, "resumed")):
+        record = encode_record(7, event)
+        assert len(record) == RECORD.size
+        assert decode_record(record) == (7, event)
+
+
+def test_corrupt_record_detected() -> None:
+    """Test that a damaged record fails its CRC check."""
+    record = bytearray(encode_record(1, _event(1)))
+    record[10] ^= 0xFF
+    assert decode_record(bytes(record)) is None
+
+
+def test_append_peek_ack(tmp_path: Path) -> None:
+    """Test the spool lifecycle, including compaction once everything is acked."""
+    spool = Spool(tmp_path)
+    for minute in range(5):
+        spool.append(_event(minute))
+    spool.sync()
+
+    assert len(spool) == 5
+    assert [seq for seq, _event in spool.peek(3)] == [1, 2, 3]
+
+    spool.begin(1, 3)
+    spool.ack(3)
+    assert [seq for seq, _event in spool.peek(10)] == [4, 5]
+
+    spool.begin(4, 5)
+    spool.ack(5)
+    assert len(spool) == 0
+    assert spool.path.stat().st_size == 0
+
+    # Sequence numbers keep increasing after compaction
+    assert spool.append(_event(6)) == 6
+
+
+def test_reopen_keeps_unsent_events(tmp_path: Path) -> None:
+    """Test that unsent events and the in-flight marker survive a restart."""
+    spool = Spool(tmp_path)
+    for minute in range(4):
+        spool.append(_event(minute))
+    spool.begin(1, 2)
+    spool.close()
+
+    reopened = Spool(tmp_path)
+    assert len(reopened) == 4
+    assert reopened.inflight == (1, 2)
+    assert reopened.peek(1)[0][1] == _event(0)
+
+
+def test_torn_tail_discarded(tmp_path: Path) -> None:
+    """Test that a partially written record is cut off on open."""
+    spool = Spool(tmp_path)
+    spool.append(_event(0))
+    spool.append(_event(1))
+    spool.close()
+
+    with open(tmp_path / "spool.bin", "ab") as f:
+        f.write(encode_record(3, _event(2))[:10])
+
+    reopened = Spool(tmp_path)
+    assert len(reopened) == 2
+    assert os.path.getsize(tmp_path / "spool.bin") == 2 * RECORD.size
@@ -0,0 +1,36 @@
+"""Tests for WakeupPipe."""
+
+import os
+import select
+
+from aw_watcher_lid.wakeup import WakeupPipe
+
+
+def test_wake_and_read() -> None:
+    """Test that wake() makes the read end readable with the bytes written."""
+    wakeup = WakeupPipe()
+    poll = select.poll()
+    poll.register(wakeup.fd, select.POLLIN)
+    assert poll.poll(0) == []
+
+    wakeup.wake(b"r")
+    wakeup.wake()
+
+    assert poll.poll(0) == [(wakeup.fd, select.POLLIN)]
+    assert wakeup.read() == b"r\0"
+    assert wakeup.read() == b""
+    wakeup.close()
+
+
+def test_wake_after_close_does_nothing() -> None:
+    """Test that closing frees both descriptors and a late wake() is ignored."""
+    open_fds = len(os.listdir("/proc/self/fd"))
+    wakeup = WakeupPipe()
+    assert len(os.listdir("/proc/self/fd")) == open_fds + 2
+
+    wakeup.close()
+    wakeup.wake()
+    wakeup.close()
+
+    assert wakeup.closed
+    assert len(os.listdir("/proc/self/fd")) == open_fds